@@ -1,20 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from contextlib import asynccontextmanager
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, aclosing, contextmanager
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
 import hashlib
+import math
+import hmac
+import gzip
+import zlib
+import mimetypes
+import base64
 import jwt
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 import aiosqlite
+import sqlite3
 import uuid
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 import json
+import re
 
 # Firebase Admin SDK
 try:
@@ -25,6 +40,13 @@ except ImportError:
     FIREBASE_AVAILABLE = False
     print("[Warning] Firebase Admin SDK not installed")
 
+# Brotli is optional; without it responses are gzip-compressed only
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
 load_dotenv()
 
 print("Open http://localhost:8080/")
@@ -64,9 +86,450 @@ else:
 # Database path - persistent storage for Cloud Run
 DB_PATH = os.getenv("DB_PATH", "studentflow.db")
 print(f"[Database] Using database at: {DB_PATH}")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+# Storage tuning (see .env.example). WAL lets readers proceed while the single
+# writer commits; synchronous=NORMAL is durable across app crashes in WAL mode.
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL").upper()
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))  # negative = KiB
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_GROUP_COMMIT_MS = float(os.getenv("DB_GROUP_COMMIT_MS", "2"))
+DB_GROUP_COMMIT_MAX = int(os.getenv("DB_GROUP_COMMIT_MAX", "64"))
+
+if DB_JOURNAL_MODE not in ("WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"):
+    raise ValueError(f"Unsupported DB_JOURNAL_MODE: {DB_JOURNAL_MODE}")
+if DB_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"Unsupported DB_SYNCHRONOUS: {DB_SYNCHRONOUS}")
+
+async def apply_pragmas(db: aiosqlite.Connection):
+    await db.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    await db.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    await db.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+    await db.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+
+# ============= METRICS =============
+# /metrics serves Prometheus text format. Histograms have fixed bucket bounds and
+# preallocated count arrays. Hot paths keep hold of the series they record into:
+# - HTTP timings are looked up by route object, method and status, so the labels
+#   are built once per combination rather than per request.
+# - DB timings are looked up by SQL string. TimedConnection times each statement
+#   on the connection's own thread. For a SELECT that covers running it to its
+#   first row; later fetches aren't timed.
+# Observations can come from worker threads, so each series takes a lock.
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # if set, /metrics requires "Authorization: Bearer <token>"
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+AI_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+VERIFY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+def label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def label_text(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{label_value(value)}"' for name, value in zip(names, values))
+
+class HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+class CounterSeries:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+class Metric(ABC):
+    """A named metric family: one series per combination of label values"""
+    kind: str
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.series: dict = {}  # label values tuple -> series
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_series(self):
+        """A fresh series for one set of label values"""
+
+    @abstractmethod
+    def render(self, lines: list):
+        """Append the family's samples in the Prometheus text format"""
+
+    def labels(self, *values):
+        series = self.series.get(values)
+        if series is None:
+            with self._lock:
+                series = self.series.get(values)
+                if series is None:
+                    series = self.series[values] = self._new_series()
+        return series
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, buckets: tuple):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+
+    def _new_series(self):
+        return HistogramSeries(self.buckets)
+
+    def render(self, lines: list):
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for values, series in list(self.series.items()):
+            with series.lock:
+                counts, total = list(series.counts), series.sum
+            labels = label_text(self.labelnames, values)
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return CounterSeries()
+
+    def render(self, lines: list):
+        for values, series in list(self.series.items()):
+            lines.append(f"{self.name}{{{label_text(self.labelnames, values)}}} {series.value}")
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "studentflow_http_request_duration_seconds", "Time to serve a request, by route template, method and status",
+    ("route", "method", "status"), HTTP_BUCKETS)
+DB_STATEMENT_SECONDS = Histogram(
+    "studentflow_db_statement_duration_seconds", "Time to execute a SQL statement, by statement name",
+    ("statement",), DB_BUCKETS)
+GEMINI_REQUEST_SECONDS = Histogram(
+    "studentflow_gemini_request_duration_seconds", "Gemini call latency, by endpoint and model",
+    ("endpoint", "model"), AI_BUCKETS)
+GEMINI_TOKENS = Counter(
+    "studentflow_gemini_tokens_total", "Gemini tokens used, by endpoint, model and kind (prompt/completion)",
+    ("endpoint", "model", "kind"))
+GEMINI_ERRORS = Counter(
+    "studentflow_gemini_errors_total", "Failed Gemini calls, by endpoint, model and error",
+    ("endpoint", "model", "error"))
+TOKEN_VERIFY_SECONDS = Histogram(
+    "studentflow_token_verify_duration_seconds", "ID token verification time on cache misses, by result",
+    ("result",), VERIFY_BUCKETS)
+METRICS = (HTTP_REQUEST_SECONDS, DB_STATEMENT_SECONDS, GEMINI_REQUEST_SECONDS, GEMINI_TOKENS, GEMINI_ERRORS,
+           TOKEN_VERIFY_SECONDS)
+
+SQL_STATEMENT_CACHE_SIZE = 4096
+_statement_series: dict = {}  # SQL text -> DB_STATEMENT_SECONDS series
+STATEMENT_TARGETS = {
+    "SELECT": r"\bFROM\s+(\w+)", "WITH": r"\bFROM\s+(\w+)", "DELETE": r"\bFROM\s+(\w+)",
+    "INSERT": r"\bINTO\s+(\w+)", "REPLACE": r"\bINTO\s+(\w+)",
+    "UPDATE": r"^\s*UPDATE\s+(?:OR\s+\w+\s+)?(\w+)", "PRAGMA": r"^\s*PRAGMA\s+(\w+)",
+}
+
+def statement_name(sql: str) -> str:
+    """Statement label: the verb and the table it works on, e.g. SELECT posts or INSERT post_likes"""
+    flat = sql
+    while True:  # drop subqueries and function arguments so FROM means the outer query's table
+        stripped = re.sub(r"\([^()]*\)", " ", flat)
+        if stripped == flat:
+            break
+        flat = stripped
+    verb = (flat.split(None, 1) or ["?"])[0].upper()
+    match = re.search(STATEMENT_TARGETS[verb], flat, re.IGNORECASE) if verb in STATEMENT_TARGETS else None
+    return f"{verb} {match.group(1)}" if match else verb
+
+def statement_series(sql: str) -> HistogramSeries:
+    series = _statement_series.get(sql)
+    if series is None:
+        series = DB_STATEMENT_SECONDS.labels(statement_name(sql))
+        if len(_statement_series) < SQL_STATEMENT_CACHE_SIZE:
+            _statement_series[sql] = series
+    return series
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection (pass as `factory=`) that records statement timings"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            statement_series(sql).observe(time.perf_counter() - started)
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            statement_series(sql).observe(time.perf_counter() - started)
+
+class MetricsMiddleware:
+    """Times every HTTP request, labelled with the route template that matched"""
+
+    def __init__(self, app):
+        self.app = app
+        self.routes: dict = {}  # route template (None when unmatched) -> method -> status -> series
+
+    def series(self, path: Optional[str], method: str, status: int) -> HistogramSeries:
+        by_method = self.routes.get(path)
+        if by_method is None:
+            by_method = self.routes.setdefault(path, {})
+        by_status = by_method.get(method)
+        if by_status is None:
+            by_status = by_method.setdefault(method, {})
+        series = by_status.get(status)
+        if series is None:
+            label = (path or "/") if path is not None else "unmatched"
+            series = by_status[status] = HTTP_REQUEST_SECONDS.labels(label, method, str(status))
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500  # if the app fails before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+            route = scope.get("route")
+            self.series(route.path if route is not None else None, method, status).observe(time.perf_counter() - started)
+
+@contextmanager
+def gemini_metrics(endpoint: str, model_name: str):
+    """Time one Gemini call; yields a function that records the token usage of a response"""
+    def record_usage(response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            GEMINI_TOKENS.labels(endpoint, model_name, "prompt").inc(getattr(usage, "prompt_token_count", 0) or 0)
+            GEMINI_TOKENS.labels(endpoint, model_name, "completion").inc(getattr(usage, "candidates_token_count", 0) or 0)
+
+    started = time.perf_counter()
+    try:
+        yield record_usage
+    except (GeneratorExit, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        error = "timeout" if isinstance(e, HTTPException) and e.status_code == 504 else type(e).__name__
+        GEMINI_ERRORS.labels(endpoint, model_name, error).inc()
+        raise
+    finally:
+        GEMINI_REQUEST_SECONDS.labels(endpoint, model_name).observe(time.perf_counter() - started)
+
+def component_stats() -> dict:
+    """The /healthz/* numbers, exported as gauges"""
+    return {
+        "db": db_pool.stats(), "auth": token_cache.stats(), "passwords": password_pool.stats(),
+        "rate_limit": rate_limiter.stats(), "ai": ai_pool.stats(), "ai_cache": ai_cache.stats(),
+        "jobs": jobs.stats(), "feed": feed_hub.stats(), "feed_cache": feed_cache.stats(),
+    }
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        metric.render(lines)
+    lines.append("# HELP studentflow_component_stat Internal counters and gauges of the app's pools and caches")
+    lines.append("# TYPE studentflow_component_stat gauge")
+    for component, stats in component_stats().items():
+        for name, value in stats.items():
+            if isinstance(value, (bool, int, float)):
+                lines.append(f'studentflow_component_stat{{component="{component}",stat="{name}"}} {float(value)}')
+    return "\n".join(lines) + "\n"
+
+class ConnectionPool:
+    """
+    Bounded set of long-lived reader connections plus a single writer connection.
+    Handlers borrow readers through the get_db dependency. All writes are sent to
+    one writer task via write(), which groups units of work from concurrent
+    requests into a single transaction (group commit).
+    """
+
+    def __init__(self, path: str, size: int = 4, flush_ms: float = 2, batch_max: int = 64):
+        self.path = path
+        self.size = size
+        self.flush_seconds = flush_ms / 1000
+        self.batch_max = max(1, batch_max)
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._writes: asyncio.Queue = asyncio.Queue()
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.in_use = 0
+        self.waiters = 0
+        self.acquires = 0
+        self.acquire_seconds = 0.0
+        self.max_acquire_seconds = 0.0
+        self.write_units = 0
+        self.write_batches = 0
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path, factory=TimedConnection)
+        db.row_factory = aiosqlite.Row
+        await apply_pragmas(db)
+        return db
+
+    async def open(self):
+        for _ in range(self.size):
+            self._readers.put_nowait(await self._connect())
+        self._writer = await self._connect()
+        self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        while not self._readers.empty():
+            await self._readers.get_nowait().close()
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    def _record_acquire(self, started: float):
+        elapsed = time.perf_counter() - started
+        self.acquires += 1
+        self.acquire_seconds += elapsed
+        self.max_acquire_seconds = max(self.max_acquire_seconds, elapsed)
+        self.in_use += 1
+
+    @asynccontextmanager
+    async def reader(self):
+        started = time.perf_counter()
+        if self._readers.empty():
+            self.waiters += 1
+            try:
+                db = await self._readers.get()
+            finally:
+                self.waiters -= 1
+        else:
+            db = self._readers.get_nowait()
+        self._record_acquire(started)
+        try:
+            yield db
+        finally:
+            self.in_use -= 1
+            self._readers.put_nowait(db)
+
+    async def write(self, unit):
+        """
+        Run `await unit(db)` on the writer connection and wait until it is committed.
+        The unit must not commit itself; exceptions it raises roll back only its own
+        changes and are re-raised here.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((unit, future))
+        return await future
+
+    async def _next_batch(self) -> list:
+        batch = [await self._writes.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_seconds
+        while len(batch) < self.batch_max:
+            if not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._writes.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write_loop(self):
+        db = self._writer
+        while True:
+            batch = await self._next_batch()
+            outcomes = []
+            try:
+                await db.execute("BEGIN IMMEDIATE")
+                for unit, future in batch:
+                    await db.execute("SAVEPOINT unit")
+                    try:
+                        result = await unit(db)
+                    except Exception as e:
+                        await db.execute("ROLLBACK TO unit")
+                        await db.execute("RELEASE unit")
+                        outcomes.append((future, e, False))
+                    else:
+                        await db.execute("RELEASE unit")
+                        outcomes.append((future, result, True))
+                await db.commit()
+            except Exception as e:
+                print(f"[Database] Group commit failed: {type(e).__name__}: {e}")
+                if db.in_transaction:
+                    await db.rollback()
+                outcomes = [(future, e, False) for _, future in batch]
+            self.write_batches += 1
+            self.write_units += len(batch)
+            for future, value, ok in outcomes:
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def stats(self) -> dict:
+        return {
+            "readers": self.size,
+            "in_use": self.in_use,
+            "waiters": self.waiters,
+            "acquires": self.acquires,
+            "avg_acquire_ms": round(self.acquire_seconds / self.acquires * 1000, 3) if self.acquires else 0.0,
+            "max_acquire_ms": round(self.max_acquire_seconds * 1000, 3),
+            "write_queue": self._writes.qsize(),
+            "write_units": self.write_units,
+            "write_batches": self.write_batches,
+            "avg_batch_size": round(self.write_units / self.write_batches, 2) if self.write_batches else 0.0,
+        }
+
+db_pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, DB_GROUP_COMMIT_MS, DB_GROUP_COMMIT_MAX)
+
+async def get_db():
+    """FastAPI dependency: borrow a pooled reader connection for the request"""
+    async with db_pool.reader() as db:
+        yield db
 
 async def init_db():
     async with aiosqlite.connect(DB_PATH) as db:
+        # journal_mode is persistent, so it only needs to be set once per file
+        await db.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
         await db.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id TEXT PRIMARY KEY,
@@ -169,11 +632,332 @@ async def init_db():
             )
         """)
         await db.commit()
+        await run_migrations(db)
+
+# ============= SCHEMA MIGRATIONS =============
+# Ordered and append-only: never edit a released step, add a new version instead.
+# Every step must be idempotent (IF NOT EXISTS, column checks) so a crash halfway
+# through a version can simply be re-run on the next startup. A step is either a
+# SQL string or an async callable taking the connection.
+
+# Collections whose list endpoints answer conditional GETs. Triggers bump a
+# counter on every row change; posts are one shared feed (likes and comment
+# counts live on the post row), so their counter is kept under FEED_OWNER.
+VERSIONED_COLLECTIONS = {"notes": True, "tasks": True, "flashcards": True, "study_sessions": True, "posts": False}
+FEED_OWNER = "*"
+
+def version_triggers(table: str, per_user: bool) -> list:
+    triggers = []
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        owner = f"{row}.user_id" if per_user else f"'{FEED_OWNER}'"
+        triggers.append(f"""CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+            INSERT INTO collection_versions (user_id, collection, version) VALUES ({owner}, '{table}', 1)
+            ON CONFLICT (user_id, collection) DO UPDATE SET version = version + 1;
+        END""")
+    return triggers
+
+def count_triggers(table: str) -> list:
+    """Keep table_counts[table] equal to the table's row count"""
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO table_counts (name, count) VALUES ('{table}', 1)
+            ON CONFLICT (name) DO UPDATE SET count = count + 1;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} BEGIN
+            UPDATE table_counts SET count = count - 1 WHERE name = '{table}';
+        END""",
+    ]
+
+MIGRATIONS = [
+    (1, "secondary indexes for per-user list queries", [
+        # Per-user lists ordered by recency (also serve the DESC ordering)
+        "CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_notes_user_subject ON notes(user_id, subject)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_status_created ON tasks(user_id, status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_mood_logs_user_date ON mood_logs(user_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_user_created ON flashcards(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_user_subject_created ON flashcards(user_id, subject, created_at)",
+        # Community feed and per-post lookups. post_likes(post_id, ...) is already
+        # covered by its UNIQUE(post_id, user_id) constraint index.
+        "CREATE INDEX IF NOT EXISTS idx_posts_created ON posts(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_post_comments_post_created ON post_comments(post_id, created_at)",
+    ]),
+    (2, "denormalized like/comment counters on posts", [
+        lambda db: add_column(db, "posts", "comment_count", "INTEGER DEFAULT 0"),
+        lambda db: reconcile_post_counters(db),
+    ]),
+    (3, "keyset pagination indexes (sort key + id tie-breaker)", [
+        "CREATE INDEX IF NOT EXISTS idx_notes_user_created_id ON notes(user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created_id ON tasks(user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_status_created_id ON tasks(user_id, status, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_mood_logs_user_date_id ON mood_logs(user_id, date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_user_created_id ON flashcards(user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_user_subject_created_id ON flashcards(user_id, subject, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_posts_created_id ON posts(created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_post_comments_post_created_id ON post_comments(post_id, created_at, id)",
+        "DROP INDEX IF EXISTS idx_notes_user_created",
+        "DROP INDEX IF EXISTS idx_tasks_user_created",
+        "DROP INDEX IF EXISTS idx_tasks_user_status_created",
+        "DROP INDEX IF EXISTS idx_mood_logs_user_date",
+        "DROP INDEX IF EXISTS idx_flashcards_user_created",
+        "DROP INDEX IF EXISTS idx_flashcards_user_subject_created",
+        "DROP INDEX IF EXISTS idx_posts_created",
+        "DROP INDEX IF EXISTS idx_post_comments_post_created",
+    ]),
+    (4, "content-addressed AI response cache", [
+        """
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            key TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(last_used)",
+    ]),
+    (5, "per-user study streak state", [
+        """
+        CREATE TABLE IF NOT EXISTS study_streaks (
+            user_id TEXT PRIMARY KEY,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            last_active_date TEXT,
+            total_minutes INTEGER NOT NULL DEFAULT 0,
+            session_count INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        lambda db: rebuild_study_streaks(db),
+    ]),
+    (6, "materialized per-user analytics rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS user_analytics (
+            user_id TEXT PRIMARY KEY,
+            task_counts TEXT NOT NULL DEFAULT '[]',
+            note_subjects TEXT NOT NULL DEFAULT '[]',
+            flashcard_total INTEGER NOT NULL DEFAULT 0,
+            confidence_sum INTEGER NOT NULL DEFAULT 0,
+            review_total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        lambda db: check_user_analytics(db, repair=True),
+    ]),
+    (7, "SM-2 scheduling state and due-card index on flashcards", [
+        lambda db: add_column(db, "flashcards", "ease", "REAL NOT NULL DEFAULT 2.5"),
+        lambda db: add_column(db, "flashcards", "interval_days", "INTEGER NOT NULL DEFAULT 0"),
+        lambda db: add_column(db, "flashcards", "repetitions", "INTEGER NOT NULL DEFAULT 0"),
+        lambda db: add_column(db, "flashcards", "due_at", "TEXT"),
+        # Existing cards enter the queue as new cards, oldest first
+        "UPDATE flashcards SET due_at = COALESCE(created_at, '') WHERE due_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_user_due ON flashcards(user_id, due_at, id)",
+    ]),
+    (8, "FTS5 search indexes over notes, flashcards and posts", [
+        # FTS rows share the source row's rowid so triggers update them in place.
+        # `owner` holds the user id with dashes removed (one token) so a user's
+        # notes and cards are narrowed inside the FTS index rather than after it.
+        "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(owner, title, content, subject, tokenize='unicode61 remove_diacritics 2')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5(owner, question, answer, tokenize='unicode61 remove_diacritics 2')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')",
+        """CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, owner, title, content, subject)
+            VALUES (NEW.rowid, replace(NEW.user_id, '-', ''), NEW.title, NEW.content, NEW.subject);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF user_id, title, content, subject ON notes BEGIN
+            UPDATE notes_fts SET owner = replace(NEW.user_id, '-', ''), title = NEW.title, content = NEW.content, subject = NEW.subject
+            WHERE rowid = OLD.rowid;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+            DELETE FROM notes_fts WHERE rowid = OLD.rowid;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS flashcards_fts_insert AFTER INSERT ON flashcards BEGIN
+            INSERT INTO flashcards_fts (rowid, owner, question, answer)
+            VALUES (NEW.rowid, replace(NEW.user_id, '-', ''), NEW.question, NEW.answer);
+        END""",
+        # Reviews update flashcards constantly; only text changes touch the index
+        """CREATE TRIGGER IF NOT EXISTS flashcards_fts_update AFTER UPDATE OF user_id, question, answer ON flashcards BEGIN
+            UPDATE flashcards_fts SET owner = replace(NEW.user_id, '-', ''), question = NEW.question, answer = NEW.answer
+            WHERE rowid = OLD.rowid;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS flashcards_fts_delete AFTER DELETE ON flashcards BEGIN
+            DELETE FROM flashcards_fts WHERE rowid = OLD.rowid;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, content) VALUES (NEW.rowid, NEW.title, NEW.content);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+            UPDATE posts_fts SET title = NEW.title, content = NEW.content WHERE rowid = OLD.rowid;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+            DELETE FROM posts_fts WHERE rowid = OLD.rowid;
+        END""",
+        lambda db: rebuild_search_index(db),
+    ]),
+    (9, "persistent background job queue", [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_at TEXT NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            errors TEXT NOT NULL DEFAULT '[]',
+            idempotency_key TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs(status, run_at)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_user_idempotency ON jobs(user_id, idempotency_key) WHERE idempotency_key IS NOT NULL",
+    ]),
+    (10, "per-user collection version counters for list ETags", [
+        """
+        CREATE TABLE IF NOT EXISTS collection_versions (
+            user_id TEXT NOT NULL,
+            collection TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id, collection)
+        ) WITHOUT ROWID
+        """,
+        *[sql for table, per_user in VERSIONED_COLLECTIONS.items() for sql in version_triggers(table, per_user)],
+    ]),
+    (11, "feed event relay for multi-worker community streams", [
+        # AUTOINCREMENT so pruning the newest rows can never hand out an id a poller has already passed
+        """
+        CREATE TABLE IF NOT EXISTS feed_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_feed_events_created_at ON feed_events(created_at)",
+    ]),
+    (12, "index likes by user for the feed cache's liked-sets", [
+        "CREATE INDEX IF NOT EXISTS idx_post_likes_user_post ON post_likes(user_id, post_id)",
+    ]),
+    (13, "trigger-maintained post count for the dashboard", [
+        """
+        CREATE TABLE IF NOT EXISTS table_counts (
+            name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        *count_triggers("posts"),
+        lambda db: reconcile_table_count(db, "posts"),
+    ]),
+    (14, "leases on running jobs so several processes can share the queue", [
+        lambda db: add_column(db, "jobs", "locked_by", "TEXT"),
+        lambda db: add_column(db, "jobs", "locked_until", "TEXT"),
+    ]),
+]
+
+async def add_column(db: aiosqlite.Connection, table: str, column: str, decl: str):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists"""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in await cursor.fetchall()]:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+async def reconcile_post_counters(db: aiosqlite.Connection) -> int:
+    """Rebuild posts.likes and posts.comment_count from the source tables"""
+    cursor = await db.execute("""
+        UPDATE posts SET
+            likes = (SELECT COUNT(*) FROM post_likes pl WHERE pl.post_id = posts.id),
+            comment_count = (SELECT COUNT(*) FROM post_comments c WHERE c.post_id = posts.id)
+    """)
+    return cursor.rowcount
+
+async def reconcile_table_count(db: aiosqlite.Connection, table: str) -> int:
+    """Reset table_counts[table] from COUNT(*); returns the count"""
+    cursor = await db.execute(f"SELECT COUNT(*) FROM {table}")
+    count = (await cursor.fetchone())[0]
+    await db.execute("INSERT OR REPLACE INTO table_counts (name, count) VALUES (?, ?)", (table, count))
+    return count
+
+async def rebuild_study_streaks(db: aiosqlite.Connection, user_id: Optional[str] = None) -> tuple:
+    """
+    Recompute study_streaks from study_sessions by replaying each user's days in
+    order, for every user or just `user_id`. Returns (users rebuilt, users whose
+    stored state had drifted).
+    """
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+    cursor = await db.execute(f"SELECT {', '.join(STREAK_FIELDS)} FROM study_streaks {where}", params)
+    before = {row[0]: tuple(row) for row in await cursor.fetchall()}
+    streaks: dict = {}
+    cursor = await db.execute(f"SELECT user_id, date, duration FROM study_sessions {where} ORDER BY user_id, date", params)
+    async for session_user, day, duration in cursor:
+        streak = streaks.setdefault(session_user, new_streak(session_user))
+        extend_streak(streak, day[:10], duration or 0)
+    rows = [tuple(streak[f] for f in STREAK_FIELDS) for streak in streaks.values()]
+    await db.execute(f"DELETE FROM study_streaks {where}", params)
+    await db.executemany(
+        f"INSERT INTO study_streaks ({', '.join(STREAK_FIELDS)}) VALUES ({', '.join('?' * len(STREAK_FIELDS))})",
+        rows
+    )
+    drifted = sum(1 for row in rows if before.pop(row[0], None) != row) + len(before)
+    return len(rows), drifted
+
+async def rebuild_search_index(db: aiosqlite.Connection):
+    """Repopulate the FTS tables from their source tables"""
+    for statement in (
+        "DELETE FROM notes_fts",
+        """INSERT INTO notes_fts (rowid, owner, title, content, subject)
+           SELECT rowid, replace(user_id, '-', ''), title, content, subject FROM notes""",
+        "DELETE FROM flashcards_fts",
+        """INSERT INTO flashcards_fts (rowid, owner, question, answer)
+           SELECT rowid, replace(user_id, '-', ''), question, answer FROM flashcards""",
+        "DELETE FROM posts_fts",
+        "INSERT INTO posts_fts (rowid, title, content) SELECT rowid, title, content FROM posts",
+    ):
+        await db.execute(statement)
+
+async def run_migrations(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    """)
+    cursor = await db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    current = (await cursor.fetchone())[0]
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        for step in steps:
+            if callable(step):
+                await step(db)
+            else:
+                await db.execute(step)
+        await db.execute(
+            "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+            (version, description, datetime.now(timezone.utc).isoformat())
+        )
+        await db.commit()
+        print(f"[Database] Applied migration {version}: {description}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await db_pool.open()
+    await jobs.start()
+    await feed_hub.start()
+    count = await asyncio.to_thread(static_assets.load)
+    print(f"[Static] Loaded {count} frontend files into memory")
     yield
+    await feed_hub.stop()
+    await jobs.shutdown()
+    await db_pool.close()
+    auth_executor.shutdown(wait=False)
+    password_pool.shutdown()
+    ai_pool.shutdown()
 
 app = FastAPI(title="StudentFlow", lifespan=lifespan)
 
@@ -183,8 +967,103 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# ============= RESPONSE COMPRESSION =============
+# Bodies of at least COMPRESSION_MIN_BYTES are compressed with brotli when the
+# client accepts it and the module is installed, gzip otherwise. Streamed bodies
+# are flushed chunk by chunk; SSE and already-compressed types pass through.
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSION_THREAD_BYTES = 128 * 1024  # larger chunks are compressed off the event loop
+
+# Already compressed, or streamed event by event where buffering would delay delivery
+UNCOMPRESSED_TYPES = ("text/event-stream", "image/", "audio/", "video/", "font/woff", "application/zip",
+                      "application/gzip", "application/x-gzip", "application/grpc")
+
+def add_vary(headers: MutableHeaders, value: str):
+    """Add `value` to the Vary header unless it is already listed"""
+    present = [v.strip() for v in headers.get("vary", "").split(",") if v.strip()]
+    if value.lower() not in (v.lower() for v in present):
+        headers["Vary"] = ", ".join(present + [value])
+
+class ResponseCompressor:
+    """The compression stream for one response body"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if self.encoding == "br":
+            out = self.compressor.process(body)
+            return out + (self.compressor.flush() if more_body else self.compressor.finish())
+        return self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= COMPRESSION_THREAD_BYTES:
+            return await asyncio.to_thread(self._compress, body, more_body)
+        return self._compress(body, more_body)
+
+class CompressionMiddleware:
+    """Compresses response bodies of at least `minimum_size` bytes (or any streamed body)"""
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = Headers(scope=scope).get("accept-encoding", "")
+        encoding = "br" if BROTLI_AVAILABLE and "br" in accepted else "gzip" if "gzip" in accepted else None
+        start = None  # held back until the first body chunk shows whether to compress
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if "content-encoding" in headers or message["status"] == 206 or media_type.startswith(UNCOMPRESSED_TYPES):
+                    await send(message)
+                else:
+                    start = message
+                return
+            if start is not None:
+                initial, start = start, None
+                if message["type"] == "http.response.body":
+                    body = message.get("body", b"")
+                    more_body = message.get("more_body", False)
+                    if more_body or len(body) >= self.minimum_size:
+                        headers = MutableHeaders(scope=initial)
+                        add_vary(headers, "Accept-Encoding")
+                        if encoding:
+                            compressor = ResponseCompressor(encoding)
+                            message["body"] = await compressor.compress(body, more_body)
+                            headers["Content-Encoding"] = encoding
+                            if more_body or initial.get("trailers", False):
+                                del headers["Content-Length"]
+                            else:
+                                headers["Content-Length"] = str(len(message["body"]))
+                await send(initial)
+                await send(message)
+                return
+            if compressor is not None and message["type"] == "http.response.body":
+                message["body"] = await compressor.compress(message.get("body", b""), message.get("more_body", False))
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
 SECRET_KEY = os.getenv("SECRET_KEY", "169a765d26005d18dcaf04d2453f37fb")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 if GEMINI_API_KEY:
@@ -203,6 +1082,32 @@ async def api_root():
 async def healthz():
     return {"ok": True}
 
+@app.get("/healthz/db")
+async def healthz_db():
+    return db_pool.stats()
+
+@app.get("/healthz/auth")
+async def healthz_auth():
+    return {**token_cache.stats(), "passwords": password_pool.stats(), "rate_limit": rate_limiter.stats()}
+
+@app.get("/healthz/ai")
+async def healthz_ai():
+    return {**ai_pool.stats(), "cache": ai_cache.stats()}
+
+@app.get("/healthz/jobs")
+async def healthz_jobs():
+    return jobs.stats()
+
+@app.get("/healthz/feed")
+async def healthz_feed():
+    return {**feed_hub.stats(), "cache": feed_cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Public runtime configuration for the frontend (no secrets). Returns JS.
 @app.get("/config.js", response_class=PlainTextResponse)
 async def public_config_js():
@@ -263,11 +1168,186 @@ class Flashcard(BaseModel):
     difficulty: str = "medium"
     note_id: Optional[str] = None
 
+class FlashcardReview(BaseModel):
+    card_id: str
+    confidence: int  # 0-5
+    reviewed_at: Optional[datetime] = None
+
 class StudySession(BaseModel):
     duration: int  # in minutes
 
+# ============= PAGINATION =============
+# List endpoints page with an opaque keyset cursor over (sort key, id), so every
+# page is an index range read no matter how deep it is. The next cursor is sent
+# in the X-Next-Cursor header (and as next_cursor in object-shaped bodies).
+
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(sort_key: str, row_id: str) -> str:
+    raw = json.dumps([sort_key, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key, row_id = json.loads(raw)
+        return str(sort_key), str(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def paginate(rows: list, limit: int, response: Response, sort_key: str = "created_at") -> tuple:
+    """Trim the extra look-ahead row and set X-Next-Cursor; returns (rows, next_cursor)"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][sort_key], rows[-1]["id"])
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows, next_cursor
+
+# ============= CONDITIONAL GET =============
+# List ETags come from the collection_versions counters (migration 10) rather
+# than the response body, so a matching If-None-Match is answered with a 304
+# after one primary-key lookup instead of the list query. The tag also covers
+# the caller and the query string, since both change what the list contains.
+
+def parse_if_none_match(header: Optional[str]) -> set:
+    return {tag.strip() for tag in (header or "").split(",") if tag.strip()}
+
+async def not_modified(request: Request, response: Response, db: aiosqlite.Connection, user_id: str,
+                       collections: tuple, salt: str = "") -> Optional[Response]:
+    """
+    Set a weak ETag for the current state of `collections` on `response`; return
+    the 304 to send instead when the client already holds that version.
+    """
+    keys = [(user_id if VERSIONED_COLLECTIONS[c] else FEED_OWNER, c) for c in collections]
+    # One primary-key probe per key; a row-value IN (VALUES ...) list of several keys is planned as a full scan
+    cursor = await db.execute(
+        f"SELECT collection, version FROM collection_versions WHERE {' OR '.join(['(user_id = ? AND collection = ?)'] * len(keys))}",
+        [v for key in keys for v in key]
+    )
+    versions = dict(await cursor.fetchall())
+    state = [user_id, request.url.path, sorted(request.query_params.multi_items()), [versions.get(c, 0) for c in collections], salt]
+    etag = f'W/"v-{hashlib.sha1(json.dumps(state).encode()).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in parse_if_none_match(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# ============= PASSWORD HASHING =============
+# Passwords are stored as `scheme$params$salt$hash` with a random per-user salt:
+# scrypt by default (memory-hard), PBKDF2-SHA256 when PASSWORD_HASHER=pbkdf2.
+# Rows from before this scheme hold an unsalted SHA-256 hex digest; they still
+# verify, and are rehashed with the current scheme on the next successful login
+# (as are rows hashed with older parameters). hashlib releases the GIL for both
+# KDFs, so they run on a small thread pool instead of the event loop. The pool
+# admits at most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE hashes at once;
+# anything beyond that is turned away with a 503 rather than queued.
+
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "scrypt")
+SCRYPT_N = int(os.getenv("SCRYPT_N", "16384"))  # 16 MiB per hash with r=8
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
+if PASSWORD_HASHER not in ("scrypt", "pbkdf2"):
+    raise ValueError(f"Unsupported PASSWORD_HASHER: {PASSWORD_HASHER}")
+
+def b64encode_raw(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip("=")
+
+def b64decode_raw(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def scrypt_digest(password: str, salt: bytes, n: int, r: int, p: int, dklen: int = 32) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=dklen)
+
 def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Salted hash with the configured scheme. Blocking; runs on password_pool."""
+    salt = os.urandom(16)
+    if PASSWORD_HASHER == "scrypt":
+        digest = scrypt_digest(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${b64encode_raw(salt)}${b64encode_raw(digest)}"
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${b64encode_raw(salt)}${b64encode_raw(digest)}"
+
+def verify_password(password: str, stored: Optional[str]) -> tuple:
+    """Returns (matches, needs_rehash). Blocking; runs on password_pool."""
+    parts = (stored or "").split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        n, r, p = (int(v) for v in parts[1:4])
+        expected = b64decode_raw(parts[5])
+        digest = scrypt_digest(password, b64decode_raw(parts[4]), n, r, p, len(expected))
+        current = PASSWORD_HASHER == "scrypt" and (n, r, p) == (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        iterations = int(parts[1])
+        expected = b64decode_raw(parts[3])
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), b64decode_raw(parts[2]), iterations)
+        current = PASSWORD_HASHER == "pbkdf2" and iterations == PBKDF2_ITERATIONS
+    elif len(parts) == 1 and len(parts[0]) == 64:
+        # Legacy unsalted SHA-256
+        expected = parts[0].encode()
+        digest = hashlib.sha256(password.encode()).hexdigest().encode()
+        current = False
+    else:
+        return False, False
+    matches = hmac.compare_digest(digest, expected)
+    return matches, matches and not current
+
+class PasswordHashPool:
+    """Bounded thread pool for password hashing and verification"""
+
+    def __init__(self, workers: int, queue: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.workers = workers
+        self.capacity = workers + queue
+        self.inflight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_ms = 0.0
+        self._dummy: Optional[str] = None
+
+    async def run(self, fn, *args):
+        if self.inflight >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many sign-ins in progress, try again shortly",
+                                headers={"Retry-After": "1"})
+        self.inflight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.inflight -= 1
+            self.completed += 1
+            self.total_ms += (time.perf_counter() - started) * 1000
+
+    async def dummy_hash(self) -> str:
+        """A current-scheme hash to verify against when the account doesn't exist"""
+        if self._dummy is None:
+            self._dummy = await self.run(hash_password, os.urandom(16).hex())
+        return self._dummy
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "scheme": PASSWORD_HASHER,
+            "workers": self.workers,
+            "inflight": self.inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.total_ms / self.completed, 1) if self.completed else 0.0,
+        }
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
 
 def create_token(user_id: str) -> str:
     payload = {
@@ -276,268 +1356,985 @@ def create_token(user_id: str) -> str:
     }
     return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+# ============= RATE LIMITING =============
+# Token buckets, refilled continuously: each authenticated request spends tokens
+# from its user's bucket (the uid from get_current_user), /api/auth/* requests
+# spend from their client IP's bucket, and AI requests also spend from one bucket
+# shared by everyone so a few users can't use up the Gemini quota. What a request
+# costs depends on its class: AI, write (anything but GET/HEAD) or read.
+# Buckets live in memory, per worker. One that has been idle long enough to
+# refill completely is the same as a new one, so it is dropped on the next sweep.
+# Responses carry RateLimit-Limit/-Remaining/-Reset; 429s also carry Retry-After.
+# Behind a proxy, set FORWARDED_ALLOW_IPS (read by uvicorn) so client IPs are real.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "2"))  # tokens per second per user
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))
+RATE_LIMIT_COST_READ = float(os.getenv("RATE_LIMIT_COST_READ", "1"))
+RATE_LIMIT_COST_WRITE = float(os.getenv("RATE_LIMIT_COST_WRITE", "2"))
+RATE_LIMIT_COST_AI = float(os.getenv("RATE_LIMIT_COST_AI", "10"))
+RATE_LIMIT_AUTH_RATE = float(os.getenv("RATE_LIMIT_AUTH_RATE", "0.2"))  # per IP
+RATE_LIMIT_AUTH_BURST = float(os.getenv("RATE_LIMIT_AUTH_BURST", "10"))
+RATE_LIMIT_AI_GLOBAL_RATE = float(os.getenv("RATE_LIMIT_AI_GLOBAL_RATE", "5"))  # AI requests per second, all users
+RATE_LIMIT_AI_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_AI_GLOBAL_BURST", "50"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+AI_PATH_PREFIXES = ("/api/ai/", "/api/flashcards/generate")
+
+for _name, _rate, _burst, _cost in [
+    ("RATE_LIMIT", RATE_LIMIT_RATE, RATE_LIMIT_BURST,
+     max(RATE_LIMIT_COST_READ, RATE_LIMIT_COST_WRITE, RATE_LIMIT_COST_AI)),
+    ("RATE_LIMIT_AUTH", RATE_LIMIT_AUTH_RATE, RATE_LIMIT_AUTH_BURST, 1),
+    ("RATE_LIMIT_AI_GLOBAL", RATE_LIMIT_AI_GLOBAL_RATE, RATE_LIMIT_AI_GLOBAL_BURST, 1),
+]:
+    if not _rate > 0:
+        raise ValueError(f"{_name}_RATE must be positive, got {_rate}")
+    if not _burst >= _cost:
+        raise ValueError(f"{_name}_BURST must cover the largest request cost ({_cost}), got {_burst}")
+
+class RateLimiter:
+    """Token buckets by key, least recently used first"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets: OrderedDict = OrderedDict()  # key -> [tokens, updated_at, full_at]
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> tuple:
+        """Spend `cost` tokens if the bucket has them; returns (allowed, headers)"""
+        now = time.monotonic()
+        bucket = self.buckets.pop(key, None)
+        tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.buckets[key] = [tokens, now, now + (burst - tokens) / rate]
+        self._sweep(now)
+        headers = {
+            "RateLimit-Limit": str(int(burst)),
+            "RateLimit-Remaining": str(int(tokens)),
+            "RateLimit-Reset": str(math.ceil((burst - tokens) / rate)),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(math.ceil((cost - tokens) / rate))
+        return allowed, headers
+
+    def refund(self, key: str, cost: float):
+        if (bucket := self.buckets.get(key)) is not None:
+            bucket[0] += cost
+
+    def _sweep(self, now: float):
+        while self.buckets:
+            key, bucket = next(iter(self.buckets.items()))
+            if bucket[2] > now and len(self.buckets) <= self.max_keys:
+                break
+            del self.buckets[key]
+            self.evicted += 1
+
+    def check(self, request: Request, key: str, rate: float, burst: float, cost: float):
+        """
+        Charge one request to `key` (and to the global AI bucket for AI routes); 429 if either
+        is empty. The RateLimit headers are added to whatever response the endpoint returns
+        by RateLimitHeadersMiddleware.
+        """
+        if not RATE_LIMIT_ENABLED:
+            return
+        allowed, headers = self.take(key, cost, rate, burst)
+        if allowed and request.url.path.startswith(AI_PATH_PREFIXES):
+            allowed, global_headers = self.take("ai:*", 1, RATE_LIMIT_AI_GLOBAL_RATE, RATE_LIMIT_AI_GLOBAL_BURST)
+            if not allowed:
+                self.refund(key, cost)
+                headers = global_headers
+        if not allowed:
+            self.limited += 1
+            raise HTTPException(status_code=429, detail="Too many requests, slow down", headers=headers)
+        self.allowed += 1
+        request.state.rate_limit_headers = headers
+
+    def stats(self) -> dict:
+        return {"enabled": RATE_LIMIT_ENABLED, "keys": len(self.buckets), "allowed": self.allowed,
+                "limited": self.limited, "evicted": self.evicted}
+
+rate_limiter = RateLimiter(RATE_LIMIT_MAX_KEYS)
+
+class RateLimitHeadersMiddleware:
     """
-    Verify Firebase ID token and return the user ID (Firebase UID)
+    Copies the headers RateLimiter.check left in the request state onto the response
+    start, so they also reach 304s and streamed (SSE/NDJSON) responses
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = scope.get("state", {}).get("rate_limit_headers")
+                if headers:
+                    message.setdefault("headers", [])
+                    MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+app.add_middleware(RateLimitHeadersMiddleware)
+# Outermost, so timings include compression and every other middleware
+app.add_middleware(MetricsMiddleware)
+
+def request_cost(request: Request) -> float:
+    if request.url.path.startswith(AI_PATH_PREFIXES):
+        return RATE_LIMIT_COST_AI
+    if request.method in ("GET", "HEAD"):
+        return RATE_LIMIT_COST_READ
+    return RATE_LIMIT_COST_WRITE
+
+async def limit_by_ip(request: Request):
+    """Dependency for the unauthenticated /api/auth/* routes"""
+    ip = request.client.host if request.client else "unknown"
+    rate_limiter.check(request, f"ip:{ip}", RATE_LIMIT_AUTH_RATE, RATE_LIMIT_AUTH_BURST, 1)
+
+# ============= TOKEN VERIFICATION CACHE =============
+# Verifying an ID token is a full RS256 check (and possibly a certificate fetch),
+# so verified tokens are remembered by SHA-256 hash until they expire or the TTL
+# runs out, whichever comes first. Misses are verified on a small thread pool so
+# they never block the event loop.
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+AUTH_VERIFY_WORKERS = int(os.getenv("AUTH_VERIFY_WORKERS", "4"))
+
+auth_executor = ThreadPoolExecutor(max_workers=AUTH_VERIFY_WORKERS, thread_name_prefix="auth-verify")
+
+class TokenCache:
+    """Bounded LRU of verified tokens (hash -> (uid, expires_at)) with revocation"""
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._revoked: dict = {}  # token hash -> token exp, kept until the token expires
+        self.inflight: dict = {}  # token hash -> pending verification
+        self.hits = 0
+        self.misses = 0
+        self.revocations = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, uid: str, exp: float):
+        self._entries[key] = (uid, min(exp, time.time() + self.ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def is_revoked(self, key: str) -> bool:
+        exp = self._revoked.get(key)
+        if exp is None:
+            return False
+        if exp <= time.time():
+            del self._revoked[key]
+            return False
+        return True
+
+    def revoke(self, key: str, exp: float):
+        self._entries.pop(key, None)
+        now = time.time()
+        # Drop revocations whose tokens have expired anyway
+        for k in [k for k, e in self._revoked.items() if e <= now]:
+            del self._revoked[k]
+        self._revoked[key] = exp
+        self.revocations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revoked": len(self._revoked),
+            "revocations": self.revocations,
+        }
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+def verify_token(token: str) -> tuple:
+    """Blocking verification; returns (uid, exp). Runs on auth_executor."""
+    if FIREBASE_AVAILABLE:
+        # Verify Firebase ID token
+        decoded_token = firebase_auth.verify_id_token(token)
+        return decoded_token['uid'], float(decoded_token['exp'])
+    # Fallback to JWT if Firebase not available
+    payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    return payload["user_id"], float(payload["exp"])
+
+async def verify_token_cached(token: str) -> tuple:
+    """Returns (uid, exp), verifying at most once per token across concurrent requests"""
+    key = TokenCache.key(token)
+    if token_cache.is_revoked(key):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    entry = token_cache.get(key)
+    if entry is not None:
+        token_cache.hits += 1
+        return entry
+    token_cache.misses += 1
+    pending = token_cache.inflight.get(key)
+    if pending is None:
+        loop = asyncio.get_running_loop()
+        pending = asyncio.ensure_future(loop.run_in_executor(auth_executor, verify_token, token))
+        token_cache.inflight[key] = pending
+        pending.add_done_callback(lambda _: token_cache.inflight.pop(key, None))
+        started = time.perf_counter()
+        pending.add_done_callback(lambda f: TOKEN_VERIFY_SECONDS.labels(
+            "ok" if not f.cancelled() and f.exception() is None else "error"
+        ).observe(time.perf_counter() - started))
+    uid, exp = await asyncio.shield(pending)
+    if not token_cache.is_revoked(key):
+        token_cache.put(key, uid, exp)
+    return uid, exp
+
+async def get_current_user(request: Request,
+                           credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """
+    Verify Firebase ID token and return the user ID (Firebase UID), charging the
+    request to that user's rate limit
     """
     try:
-        if FIREBASE_AVAILABLE:
-            # Verify Firebase ID token
-            decoded_token = firebase_auth.verify_id_token(credentials.credentials)
-            return decoded_token['uid']
-        else:
-            # Fallback to JWT if Firebase not available
-            payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
-            return payload["user_id"]
+        uid, _ = await verify_token_cached(credentials.credentials)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[Auth] Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    rate_limiter.check(request, f"user:{uid}", RATE_LIMIT_RATE, RATE_LIMIT_BURST, request_cost(request))
+    return uid
+
+@app.post("/api/auth/logout", dependencies=[Depends(limit_by_ip)])
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Revoke the presented token so it is rejected for the rest of its lifetime"""
+    try:
+        _, exp = await verify_token_cached(credentials.credentials)
+    except Exception:
+        # Already invalid, expired or revoked: nothing left to revoke
+        return {"success": True}
+    token_cache.revoke(TokenCache.key(credentials.credentials), exp)
+    return {"success": True}
 
-@app.post("/api/auth/register")
+@app.post("/api/auth/register", dependencies=[Depends(limit_by_ip)])
 async def register(user: UserRegister):
     user_id = str(uuid.uuid4())
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await password_pool.run(hash_password, user.password)
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        try:
-            await db.execute(
-                "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)",
-                (user_id, user.email, hashed_pw, user.first_name, user.last_name, datetime.now(timezone.utc).isoformat())
-            )
-            await db.commit()
-        except:
-            raise HTTPException(status_code=400, detail="Email already exists")
+    async def write(db):
+        await db.execute(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, user.email, hashed_pw, user.first_name, user.last_name, datetime.now(timezone.utc).isoformat())
+        )
+    try:
+        await db_pool.write(write)
+    except aiosqlite.IntegrityError:
+        raise HTTPException(status_code=400, detail="Email already exists")
     
     return {"access_token": create_token(user_id)}
 
-@app.post("/api/auth/login")
+@app.post("/api/auth/login", dependencies=[Depends(limit_by_ip)])
 async def login(user: UserLogin):
-    hashed_pw = hash_password(user.password)
-    
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT id FROM users WHERE email = ? AND password = ?",
-            (user.email, hashed_pw)
-        )
+    # Not Depends(get_db): the connection would be held for the whole KDF run
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT id, password FROM users WHERE email = ?", (user.email,))
         row = await cursor.fetchone()
+    # Unknown emails still cost one verification, so timing doesn't reveal which accounts exist
+    stored = row[1] if row else await password_pool.dummy_hash()
+    matches, needs_rehash = await password_pool.run(verify_password, user.password, stored)
         
-        if not row:
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not row or not matches:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if needs_rehash:
+        new_hash = await password_pool.run(hash_password, user.password)
+        async def write(db):
+            # Skipped if the password changed since it was read
+            await db.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?", (new_hash, row[0], stored))
+        try:
+            await db_pool.write(write)
+            password_pool.rehashed += 1
+        except Exception as e:
+            print(f"[Auth] Could not upgrade password hash: {type(e).__name__}: {e}")
         
-        return {"access_token": create_token(row[0])}
+    return {"access_token": create_token(row[0])}
 
 @app.get("/api/notes")
-async def get_notes(user_id: str = Depends(get_current_user), limit: int = 50):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT id, title, content, subject, created_at FROM notes WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
-            (user_id, limit)
-        )
-        rows = await cursor.fetchall()
-        return [{"id": r[0], "title": r[1], "content": r[2], "subject": r[3], "created_at": r[4]} for r in rows]
+async def get_notes(request: Request, response: Response, user_id: str = Depends(get_current_user), limit: int = 50, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    if cached := await not_modified(request, response, db, user_id, ("notes",)):
+        return cached
+    limit = page_size(limit)
+    where, params = "user_id = ?", [user_id]
+    if cursor:
+        where += " AND (created_at, id) < (?, ?)"
+        params += decode_cursor(cursor)
+    cur = await db.execute(
+        f"SELECT id, title, content, subject, created_at FROM notes WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1)
+    )
+    rows, _ = paginate(await cur.fetchall(), limit, response)
+    return [{"id": r[0], "title": r[1], "content": r[2], "subject": r[3], "created_at": r[4]} for r in rows]
 
 @app.post("/api/notes")
 async def create_note(note: Note, user_id: str = Depends(get_current_user)):
     note_id = str(uuid.uuid4())
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
         await db.execute(
             "INSERT INTO notes (id, user_id, title, content, subject, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (note_id, user_id, note.title, note.content, note.subject, datetime.now(timezone.utc).isoformat())
         )
-        await db.commit()
+        await bump_analytics(db, user_id, notes={note.subject: 1})
+    await db_pool.write(write)
     return {"id": note_id}
 
 @app.delete("/api/notes/{note_id}")
 async def delete_note(note_id: str, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM notes WHERE id = ? AND user_id = ?", (note_id, user_id))
-        await db.commit()
+    async def write(db):
+        cursor = await db.execute("DELETE FROM notes WHERE id = ? AND user_id = ? RETURNING subject", (note_id, user_id))
+        for (subject,) in await cursor.fetchall():
+            await bump_analytics(db, user_id, notes={subject: -1})
+    await db_pool.write(write)
     return {"success": True}
 
 @app.get("/api/study/tasks")
-async def get_tasks(user_id: str = Depends(get_current_user), status: str = "all", limit: int = 50):
-    async with aiosqlite.connect(DB_PATH) as db:
-        if status == "all":
-            cursor = await db.execute(
-                "SELECT id, title, description, subject, priority, due_date, estimated_time, status, created_at FROM tasks WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
-                (user_id, limit)
-            )
-        else:
-            cursor = await db.execute(
-                "SELECT id, title, description, subject, priority, due_date, estimated_time, status, created_at FROM tasks WHERE user_id = ? AND status = ? ORDER BY created_at DESC LIMIT ?",
-                (user_id, status, limit)
-            )
-        rows = await cursor.fetchall()
-        return [{"id": r[0], "title": r[1], "description": r[2], "subject": r[3], "priority": r[4], "due_date": r[5], "estimated_time": r[6], "status": r[7], "created_at": r[8]} for r in rows]
+async def get_tasks(request: Request, response: Response, user_id: str = Depends(get_current_user), status: str = "all", limit: int = 50, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    if cached := await not_modified(request, response, db, user_id, ("tasks",)):
+        return cached
+    limit = page_size(limit)
+    where, params = "user_id = ?", [user_id]
+    if status != "all":
+        where += " AND status = ?"
+        params.append(status)
+    if cursor:
+        where += " AND (created_at, id) < (?, ?)"
+        params += decode_cursor(cursor)
+    cur = await db.execute(
+        f"SELECT id, title, description, subject, priority, due_date, estimated_time, status, created_at FROM tasks WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1)
+    )
+    rows, _ = paginate(await cur.fetchall(), limit, response)
+    return [{"id": r[0], "title": r[1], "description": r[2], "subject": r[3], "priority": r[4], "due_date": r[5], "estimated_time": r[6], "status": r[7], "created_at": r[8]} for r in rows]
 
 @app.post("/api/study/tasks")
 async def create_task(task: Task, user_id: str = Depends(get_current_user)):
     task_id = str(uuid.uuid4())
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
         await db.execute(
             "INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (task_id, user_id, task.title, task.description, task.subject, task.priority, task.status, task.due_date, task.estimated_time, datetime.now(timezone.utc).isoformat())
         )
-        await db.commit()
+        await bump_analytics(db, user_id, tasks={task.status: 1})
+    await db_pool.write(write)
     return {"id": task_id}
 
 @app.put("/api/study/tasks/{task_id}")
 async def update_task(task_id: str, task: Task, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
+        cursor = await db.execute("SELECT status FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
+        old = await cursor.fetchone()
         await db.execute(
             "UPDATE tasks SET title=?, description=?, subject=?, priority=?, due_date=?, estimated_time=?, status=? WHERE id=? AND user_id=?",
             (task.title, task.description, task.subject, task.priority, task.due_date, task.estimated_time, task.status, task_id, user_id)
         )
-        await db.commit()
+        if old and old[0] != task.status:
+            await bump_analytics(db, user_id, tasks={old[0]: -1, task.status: 1})
+    await db_pool.write(write)
     return {"success": True}
 
 @app.delete("/api/study/tasks/{task_id}")
 async def delete_task(task_id: str, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
-        await db.commit()
+    async def write(db):
+        cursor = await db.execute("DELETE FROM tasks WHERE id = ? AND user_id = ? RETURNING status", (task_id, user_id))
+        for (status,) in await cursor.fetchall():
+            await bump_analytics(db, user_id, tasks={status: -1})
+    await db_pool.write(write)
     return {"success": True}
 
-@app.get("/api/community/posts")
-async def get_posts(user_id: str = Depends(get_current_user), limit: int = 50):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            """
-            SELECT p.id,
-                   p.title,
-                   p.content,
-                   u.email,
-                   u.first_name,
-                   u.last_name,
-                   p.user_id,
-                   p.created_at,
-                   (SELECT COUNT(*) FROM post_likes pl WHERE pl.post_id = p.id) AS likes,
-                   EXISTS(SELECT 1 FROM post_likes pl2 WHERE pl2.post_id = p.id AND pl2.user_id = ?) AS liked
-            FROM posts p
-            LEFT JOIN users u ON u.id = p.user_id
-            ORDER BY p.created_at DESC
-            LIMIT ?
-            """,
-            (user_id, limit)
-        )
-        rows = await cursor.fetchall()
-        posts = []
-        for r in rows:
-            posts.append({
-                "id": r[0],
-                "title": r[1],
-                "content": r[2],
-                "author_email": r[3],
-                "author_first_name": r[4],
-                "author_last_name": r[5],
-                "author_id": r[6],
-                "created_at": r[7],
-                "likes": r[8],
-                "liked": bool(r[9]),
-                "can_delete": r[6] == user_id
-            })
-        return {"posts": posts}
+async def query_posts(db: aiosqlite.Connection, user_id: str, limit: int, cursor: Optional[str] = None) -> list:
+    """Fetch up to limit + 1 feed rows (newest first) as seen by `user_id`"""
+    where, params = "", [user_id]
+    if cursor:
+        where = "WHERE (p.created_at, p.id) < (?, ?)"
+        params += decode_cursor(cursor)
+    cur = await db.execute(
+        f"""
+        SELECT p.id,
+               p.title,
+               p.content,
+               u.email,
+               u.first_name,
+               u.last_name,
+               p.user_id,
+               p.created_at,
+               p.likes,
+               EXISTS(SELECT 1 FROM post_likes pl WHERE pl.post_id = p.id AND pl.user_id = ?) AS liked,
+               p.comment_count
+        FROM posts p
+        LEFT JOIN users u ON u.id = p.user_id
+        {where}
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT ?
+        """,
+        (*params, limit + 1)
+    )
+    return await cur.fetchall()
 
-@app.post("/api/community/posts")
-async def create_post(post: Post, user_id: str = Depends(get_current_user)):
-    post_id = str(uuid.uuid4())
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO posts (id, user_id, title, content, likes, created_at) VALUES (?, ?, ?, ?, 0, ?)",
-            (post_id, user_id, post.title, post.content, datetime.now(timezone.utc).isoformat())
-        )
-        await db.commit()
-    return {"id": post_id}
+def post_to_dict(r, user_id: str) -> dict:
+    return {
+        "id": r[0],
+        "title": r[1],
+        "content": r[2],
+        "author_email": r[3],
+        "author_first_name": r[4],
+        "author_last_name": r[5],
+        "author_id": r[6],
+        "created_at": r[7],
+        "likes": r[8],
+        "liked": bool(r[9]),
+        "comment_count": r[10],
+        "can_delete": r[6] == user_id
+    }
 
-@app.delete("/api/community/posts/{post_id}")
-async def delete_post(post_id: str, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT user_id FROM posts WHERE id = ?", (post_id,))
-        row = await cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Post not found")
-        if row[0] != user_id:
-            raise HTTPException(status_code=403, detail="Not allowed to delete this post")
+# ============= COMMUNITY FEED STREAM =============
+# Viewers on the community tab hold one SSE connection to /api/community/stream
+# and receive post, like and comment deltas instead of reloading the feed. Each
+# event is encoded once and the same bytes are queued for every subscriber, so a
+# publish costs one put_nowait per connection. A subscriber whose queue fills up
+# is dropped with a `reset` event and reloads the feed when it reconnects.
+# Streams also end after FEED_MAX_STREAM_SECONDS so tokens are re-checked, and
+# uvicorn is run with a graceful-shutdown timeout so open streams can't hold
+# up a restart.
+# Events reach the hub through a broker: LocalBroker delivers within this
+# process; SQLiteBroker relays through the feed_events table (migration 11) so
+# several workers sharing the database see each other's events. Who liked what
+# stays server-side: listeners get the whole event, subscribers don't.
 
-        await db.execute("DELETE FROM posts WHERE id = ?", (post_id,))
-        await db.execute("DELETE FROM post_likes WHERE post_id = ?", (post_id,))
-        await db.commit()
-    return {"success": True}
+FEED_BROKER = os.getenv("FEED_BROKER", "local")
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "25"))
+FEED_MAX_STREAM_SECONDS = float(os.getenv("FEED_MAX_STREAM_SECONDS", "900"))  # clients reconnect (and re-authenticate)
+FEED_POLL_MS = float(os.getenv("FEED_POLL_MS", "200"))
+FEED_EVENT_RETENTION_SECONDS = int(os.getenv("FEED_EVENT_RETENTION_SECONDS", "300"))
+FEED_PRIVATE_FIELDS = ("user_id", "liked")  # for in-process listeners only, never sent to viewers
 
-@app.post("/api/community/posts/{post_id}/like")
-async def like_post(post_id: str, user_id: str = Depends(get_current_user)):
-    like_id = str(uuid.uuid4())
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
-        if not await cur.fetchone():
-            raise HTTPException(status_code=404, detail="Post not found")
+class LocalBroker:
+    """Delivers events to subscribers of this process only"""
 
-        try:
+    async def start(self, deliver):
+        self.deliver = deliver
+
+    async def publish(self, event: dict):
+        self.deliver(event)
+
+    async def stop(self):
+        pass
+
+class SQLiteBroker:
+    """Relays events between worker processes through the shared feed_events table"""
+
+    def __init__(self, poll_ms: float, retention_seconds: int):
+        self.poll_seconds = poll_ms / 1000
+        self.retention_seconds = retention_seconds
+        self.last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver):
+        self.deliver = deliver
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM feed_events")
+            self.last_id = (await cursor.fetchone())[0]
+        self._task = asyncio.create_task(self._poll())
+
+    async def publish(self, event: dict):
+        now = datetime.now(timezone.utc)
+        async def write(db):
+            await db.execute("INSERT INTO feed_events (payload, created_at) VALUES (?, ?)", (json.dumps(event), now.isoformat()))
             await db.execute(
-                "INSERT OR IGNORE INTO post_likes (id, post_id, user_id, created_at) VALUES (?, ?, ?, ?)",
-                (like_id, post_id, user_id, datetime.now(timezone.utc).isoformat())
+                "DELETE FROM feed_events WHERE created_at < ?",
+                ((now - timedelta(seconds=self.retention_seconds)).isoformat(),)
             )
-            await db.commit()
+        await db_pool.write(write)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                async with db_pool.reader() as db:
+                    cursor = await db.execute("SELECT id, payload FROM feed_events WHERE id > ? ORDER BY id", (self.last_id,))
+                    rows = await cursor.fetchall()
+            except Exception as e:
+                print(f"[Feed] Polling feed_events failed: {type(e).__name__}: {e}")
+                continue
+            for event_id, payload in rows:
+                self.last_id = event_id
+                self.deliver(json.loads(payload))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class FeedSubscriber:
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.dropped = False
+
+class FeedHub:
+    def __init__(self, broker, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.subscribers: set = set()
+        self.listeners: list = []  # in-process consumers of every event, e.g. the feed cache
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        await self.broker.start(self._fan_out)
+
+    async def stop(self):
+        await self.broker.stop()
+
+    async def publish(self, kind: str, **data):
+        """Send a delta to every viewer; the write it describes has already committed, so failures are only logged"""
+        try:
+            await self.broker.publish({"type": kind, **data})
+            self.published += 1
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            print(f"[Feed] Could not publish {kind}: {type(e).__name__}: {e}")
+
+    def _fan_out(self, event: dict):
+        for listener in self.listeners:
+            listener(event)
+        public = {key: value for key, value in event.items() if key not in FEED_PRIVATE_FIELDS}
+        frame = sse_event(public, event["type"]).encode()
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self.subscribers.discard(subscriber)
+                self.dropped += 1
+
+    async def stream(self, user_id: str):
+        """SSE frames for one connection, until the client goes away or falls too far behind"""
+        subscriber = FeedSubscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        deadline = time.monotonic() + FEED_MAX_STREAM_SECONDS
+        try:
+            yield sse_event({"user_id": user_id}, "ready").encode()
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    async with asyncio.timeout(min(FEED_HEARTBEAT_SECONDS, remaining)):
+                        frame = await subscriber.queue.get()
+                except TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                # Whatever else queued up meanwhile goes out in the same write
+                while not subscriber.queue.empty():
+                    frame += subscriber.queue.get_nowait()
+                yield frame
+                if subscriber.dropped and subscriber.queue.empty():
+                    yield sse_event({"detail": "Too far behind; reload the feed"}, "reset").encode()
+                    return
+        finally:
+            self.subscribers.discard(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__,
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+if FEED_BROKER not in ("local", "sqlite"):
+    raise ValueError(f"Unsupported FEED_BROKER: {FEED_BROKER}")
+feed_hub = FeedHub(
+    SQLiteBroker(FEED_POLL_MS, FEED_EVENT_RETENTION_SECONDS) if FEED_BROKER == "sqlite" else LocalBroker(),
+    FEED_QUEUE_SIZE
+)
+
+# ============= FEED CACHE =============
+# Every viewer of the community tab asks for the same newest page, so the first
+# FEED_CACHE_POSTS posts are kept in memory as viewer-independent dicts and the
+# per-viewer fields are merged in on the way out: `can_delete` from author_id
+# and `liked` from a small per-user set of liked post ids (LRU, loaded once per
+# user through idx_post_likes_user_post). The cache listens to the feed hub, so
+# create/delete/like/unlike/comment writes update it in place, including ones
+# relayed from other workers by SQLiteBroker. Events carry absolute counts, so
+# replaying those that arrive during a load is idempotent. A cold or expired
+# cache is loaded once however many requests are waiting (single flight); the
+# TTL only bounds drift from writes that don't publish, like reconcile-counters.
+# Pages that reach past the cached window fall through to query_posts.
+
+FEED_CACHE_POSTS = int(os.getenv("FEED_CACHE_POSTS", "200"))  # 0 disables the cache
+FEED_CACHE_TTL_SECONDS = float(os.getenv("FEED_CACHE_TTL_SECONDS", "60"))
+FEED_LIKED_SETS = int(os.getenv("FEED_LIKED_SETS", "10000"))
+FEED_POST_FIELDS = (
+    "id", "title", "content", "author_email", "author_first_name", "author_last_name",
+    "author_id", "created_at", "likes", "comment_count"
+)
+
+class FeedCache:
+    """Newest posts plus per-user liked-sets, kept current from feed hub events"""
+
+    def __init__(self, size: int, ttl: float, max_users: int):
+        self.size = size
+        self.ttl = ttl
+        self.max_users = max_users
+        self.posts: Optional[list] = None  # newest first
+        self.by_id: dict = {}
+        self.complete = False  # True when the window holds every post
+        self.loaded_at = 0.0
+        self.generation = 0  # bumped by every load and event
+        self.liked: OrderedDict = OrderedDict()  # user_id -> set of liked post ids
+        self._loading: Optional[asyncio.Future] = None
+        self._pending: Optional[list] = None  # events seen while a load is running
+        self._liked_loading: dict = {}  # user_id -> pending load
+        self._liked_pending: dict = {}  # user_id -> like events seen while it runs
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _position(posts: list, key: tuple) -> int:
+        """Index of the first post that sorts after `key` in feed order"""
+        for i, post in enumerate(posts):
+            if (post["created_at"], post["id"]) < key:
+                return i
+        return len(posts)
+
+    def apply(self, event: dict):
+        """Feed hub listener"""
+        kind = event["type"]
+        self.generation += 1
+        if kind == "post_liked":
+            self._apply_like(self.liked.get(event["user_id"]), event)
+            if (pending := self._liked_pending.get(event["user_id"])) is not None:
+                pending.append(event)
+        if self._pending is not None:
+            self._pending.append(event)
+        if self.posts is not None:
+            self._apply_post(event)
+
+    @staticmethod
+    def _apply_like(liked: Optional[set], event: dict):
+        if liked is None:
+            return
+        if event["liked"]:
+            liked.add(event["post_id"])
+        else:
+            liked.discard(event["post_id"])
+
+    def _apply_post(self, event: dict):
+        kind = event["type"]
+        if kind == "post_created":
+            post = event["post"]
+            if post["id"] in self.by_id:
+                return
+            entry = {field: post[field] for field in FEED_POST_FIELDS}
+            self.posts.insert(self._position(self.posts, (entry["created_at"], entry["id"])), entry)
+            self.by_id[entry["id"]] = entry
+            if len(self.posts) > self.size:
+                del self.by_id[self.posts.pop()["id"]]
+                self.complete = False
+        elif kind == "post_deleted":
+            entry = self.by_id.pop(event["post_id"], None)
+            if entry is not None:
+                self.posts.remove(entry)
+                if not self.complete and len(self.posts) < self.size // 2:
+                    self.loaded_at = 0.0  # refill the window on the next read
+        elif kind == "post_liked":
+            if (entry := self.by_id.get(event["post_id"])) is not None:
+                entry["likes"] = event["likes"]
+        elif kind in ("comment_created", "comment_deleted"):
+            if (entry := self.by_id.get(event["post_id"])) is not None:
+                entry["comment_count"] = event["comment_count"]
+
+    async def _window(self, db: aiosqlite.Connection) -> list:
+        if self.posts is not None and time.monotonic() - self.loaded_at < self.ttl:
+            self.hits += 1
+            return self.posts
+        self.misses += 1
+        if self._loading is None:
+            # Runs on the first caller's connection: a second pooled reader could deadlock
+            # against requests that each hold one while waiting on this load
+            self._loading = asyncio.ensure_future(self._load(db))
+        return await asyncio.shield(self._loading)
+
+    async def _load(self, db: aiosqlite.Connection) -> list:
+        self._pending = []
+        try:
+            rows = await query_posts(db, "", self.size)
+            posts = [{field: post[field] for field in FEED_POST_FIELDS} for post in (post_to_dict(r, "") for r in rows[:self.size])]
+            self.posts, self.by_id = posts, {post["id"]: post for post in posts}
+            self.complete = len(rows) <= self.size
+            for event in self._pending:
+                self._apply_post(event)
+            self.loaded_at = time.monotonic()
+            self.generation += 1
+            self.loads += 1
+            return self.posts
+        finally:
+            self._pending = None
+            self._loading = None
+
+    async def liked_set(self, db: aiosqlite.Connection, user_id: str) -> set:
+        liked = self.liked.get(user_id)
+        if liked is not None:
+            self.liked.move_to_end(user_id)
+            return liked
+        pending = self._liked_loading.get(user_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load_liked(db, user_id))
+            self._liked_loading[user_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _load_liked(self, db: aiosqlite.Connection, user_id: str) -> set:
+        self._liked_pending[user_id] = []
+        try:
+            cur = await db.execute("SELECT post_id FROM post_likes WHERE user_id = ?", (user_id,))
+            liked = {r[0] for r in await cur.fetchall()}
+            for event in self._liked_pending[user_id]:
+                self._apply_like(liked, event)
+            self.liked[user_id] = liked
+            while len(self.liked) > self.max_users:
+                self.liked.popitem(last=False)
+            return liked
+        finally:
+            self._liked_pending.pop(user_id, None)
+            self._liked_loading.pop(user_id, None)
+
+    async def page(self, db: aiosqlite.Connection, user_id: str, limit: int, cursor: Optional[str] = None) -> Optional[tuple]:
+        """(posts as seen by user_id, next cursor), or None when the page isn't inside the window"""
+        if self.size <= 0:
+            return None
+        key = decode_cursor(cursor) if cursor else None
+        posts = await self._window(db)
+        if key and not self.complete and (not posts or key <= (posts[-1]["created_at"], posts[-1]["id"])):
+            self.fallbacks += 1
+            return None
+        start = self._position(posts, key) if key else 0
+        rows = posts[start:start + limit + 1]
+        if len(rows) <= limit and not self.complete:
+            self.fallbacks += 1
+            return None
+        liked = await self.liked_set(db, user_id)
+        next_cursor = encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return [
+            {**post, "liked": post["id"] in liked, "can_delete": post["author_id"] == user_id}
+            for post in rows[:limit]
+        ], next_cursor
+
+    def etag_salt(self) -> str:
+        """
+        Folded into feed ETags: the version counters can move ahead of the cache
+        (another worker's event still in the relay), and a page rendered from the
+        older window must not be revalidated under the newer tag.
+        """
+        return f":{self.generation}" if self.size > 0 else ""
+
+    def stats(self) -> dict:
+        return {
+            "posts": len(self.posts) if self.posts is not None else None,
+            "complete": self.complete,
+            "generation": self.generation,
+            "liked_sets": len(self.liked),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "fallbacks": self.fallbacks,
+        }
+
+feed_cache = FeedCache(FEED_CACHE_POSTS, FEED_CACHE_TTL_SECONDS, FEED_LIKED_SETS)
+feed_hub.listeners.append(feed_cache.apply)
+
+async def feed_page(db: aiosqlite.Connection, user_id: str, limit: int, response: Optional[Response] = None, cursor: Optional[str] = None) -> tuple:
+    """One feed page as seen by `user_id`; returns (posts, next_cursor)"""
+    page = await feed_cache.page(db, user_id, limit, cursor)
+    if page is None:
+        rows = await query_posts(db, user_id, limit, cursor)
+        page = [post_to_dict(r, user_id) for r in rows[:limit]], (
+            encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        )
+    if response is not None and page[1]:
+        response.headers["X-Next-Cursor"] = page[1]
+    return page
+
+@app.get("/api/community/posts")
+async def get_posts(request: Request, response: Response, user_id: str = Depends(get_current_user), limit: int = 50, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    if cached := await not_modified(request, response, db, user_id, ("posts",), feed_cache.etag_salt()):
+        return cached
+    posts, next_cursor = await feed_page(db, user_id, page_size(limit), response, cursor)
+    return {"posts": posts, "next_cursor": next_cursor}
+
+@app.get("/api/community/stream")
+async def stream_feed(user_id: str = Depends(get_current_user)):
+    """Server-sent post, like and comment deltas for the community tab"""
+    return StreamingResponse(feed_hub.stream(user_id), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/community/posts")
+async def create_post(post: Post, user_id: str = Depends(get_current_user)):
+    post_id = str(uuid.uuid4())
+    created_at = datetime.now(timezone.utc).isoformat()
+    async def write(db):
+        await db.execute(
+            "INSERT INTO posts (id, user_id, title, content, likes, created_at) VALUES (?, ?, ?, ?, 0, ?)",
+            (post_id, user_id, post.title, post.content, created_at)
+        )
+        cur = await db.execute("SELECT email, first_name, last_name FROM users WHERE id = ?", (user_id,))
+        return await cur.fetchone()
+    author = await db_pool.write(write) or (None, None, None)
+    await feed_hub.publish("post_created", post={
+        "id": post_id, "title": post.title, "content": post.content,
+        "author_email": author[0], "author_first_name": author[1], "author_last_name": author[2],
+        "author_id": user_id, "created_at": created_at, "likes": 0, "comment_count": 0
+    })
+    return {"id": post_id}
+
+@app.delete("/api/community/posts/{post_id}")
+async def delete_post(post_id: str, user_id: str = Depends(get_current_user)):
+    async def write(db):
+        cur = await db.execute("SELECT user_id FROM posts WHERE id = ?", (post_id,))
+        row = await cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if row[0] != user_id:
+            raise HTTPException(status_code=403, detail="Not allowed to delete this post")
+
+        await db.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+        await db.execute("DELETE FROM post_likes WHERE post_id = ?", (post_id,))
+    await db_pool.write(write)
+    await feed_hub.publish("post_deleted", post_id=post_id)
     return {"success": True}
 
+@app.post("/api/community/posts/{post_id}/like")
+async def like_post(post_id: str, user_id: str = Depends(get_current_user)):
+    like_id = str(uuid.uuid4())
+    async def write(db):
+        cur = await db.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
+        if not await cur.fetchone():
+            raise HTTPException(status_code=404, detail="Post not found")
+
+        cur = await db.execute(
+            "INSERT OR IGNORE INTO post_likes (id, post_id, user_id, created_at) VALUES (?, ?, ?, ?)",
+            (like_id, post_id, user_id, datetime.now(timezone.utc).isoformat())
+        )
+        if cur.rowcount:
+            cur = await db.execute("UPDATE posts SET likes = likes + 1 WHERE id = ? RETURNING likes", (post_id,))
+            return (await cur.fetchone())[0]
+    likes = await db_pool.write(write)
+    if likes is not None:
+        await feed_hub.publish("post_liked", post_id=post_id, likes=likes, user_id=user_id, liked=True)
+    return {"success": True, "liked": True}
+
 @app.delete("/api/community/posts/{post_id}/like")
 async def unlike_post(post_id: str, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+    async def write(db):
+        cur = await db.execute(
             "DELETE FROM post_likes WHERE post_id = ? AND user_id = ?",
             (post_id, user_id)
         )
-        await db.commit()
-    return {"success": True}
+        if cur.rowcount:
+            cur = await db.execute("UPDATE posts SET likes = likes - 1 WHERE id = ? RETURNING likes", (post_id,))
+            row = await cur.fetchone()
+            return row[0] if row else None
+    likes = await db_pool.write(write)
+    if likes is not None:
+        await feed_hub.publish("post_liked", post_id=post_id, likes=likes, user_id=user_id, liked=False)
+    return {"success": True, "liked": False}
 
 @app.get("/api/community/posts/{post_id}/comments")
-async def get_post_comments(post_id: str, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            """
-            SELECT c.id, c.content, c.created_at, u.email, u.first_name, u.last_name, c.user_id
-            FROM post_comments c
-            LEFT JOIN users u ON u.id = c.user_id
-            WHERE c.post_id = ?
-            ORDER BY c.created_at ASC
-            """,
-            (post_id,)
-        )
-        rows = await cursor.fetchall()
-        comments = []
-        for r in rows:
-            comments.append({
-                "id": r[0],
-                "content": r[1],
-                "created_at": r[2],
-                "author_email": r[3],
-                "author_first_name": r[4],
-                "author_last_name": r[5],
-                "can_delete": r[6] == user_id
-            })
-        return {"comments": comments}
+async def get_post_comments(post_id: str, request: Request, response: Response, user_id: str = Depends(get_current_user), limit: int = 50, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    # Adding or removing a comment updates posts.comment_count, which bumps the feed version
+    if cached := await not_modified(request, response, db, user_id, ("posts",)):
+        return cached
+    limit = page_size(limit)
+    where, params = "c.post_id = ?", [post_id]
+    if cursor:
+        where += " AND (c.created_at, c.id) > (?, ?)"
+        params += decode_cursor(cursor)
+    cur = await db.execute(
+        f"""
+        SELECT c.id, c.content, c.created_at, u.email, u.first_name, u.last_name, c.user_id
+        FROM post_comments c
+        LEFT JOIN users u ON u.id = c.user_id
+        WHERE {where}
+        ORDER BY c.created_at ASC, c.id ASC
+        LIMIT ?
+        """,
+        (*params, limit + 1)
+    )
+    rows, next_cursor = paginate(await cur.fetchall(), limit, response)
+    comments = []
+    for r in rows:
+        comments.append({
+            "id": r[0],
+            "content": r[1],
+            "created_at": r[2],
+            "author_email": r[3],
+            "author_first_name": r[4],
+            "author_last_name": r[5],
+            "can_delete": r[6] == user_id
+        })
+    return {"comments": comments, "next_cursor": next_cursor}
 
 @app.post("/api/community/posts/{post_id}/comments")
 async def create_comment(post_id: str, comment: PostComment, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+    comment_id = str(uuid.uuid4())
+    created_at = datetime.now(timezone.utc).isoformat()
+    async def write(db):
         # Verify post exists
         cur = await db.execute("SELECT id FROM posts WHERE id = ?", (post_id,))
         if not await cur.fetchone():
             raise HTTPException(status_code=404, detail="Post not found")
         
-        comment_id = str(uuid.uuid4())
         await db.execute(
             "INSERT INTO post_comments (id, post_id, user_id, content, created_at) VALUES (?, ?, ?, ?, ?)",
-            (comment_id, post_id, user_id, comment.content, datetime.now(timezone.utc).isoformat())
+            (comment_id, post_id, user_id, comment.content, created_at)
         )
-        await db.commit()
+        cur = await db.execute("UPDATE posts SET comment_count = comment_count + 1 WHERE id = ? RETURNING comment_count", (post_id,))
+        count = (await cur.fetchone())[0]
+        cur = await db.execute("SELECT email, first_name, last_name FROM users WHERE id = ?", (user_id,))
+        return count, await cur.fetchone() or (None, None, None)
+    count, author = await db_pool.write(write)
+    await feed_hub.publish("comment_created", post_id=post_id, comment_count=count, comment={
+        "id": comment_id, "content": comment.content, "created_at": created_at,
+        "author_email": author[0], "author_first_name": author[1], "author_last_name": author[2], "author_id": user_id
+    })
     return {"id": comment_id}
 
 @app.delete("/api/community/posts/{post_id}/comments/{comment_id}")
 async def delete_comment(post_id: str, comment_id: str, user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
         cur = await db.execute("SELECT user_id FROM post_comments WHERE id = ? AND post_id = ?", (comment_id, post_id))
         row = await cur.fetchone()
         if not row:
@@ -546,69 +2343,371 @@ async def delete_comment(post_id: str, comment_id: str, user_id: str = Depends(g
             raise HTTPException(status_code=403, detail="Not allowed to delete this comment")
         
         await db.execute("DELETE FROM post_comments WHERE id = ?", (comment_id,))
-        await db.commit()
+        cur = await db.execute("UPDATE posts SET comment_count = comment_count - 1 WHERE id = ? RETURNING comment_count", (post_id,))
+        row = await cur.fetchone()
+        return row[0] if row else 0
+    count = await db_pool.write(write)
+    await feed_hub.publish("comment_deleted", post_id=post_id, comment_id=comment_id, comment_count=count)
     return {"success": True}
 
 @app.get("/api/wellbeing/mood-logs")
-async def get_mood_logs(user_id: str = Depends(get_current_user), limit: int = 50):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT id, mood_score, energy_level, stress_level, notes, date FROM mood_logs WHERE user_id = ? ORDER BY date DESC LIMIT ?",
-            (user_id, limit)
-        )
-        rows = await cursor.fetchall()
-        return [{"id": r[0], "mood_score": r[1], "energy_level": r[2], "stress_level": r[3], "notes": r[4], "date": r[5]} for r in rows]
+async def get_mood_logs(response: Response, user_id: str = Depends(get_current_user), limit: int = 50, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    limit = page_size(limit)
+    where, params = "user_id = ?", [user_id]
+    if cursor:
+        where += " AND (date, id) < (?, ?)"
+        params += decode_cursor(cursor)
+    cur = await db.execute(
+        f"SELECT id, mood_score, energy_level, stress_level, notes, date FROM mood_logs WHERE {where} ORDER BY date DESC, id DESC LIMIT ?",
+        (*params, limit + 1)
+    )
+    rows, _ = paginate(await cur.fetchall(), limit, response, sort_key="date")
+    return [{"id": r[0], "mood_score": r[1], "energy_level": r[2], "stress_level": r[3], "notes": r[4], "date": r[5]} for r in rows]
 
 @app.post("/api/wellbeing/mood-logs")
 async def create_mood_log(mood: MoodLog, user_id: str = Depends(get_current_user)):
     mood_id = str(uuid.uuid4())
     date = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
         await db.execute(
             "INSERT INTO mood_logs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (mood_id, user_id, mood.mood_score, mood.energy_level, mood.stress_level, mood.notes, date, date)
         )
-        await db.commit()
+    await db_pool.write(write)
     return {"id": mood_id}
 
 @app.get("/api/wellbeing/mood-streak")
-async def get_mood_streak(user_id: str = Depends(get_current_user)):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM mood_logs WHERE user_id = ?",
-            (user_id,)
-        )
-        count = (await cursor.fetchone())[0]
-        return {"current_streak": min(count, 30)}
+async def get_mood_streak(user_id: str = Depends(get_current_user), db: aiosqlite.Connection = Depends(get_db)):
+    cursor = await db.execute(
+        "SELECT COUNT(*) FROM mood_logs WHERE user_id = ?",
+        (user_id,)
+    )
+    count = (await cursor.fetchone())[0]
+    return {"current_streak": min(count, 30)}
+
+# ============= AI EXECUTION =============
+# generate_content() is blocking, so Gemini calls run on a dedicated thread pool.
+# A global semaphore caps in-flight calls, a per-user cap stops one student from
+# taking every slot, and a bounded wait queue turns overload into a 429 instead of
+# an ever-growing backlog.
+
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_PER_USER = int(os.getenv("AI_MAX_PER_USER", "2"))
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "32"))
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "60"))
+
+_ai_models: dict = {}
+
+def get_model(name: str) -> "genai.GenerativeModel":
+    """GenerativeModel instances are reusable, so build each one only once"""
+    model = _ai_models.get(name)
+    if model is None:
+        model = _ai_models[name] = genai.GenerativeModel(name)
+    return model
+
+def cancel_stream(response):
+    """Best effort: cancel the gRPC call behind a streaming response so Gemini stops generating"""
+    iterator = getattr(response, "_iterator", None)
+    cancel = getattr(iterator, "cancel", None) or getattr(iterator, "close", None)
+    if cancel is not None:
+        cancel()
+
+class AIPool:
+    def __init__(self, concurrency: int, per_user: int, max_queue: int, timeout: float):
+        self.concurrency = concurrency
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gemini")
+        self._slots = asyncio.Semaphore(concurrency)
+        self._user_active: dict = {}
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def check(self, user_id: str):
+        """Raise 429 if a new call for `user_id` would be rejected right now"""
+        if self._user_active.get(user_id, 0) >= self.per_user:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="Too many AI requests in progress, please wait for the current one")
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="AI assistant is busy, please try again shortly")
+
+    def _release(self, future=None):
+        if future is not None and not future.cancelled():
+            future.exception()  # nobody awaits it any more; mark the outcome as retrieved
+        self.active -= 1
+        self._slots.release()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        """
+        Hold a concurrency slot for `user_id` and yield `submit(fn)`, which runs `fn` on the
+        Gemini executor. If the caller gives up first (timeout, client disconnect) the slot is
+        only released once that executor work has actually finished.
+        """
+        self.check(user_id)
+        self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+        try:
+            self.waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            work = []
+            def submit(fn):
+                work.append(asyncio.get_running_loop().run_in_executor(self._executor, fn))
+                return work[-1]
+            try:
+                yield submit
+            finally:
+                if work and not work[0].done():
+                    work[0].add_done_callback(self._release)
+                else:
+                    self._release()
+        finally:
+            self._user_active[user_id] -= 1
+            if not self._user_active[user_id]:
+                del self._user_active[user_id]
+
+    async def generate(self, endpoint: str, user_id: str, model_name: str, prompt: str) -> str:
+        """Run one Gemini completion for `user_id` and return its text; `endpoint` labels its metrics"""
+        async with self.slot(user_id) as submit:
+            model = get_model(model_name)
+            call = lambda: model.generate_content(prompt, request_options={"timeout": self.timeout})
+            with gemini_metrics(endpoint, model_name) as record_usage:
+                try:
+                    # Small grace period so the client-side timeout normally fires first; shielded
+                    # so giving up leaves the executor future pending and the slot held until it ends
+                    response = await asyncio.wait_for(asyncio.shield(submit(call)), self.timeout + 5)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise HTTPException(status_code=504, detail="AI request timed out")
+                record_usage(response)
+                return response.text
+
+    async def stream(self, endpoint: str, user_id: str, model_name: str, prompt: str):
+        """
+        Yield a Gemini completion for `user_id` chunk by chunk as it is generated.
+        Closing the generator (e.g. the client went away) stops the upstream stream.
+        """
+        async with self.slot(user_id) as submit:
+            loop = asyncio.get_running_loop()
+            chunks: asyncio.Queue = asyncio.Queue()
+            cancelled = threading.Event()
+            last_chunk = []  # the final chunk carries the usage totals
+
+            def push(item):
+                try:
+                    loop.call_soon_threadsafe(chunks.put_nowait, item)
+                except RuntimeError:
+                    pass  # event loop already closed
+
+            def produce():
+                try:
+                    response = get_model(model_name).generate_content(
+                        prompt, stream=True, request_options={"timeout": self.timeout}
+                    )
+                    for chunk in response:
+                        if cancelled.is_set():
+                            cancel_stream(response)
+                            return
+                        last_chunk[:] = [chunk]
+                        push(chunk.text)
+                    push(None)
+                except Exception as e:
+                    push(e)
+
+            submit(produce)
+            try:
+                with gemini_metrics(endpoint, model_name) as record_usage:
+                    while True:
+                        try:
+                            item = await asyncio.wait_for(chunks.get(), self.timeout)
+                        except asyncio.TimeoutError:
+                            self.timeouts += 1
+                            raise HTTPException(status_code=504, detail="AI request timed out")
+                        if item is None:
+                            if last_chunk:
+                                record_usage(last_chunk[0])
+                            return
+                        if isinstance(item, Exception):
+                            raise item
+                        yield item
+            except (GeneratorExit, asyncio.CancelledError):
+                self.cancelled += 1
+                raise
+            finally:
+                cancelled.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "users_active": len(self._user_active),
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+        }
+
+ai_pool = AIPool(AI_MAX_CONCURRENCY, AI_MAX_PER_USER, AI_MAX_QUEUE, AI_TIMEOUT_SECONDS)
+
+# ============= AI RESPONSE CACHE =============
+# Identical requests (same endpoint, model and normalized inputs) reuse the stored
+# completion instead of paying Gemini latency again. Entries live in the ai_cache
+# table with a TTL and LRU eviction past AI_CACHE_MAX_ENTRIES, fronted by a small
+# in-process LRU. Responses say X-Cache: HIT or MISS.
+
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "5000"))
+AI_CACHE_MEMORY_ENTRIES = int(os.getenv("AI_CACHE_MEMORY_ENTRIES", "256"))
+
+def normalize_text(text) -> str:
+    return " ".join(str(text or "").split())
+
+class AICache:
+    def __init__(self, ttl: int, max_entries: int, memory_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict = OrderedDict()  # key -> (value, created_at)
+        self._writes_since_evict = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint: str, model_name: str, inputs: dict) -> str:
+        raw = json.dumps([endpoint, model_name, inputs], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and entry[1] + self.ttl > now:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.memory_hits += 1
+            return entry[0]
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT value, created_at FROM ai_cache WHERE key = ?", (key,))
+            row = await cursor.fetchone()
+        if row is None or row[1] + self.ttl <= now:
+            self._memory.pop(key, None)
+            self.misses += 1
+            return None
+        self._remember(key, row[0], row[1])
+        self.hits += 1
+        async def touch(db):
+            await db.execute("UPDATE ai_cache SET last_used = ? WHERE key = ?", (now, key))
+        await db_pool.write(touch)
+        return row[0]
+
+    async def put(self, key: str, endpoint: str, value: str):
+        now = time.time()
+        self._remember(key, value, now)
+        self._writes_since_evict += 1
+        evict = self._writes_since_evict >= max(1, self.max_entries // 10)
+        if evict:
+            self._writes_since_evict = 0
+        async def write(db):
+            await db.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, endpoint, value, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, value, now, now)
+            )
+            if evict:
+                await db.execute("DELETE FROM ai_cache WHERE created_at <= ?", (now - self.ttl,))
+                # Keep only the max_entries most recently used rows
+                await db.execute(
+                    """DELETE FROM ai_cache WHERE key IN (
+                           SELECT key FROM ai_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                       )""",
+                    (self.max_entries,)
+                )
+        await db_pool.write(write)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+ai_cache = AICache(AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES, AI_CACHE_MEMORY_ENTRIES)
+
+async def cached_generate(response: Response, endpoint: str, user_id: str, model_name: str,
+                          prompt: str, inputs: dict, transform=None) -> str:
+    """
+    Return the cached completion for (endpoint, model, inputs) or generate, transform
+    and store it. `transform` may raise to keep a bad completion out of the cache.
+    """
+    key = AICache.make_key(endpoint, model_name, inputs)
+    value = await ai_cache.get(key)
+    if value is not None:
+        response.headers["X-Cache"] = "HIT"
+        return value
+    response.headers["X-Cache"] = "MISS"
+    value = await ai_pool.generate(endpoint, user_id, model_name, prompt)
+    if transform is not None:
+        value = transform(value)
+    await ai_cache.put(key, endpoint, value)
+    return value
+
+def clean_cards_json(cards_text: str) -> str:
+    """Strip markdown code fences from a flashcard completion and check it parses"""
+    cards_text = cards_text.strip()
+    if cards_text.startswith('```'):
+        lines = cards_text.split('\n')
+        cards_text = '\n'.join([l for l in lines if not l.startswith('```')])
+    cards_text = cards_text.strip()
+    json.loads(cards_text)
+    return cards_text
 
 @app.post("/api/ai/summarize-notes")
-async def summarize_notes(data: dict, user_id: str = Depends(get_current_user)):
+async def summarize_notes(data: dict, response: Response, user_id: str = Depends(get_current_user)):
     if not GEMINI_API_KEY:
         return {"summary": "⚠️ AI summarization not configured. Please add your Gemini API key to the .env file."}
     
     try:
-        model = genai.GenerativeModel('gemini-2.0-flash')
         prompt = f"Provide a clear, concise summary of the following notes in 2-3 sentences. Focus on the main points and key takeaways:\n\n{data.get('content', '')}"
-        response = model.generate_content(prompt)
-        return {"summary": response.text.strip()}
+        text = await cached_generate(
+            response, "summarize-notes", user_id, 'gemini-2.0-flash', prompt,
+            {"content": normalize_text(data.get('content', ''))},
+            transform=str.strip
+        )
+        return {"summary": text}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"summary": f"Error generating summary: {str(e)}"}
 
-@app.post("/api/ai/study-plan")
-async def generate_study_plan(data: dict, user_id: str = Depends(get_current_user)):
-    if not GEMINI_API_KEY:
-        return {"study_plan": "⚠️ AI study plan generation not configured. Please add your Gemini API key to the .env file."}
+def study_plan_request(data: dict) -> tuple:
+    """Build the study-plan prompt and its cache-key inputs from a request body"""
+    subject = data.get('subject', 'General Studies')
+    topics = data.get('topics', [])
+    timeline = data.get('timeline', 'one week')
+    difficulty = data.get('difficulty', 'intermediate')
     
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        subject = data.get('subject', 'General Studies')
-        topics = data.get('topics', [])
-        timeline = data.get('timeline', 'one week')
-        difficulty = data.get('difficulty', 'intermediate')
-        
-        topics_str = ', '.join([t.strip() for t in topics if t.strip()])
-        
-        prompt = f"""Create a detailed study plan with the following specifications:
+    topics_str = ', '.join([t.strip() for t in topics if t.strip()])
+    
+    prompt = f"""Create a detailed study plan with the following specifications:
 
 Subject: {subject}
 Topics to cover: {topics_str}
@@ -632,64 +2731,545 @@ Format the response as clean, readable HTML with:
 - Make it visually scannable with proper spacing
 
 Start with a brief overview, then provide the detailed day-by-day plan."""
-        
-        response = model.generate_content(prompt)
-        plan_text = response.text.strip()
-        
-        # Convert markdown to HTML if AI returns markdown
-        import re
-        if '##' in plan_text or '**' in plan_text:
-            # Convert markdown headings to HTML
-            plan_text = re.sub(r'### (.+)', r'<h3>\1</h3>', plan_text)
-            plan_text = re.sub(r'## (.+)', r'<h2>\1</h2>', plan_text)
-            plan_text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', plan_text)
-            plan_text = re.sub(r'- (.+)', r'<li>\1</li>', plan_text)
-            # Wrap consecutive <li> tags in <ul>
-            plan_text = re.sub(r'(<li>.*?</li>\n)+', r'<ul>\g<0></ul>', plan_text, flags=re.DOTALL)
-            # Add paragraph tags
-            lines = plan_text.split('\n')
-            formatted_lines = []
-            for line in lines:
-                if line.strip() and not line.startswith('<'):
-                    formatted_lines.append(f'<p>{line}</p>')
-                else:
-                    formatted_lines.append(line)
-            plan_text = '\n'.join(formatted_lines)
-        
-        return {"study_plan": plan_text}
-    except Exception as e:
-        print(f"[AI Study Plan Error] {type(e).__name__}: {str(e)}")
-        return {"study_plan": f"Error generating study plan: {type(e).__name__}: {str(e)}"}
-
-@app.post("/api/ai/chat")
-async def ai_chat(data: dict, user_id: str = Depends(get_current_user)):
-    if not GEMINI_API_KEY:
-        raise HTTPException(status_code=500, detail="AI not configured. Set GOOGLE_API_KEY in .env")
+    inputs = {
+        "subject": normalize_text(subject).lower(),
+        "topics": [normalize_text(t).lower() for t in topics if t.strip()],
+        "timeline": normalize_text(timeline).lower(),
+        "difficulty": normalize_text(difficulty).lower(),
+        "format": "text",  # cached values are the raw completion
+    }
+    return prompt, inputs
 
+def chat_prompt(data: dict) -> str:
+    """Build the chat prompt from the new message and the recent conversation"""
     message = data.get("message", "").strip()
     history = data.get("context", [])
     if not message:
         raise HTTPException(status_code=400, detail="Empty message")
 
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        history_text = "\n".join([
-            (f"User: {m['content']}" if m.get('role') == 'user' else f"Assistant: {m.get('content','')}")
-            for m in history[-6:]
-        ])
-        prompt = f"""You are Scholar OS's helpful study assistant.
+    history_text = "\n".join([
+        (f"User: {m['content']}" if m.get('role') == 'user' else f"Assistant: {m.get('content','')}")
+        for m in history[-6:]
+    ])
+    return f"""You are Scholar OS's helpful study assistant.
 Keep answers concise and helpful for students.
 
 {history_text}
 User: {message}
 Assistant:"""
 
-        resp = model.generate_content(prompt)
-        return {"response": resp.text.strip()}
+@app.post("/api/ai/study-plan")
+async def generate_study_plan(data: dict, response: Response, user_id: str = Depends(get_current_user)):
+    if not GEMINI_API_KEY:
+        return {"study_plan": "⚠️ AI study plan generation not configured. Please add your Gemini API key to the .env file."}
+    
+    try:
+        prompt, inputs = study_plan_request(data)
+        plan_text = await cached_generate(
+            response, "study-plan", user_id, 'gemini-2.5-flash', prompt, inputs, transform=str.strip
+        )
+        
+        return {"study_plan": render_markdown(plan_text)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[AI Study Plan Error] {type(e).__name__}: {str(e)}")
+        return {"study_plan": f"Error generating study plan: {type(e).__name__}: {str(e)}"}
+
+@app.post("/api/ai/chat")
+async def ai_chat(data: dict, user_id: str = Depends(get_current_user)):
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="AI not configured. Set GOOGLE_API_KEY in .env")
+
+    prompt = chat_prompt(data)
+    try:
+        text = await ai_pool.generate("chat", user_id, 'gemini-2.5-flash', prompt)
+        return {"response": text.strip()}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[AI Chat Error] {type(e).__name__}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
 
+# ============= AI STREAMING =============
+# Server-sent-event variants of chat and study plan. Every chunk from Gemini is
+# forwarded as soon as it arrives: completed lines go out as HTML, the line still
+# being written goes out as plain text for the client to show until it completes.
+
+class MarkdownStream:
+    """Incremental markdown to HTML: each line is converted once it is complete"""
+
+    def __init__(self):
+        self.partial = ""
+        self._in_list = False
+
+    def feed(self, text: str) -> str:
+        """Add a chunk and return the HTML for any lines it completed"""
+        *lines, self.partial = (self.partial + text).split('\n')
+        return ''.join(self._line(line) for line in lines)
+
+    def close(self) -> str:
+        """Flush the last line and any open list"""
+        html = self._line(self.partial) if self.partial else ''
+        self.partial = ""
+        if self._in_list:
+            html += '</ul>\n'
+            self._in_list = False
+        return html
+
+    def _line(self, line: str) -> str:
+        line = line.strip()
+        item = re.match(r'[-*] (.+)', line)
+        html = ''
+        if self._in_list and not item:
+            html += '</ul>\n'
+            self._in_list = False
+        line = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', line)
+        if item:
+            if not self._in_list:
+                html += '<ul>\n'
+                self._in_list = True
+            html += f'<li>{line[2:]}</li>\n'
+        elif line.startswith('### '):
+            html += f'<h3>{line[4:]}</h3>\n'
+        elif line.startswith('## ') or line.startswith('# '):
+            html += f'<h2>{line.split(" ", 1)[1]}</h2>\n'
+        elif line.startswith('<'):
+            html += line + '\n'
+        elif line:
+            html += f'<p>{line}</p>\n'
+        return html
+
+def render_markdown(text: str) -> str:
+    """The HTML the streaming endpoints send for `text`, produced in one go"""
+    converter = MarkdownStream()
+    return converter.feed(text) + converter.close()
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def stream_completion(endpoint: str, user_id: str, model_name: str, prompt: str, tag: str, on_done=None, headers: dict = None) -> StreamingResponse:
+    """
+    Stream a completion as server-sent events: `data` events carry new HTML and the
+    current partial line, a final `done` event carries the full text, and failures
+    arrive as an `error` event since the 200 status has already been sent.
+    """
+    ai_pool.check(user_id)  # reject with a real 429 while we still can
+
+    async def events():
+        converter = MarkdownStream()
+        parts = []
+        try:
+            async with aclosing(ai_pool.stream(endpoint, user_id, model_name, prompt)) as chunks:
+                async for text in chunks:
+                    parts.append(text)
+                    yield sse_event({"html": converter.feed(text), "partial": converter.partial})
+            text = ''.join(parts).strip()
+            if on_done is not None:
+                await on_done(text)
+            yield sse_event({"html": converter.close(), "partial": "", "text": text}, "done")
+        except HTTPException as e:
+            yield sse_event({"status": e.status_code, "detail": e.detail}, "error")
+        except Exception as e:
+            print(f"[{tag} Error] {type(e).__name__}: {str(e)}")
+            yield sse_event({"status": 500, "detail": f"{type(e).__name__}: {str(e)}"}, "error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={**SSE_HEADERS, **(headers or {})})
+
+@app.post("/api/ai/chat/stream")
+async def stream_ai_chat(data: dict, user_id: str = Depends(get_current_user)):
+    """Streaming version of /api/ai/chat"""
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="AI not configured. Set GOOGLE_API_KEY in .env")
+    return stream_completion("chat-stream", user_id, 'gemini-2.5-flash', chat_prompt(data), "AI Chat")
+
+@app.post("/api/ai/study-plan/stream")
+async def stream_study_plan(data: dict, user_id: str = Depends(get_current_user)):
+    """Streaming version of /api/ai/study-plan; cache hits arrive as a single `done` event"""
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="AI study plan generation not configured")
+
+    prompt, inputs = study_plan_request(data)
+    key = AICache.make_key("study-plan", 'gemini-2.5-flash', inputs)
+    cached = await ai_cache.get(key)
+    if cached is not None:
+        async def replay():
+            yield sse_event({"html": render_markdown(cached), "partial": "", "text": cached}, "done")
+        return StreamingResponse(replay(), media_type="text/event-stream", headers={**SSE_HEADERS, "X-Cache": "HIT"})
+
+    async def store(text: str):
+        # Raw text, as the non-streaming endpoint caches it; both render it with MarkdownStream
+        await ai_cache.put(key, "study-plan", text)
+
+    return stream_completion("study-plan-stream", user_id, 'gemini-2.5-flash', prompt, "AI Study Plan",
+                             on_done=store, headers={"X-Cache": "MISS"})
+
+# ============= BACKGROUND JOBS =============
+# Long-running work is queued in the jobs table and run by worker coroutines after
+# the request returns; clients poll /api/jobs/{id}. Because the queue lives in
+# SQLite, jobs survive restarts. A claimed job is leased to the claiming process
+# (locked_by/locked_until) and the lease is renewed while it runs; a running job
+# whose lease has run out was interrupted and is queued again, at startup or by
+# the next periodic check, so processes sharing the database never take each
+# other's live jobs. Failures are retried with exponential backoff
+# unless they are client errors, and an Idempotency-Key header on the enqueueing
+# request returns the existing job instead of creating a second one.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_CPU_WORKERS = int(os.getenv("JOB_CPU_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "4"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+# Idle workers sleep until the earliest queued run_at; this caps the sleep as a safety net
+JOB_IDLE_POLL = float(os.getenv("JOB_IDLE_POLL_SECONDS", "60"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))  # renewed every third of this while running
+
+class JobContext:
+    """What a job handler gets: its payload, progress reporting and a thread pool for CPU work"""
+
+    def __init__(self, queue: "JobQueue", row):
+        self.queue = queue
+        self.id = row["id"]
+        self.user_id = row["user_id"]
+        self.payload = json.loads(row["payload"])
+        self.attempt = row["attempts"]
+
+    async def progress(self, done: int, total: Optional[int] = None):
+        async def write(db):
+            await db.execute(
+                "UPDATE jobs SET done = ?, total = COALESCE(?, total), updated_at = ? WHERE id = ?",
+                (done, total, datetime.now(timezone.utc).isoformat(), self.id)
+            )
+        await db_pool.write(write)
+
+    async def run_cpu(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.queue._cpu, fn, *args)
+
+class JobQueue:
+    def __init__(self, workers: int, cpu_workers: int, max_attempts: int, backoff: float, retention_days: int,
+                 lease: float):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retention_days = retention_days
+        self.lease = lease
+        self.owner = uuid.uuid4().hex  # this process's name on the leases it holds
+        self._lease_check_at = 0.0
+        self._handlers: dict = {}
+        self._cpu = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="job-cpu")
+        self._wakeup = asyncio.Event()
+        self._tasks: list = []
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def handler(self, kind: str):
+        """Register `async def fn(job: JobContext) -> result` for jobs of `kind`"""
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    async def start(self):
+        now = datetime.now(timezone.utc)
+        async def write(db):
+            await db.execute(
+                "DELETE FROM jobs WHERE finished_at < ?",
+                ((now - timedelta(days=self.retention_days)).isoformat(),)
+            )
+            return await self._requeue_expired(db, now.isoformat())
+        resumed = await db_pool.write(write)
+        if resumed:
+            print(f"[Jobs] Resuming {resumed} interrupted jobs")
+        self._lease_check_at = time.monotonic() + self.lease
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def enqueue(self, user_id: str, kind: str, payload: dict, total: int = 0,
+                      idempotency_key: Optional[str] = None) -> dict:
+        now = datetime.now(timezone.utc).isoformat()
+        job_id = str(uuid.uuid4())
+        async def write(db):
+            await db.execute(
+                """INSERT INTO jobs (id, user_id, kind, payload, status, max_attempts, run_at, total,
+                                     idempotency_key, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT DO NOTHING""",
+                (job_id, user_id, kind, json.dumps(payload), self.max_attempts, now, total,
+                 idempotency_key, now, now)
+            )
+            cursor = await db.execute(
+                "SELECT * FROM jobs WHERE id = ? OR (user_id = ? AND idempotency_key = ?)",
+                (job_id, user_id, idempotency_key)
+            )
+            return job_view(await cursor.fetchone())
+        job = await db_pool.write(write)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT * FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id))
+            row = await cursor.fetchone()
+        return job_view(row) if row else None
+
+    async def _next_due(self) -> Optional[datetime]:
+        """run_at of the earliest queued job, read on a pooled reader (None when the queue is empty)"""
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT MIN(run_at) FROM jobs WHERE status = 'queued'")
+            row = await cursor.fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] else None
+
+    async def _requeue_expired(self, db: aiosqlite.Connection, now: str) -> int:
+        """Queue again the running jobs whose lease has run out (rows from before leases have none)"""
+        expired = "status = 'running' AND (locked_until IS NULL OR locked_until < ?)"
+        await db.execute(
+            f"""UPDATE jobs SET status = 'failed', finished_at = ?, updated_at = ?, locked_by = NULL, locked_until = NULL,
+                    errors = json_insert(errors, '$[#]', 'interrupted on its last attempt')
+                WHERE {expired} AND attempts >= max_attempts""",
+            (now, now, now)
+        )
+        cursor = await db.execute(
+            f"""UPDATE jobs SET status = 'queued', run_at = ?, updated_at = ?, locked_by = NULL, locked_until = NULL
+                WHERE {expired}""",
+            (now, now, now)
+        )
+        return cursor.rowcount
+
+    async def _check_leases(self):
+        """Requeue jobs abandoned by a process that died; probed on a reader so the usual no-op costs no write"""
+        self._lease_check_at = time.monotonic() + self.lease
+        now = datetime.now(timezone.utc).isoformat()
+        async with db_pool.reader() as db:
+            cursor = await db.execute(
+                "SELECT 1 FROM jobs WHERE status = 'running' AND (locked_until IS NULL OR locked_until < ?) LIMIT 1",
+                (now,)
+            )
+            if await cursor.fetchone() is None:
+                return
+        resumed = await db_pool.write(lambda db: self._requeue_expired(db, now))
+        if resumed:
+            print(f"[Jobs] Resuming {resumed} jobs whose lease ran out")
+            self._wakeup.set()
+
+    async def _claim(self):
+        now = datetime.now(timezone.utc)
+        locked_until = (now + timedelta(seconds=self.lease)).isoformat()
+        now = now.isoformat()
+        async def write(db):
+            cursor = await db.execute(
+                """UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?,
+                       locked_by = ?, locked_until = ?
+                   WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND run_at <= ? ORDER BY run_at LIMIT 1)
+                   RETURNING *""",
+                (now, self.owner, locked_until, now)
+            )
+            return await cursor.fetchone()
+        return await db_pool.write(write)
+
+    async def _worker(self):
+        while True:
+            if time.monotonic() >= self._lease_check_at:
+                await self._check_leases()
+            # Cleared before the read so an enqueue landing in between still wakes us
+            self._wakeup.clear()
+            due = await self._next_due()
+            delay = JOB_IDLE_POLL if due is None else (due - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                # Sleep until the earliest backoff expires; enqueue() and retries wake us sooner
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, JOB_IDLE_POLL, self.lease))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Only a due job is worth a write unit on the group-commit writer
+            row = await self._claim()
+            if row is not None:
+                await self._run(row)
+
+    async def _run(self, row):
+        job = JobContext(self, row)
+        handler = self._handlers.get(row["kind"])
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            if handler is None:
+                raise HTTPException(status_code=400, detail=f"Unknown job kind {row['kind']!r}")
+            result = await handler(job)
+        except asyncio.CancelledError:
+            raise  # shutting down: shutdown() expires the lease so the job is resumed
+        except Exception as e:
+            detail = str(e.detail) if isinstance(e, HTTPException) else f"{type(e).__name__}: {str(e)}"
+            permanent = isinstance(e, HTTPException) and e.status_code < 500 and e.status_code != 429
+            retry = not permanent and job.attempt < row["max_attempts"]
+            print(f"[Jobs] {row['kind']} job {job.id} attempt {job.attempt} failed: {detail}")
+            await self._finish(job, None, f"attempt {job.attempt}: {detail}", retry)
+        else:
+            await self._finish(job, result, None, False)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str):
+        """Renew the lease on a running job until it finishes"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            locked_until = (datetime.now(timezone.utc) + timedelta(seconds=self.lease)).isoformat()
+            async def write(db):
+                await db.execute(
+                    "UPDATE jobs SET locked_until = ? WHERE id = ? AND locked_by = ? AND status = 'running'",
+                    (locked_until, job_id, self.owner)
+                )
+            try:
+                await db_pool.write(write)
+            except Exception as e:
+                print(f"[Jobs] Could not renew the lease on job {job_id}: {type(e).__name__}: {e}")
+
+    async def _finish(self, job: JobContext, result, error: Optional[str], retry: bool):
+        now = datetime.now(timezone.utc)
+        if retry:
+            self.retried += 1
+            status, finished_at = "queued", None
+            run_at = now + timedelta(seconds=min(self.backoff * 2 ** (job.attempt - 1), 3600))
+        else:
+            status = "failed" if error else "done"
+            finished_at, run_at = now.isoformat(), now
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+        async def write(db):
+            cursor = await db.execute(
+                """UPDATE jobs SET status = ?, result = ?, run_at = ?, updated_at = ?, finished_at = ?,
+                       locked_by = NULL, locked_until = NULL,
+                       errors = CASE WHEN ? IS NULL THEN errors ELSE json_insert(errors, '$[#]', ?) END
+                   WHERE id = ? AND locked_by = ? AND status = 'running'""",
+                (status, None if result is None else json.dumps(result), run_at.isoformat(),
+                 now.isoformat(), finished_at, error, error, job.id, self.owner)
+            )
+            return cursor.rowcount
+        if not await db_pool.write(write):
+            print(f"[Jobs] Job {job.id} lost its lease while running; its outcome was discarded")
+        if retry:
+            self._wakeup.set()  # idle workers re-read the earliest run_at
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Jobs cut short here are resumed by whichever process next checks leases
+        now = datetime.now(timezone.utc).isoformat()
+        async def write(db):
+            await db.execute(
+                "UPDATE jobs SET locked_until = ? WHERE status = 'running' AND locked_by = ?",
+                (now, self.owner)
+            )
+        await db_pool.write(write)
+        self._cpu.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "completed": self.completed, "failed": self.failed, "retried": self.retried}
+
+def job_view(row) -> dict:
+    """The public shape of a jobs row"""
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "max_attempts": row["max_attempts"],
+        "done": row["done"],
+        "total": row["total"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "errors": json.loads(row["errors"]),
+        "next_attempt_at": row["run_at"] if row["status"] == "queued" else None,
+        "created_at": row["created_at"],
+        "finished_at": row["finished_at"],
+    }
+
+jobs = JobQueue(JOB_WORKERS, JOB_CPU_WORKERS, JOB_MAX_ATTEMPTS, JOB_BACKOFF_SECONDS, JOB_RETENTION_DAYS,
+                JOB_LEASE_SECONDS)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Progress and result of one of the caller's background jobs"""
+    job = await jobs.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ============= SPACED REPETITION =============
+# SM-2: each card keeps an ease factor, the current interval and how many reviews
+# in a row were recalled. The review's confidence (0-5) is the SM-2 quality; 3 or
+# more counts as recalled. due_at is indexed with user_id so a review session
+# reads just the next few due cards instead of the whole deck.
+
+SM2_MIN_EASE = 1.3
+
+def sm2_schedule(quality: int, ease: float, interval: int, repetitions: int) -> tuple:
+    """Return the card's next (ease, interval_days, repetitions) after a review"""
+    if quality >= 3:
+        interval = 1 if repetitions == 0 else 6 if repetitions == 1 else round(interval * ease)
+        repetitions += 1
+    else:
+        interval, repetitions = 1, 0
+    ease = max(SM2_MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return ease, interval, repetitions
+
+MAX_REVIEW_BATCH = 200
+
+async def apply_reviews(db: aiosqlite.Connection, user_id: str, reviews: list) -> list:
+    """
+    Apply (card_id, confidence, reviewed_at) reviews in reviewed_at order within the
+    caller's write unit and return one result per review, in input order. A review
+    no newer than the card's last_reviewed is reported as a duplicate and skipped,
+    so a client can safely resend a batch it is unsure was delivered.
+    """
+    ids = list({card_id for card_id, _, _ in reviews})
+    cursor = await db.execute(
+        f"""SELECT id, confidence_level, ease, interval_days, repetitions, last_reviewed
+            FROM flashcards WHERE user_id = ? AND id IN ({', '.join('?' * len(ids))})""",
+        (user_id, *ids)
+    )
+    cards = {row[0]: list(row[1:]) for row in await cursor.fetchall()}
+    initial_confidence = {card_id: card[0] or 0 for card_id, card in cards.items()}
+    results = [None] * len(reviews)
+    updates = []
+    for i in sorted(range(len(reviews)), key=lambda i: reviews[i][2]):
+        card_id, confidence, reviewed_at = reviews[i]
+        card = cards.get(card_id)
+        stamp = reviewed_at.isoformat()
+        if card is None:
+            results[i] = {"card_id": card_id, "status": "not_found"}
+        elif not 0 <= confidence <= 5:
+            results[i] = {"card_id": card_id, "status": "invalid"}
+        elif card[4] and stamp <= card[4]:
+            results[i] = {"card_id": card_id, "status": "duplicate"}
+        else:
+            ease, interval, repetitions = sm2_schedule(confidence, card[1], card[2], card[3])
+            due_at = (reviewed_at + timedelta(days=interval)).isoformat()
+            cards[card_id] = [confidence, ease, interval, repetitions, stamp]
+            updates.append((stamp, confidence, ease, interval, repetitions, due_at, card_id, user_id))
+            results[i] = {"card_id": card_id, "status": "ok", "interval_days": interval, "due_at": due_at}
+    if updates:
+        await db.executemany(
+            """UPDATE flashcards 
+               SET last_reviewed = ?, times_reviewed = times_reviewed + 1, confidence_level = ?,
+                   ease = ?, interval_days = ?, repetitions = ?, due_at = ?
+               WHERE id = ? AND user_id = ?""",
+            updates
+        )
+        reviewed = {u[6] for u in updates}
+        await bump_analytics(db, user_id, reviews=len(updates),
+                             confidence=sum(cards[c][0] - initial_confidence[c] for c in reviewed))
+    return results
+
+def review_quality(confidence) -> int:
+    try:
+        return max(0, min(5, int(confidence)))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="confidence must be a number from 0 to 5")
+
 # ============= FLASHCARDS ENDPOINTS =============
 
 @app.post("/api/flashcards")
@@ -698,97 +3278,126 @@ async def create_flashcard(flashcard: Flashcard, user_id: str = Depends(get_curr
     card_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
         await db.execute(
             """INSERT INTO flashcards (id, user_id, note_id, question, answer, subject, 
-               difficulty, times_reviewed, confidence_level, created_at) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, ?)""",
+               difficulty, times_reviewed, confidence_level, created_at, due_at) 
+               VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, ?, ?)""",
             (card_id, user_id, flashcard.note_id, flashcard.question, flashcard.answer,
-             flashcard.subject, flashcard.difficulty, now)
+             flashcard.subject, flashcard.difficulty, now, now)
         )
-        await db.commit()
-    
+        await bump_analytics(db, user_id, cards=1)
+    await db_pool.write(write)
     return {"id": card_id, "message": "Flashcard created successfully"}
 
 @app.get("/api/flashcards")
-async def get_flashcards(user_id: str = Depends(get_current_user), subject: Optional[str] = None):
-    """Get all flashcards for the user, optionally filtered by subject"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        if subject:
-            cursor = await db.execute(
-                "SELECT * FROM flashcards WHERE user_id = ? AND subject = ? ORDER BY created_at DESC",
-                (user_id, subject)
-            )
-        else:
-            cursor = await db.execute(
-                "SELECT * FROM flashcards WHERE user_id = ? ORDER BY created_at DESC",
-                (user_id,)
-            )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+async def get_flashcards(request: Request, response: Response, user_id: str = Depends(get_current_user), subject: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    """Get the user's flashcards a page at a time, optionally filtered by subject"""
+    if cached := await not_modified(request, response, db, user_id, ("flashcards",)):
+        return cached
+    limit = page_size(limit)
+    where, params = "user_id = ?", [user_id]
+    if subject:
+        where += " AND subject = ?"
+        params.append(subject)
+    if cursor:
+        where += " AND (created_at, id) < (?, ?)"
+        params += decode_cursor(cursor)
+    cur = await db.execute(
+        f"SELECT * FROM flashcards WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1)
+    )
+    rows, _ = paginate(await cur.fetchall(), limit, response)
+    return [dict(row) for row in rows]
+
+@app.get("/api/flashcards/due")
+async def get_due_flashcards(user_id: str = Depends(get_current_user), limit: int = 20, db: aiosqlite.Connection = Depends(get_db)):
+    """The next `limit` cards due for review, most overdue first"""
+    cur = await db.execute(
+        "SELECT * FROM flashcards WHERE user_id = ? AND due_at <= ? ORDER BY due_at, id LIMIT ?",
+        (user_id, datetime.now(timezone.utc).isoformat(), page_size(limit))
+    )
+    return [dict(row) for row in await cur.fetchall()]
 
 @app.get("/api/flashcards/{card_id}")
-async def get_flashcard(card_id: str, user_id: str = Depends(get_current_user)):
+async def get_flashcard(card_id: str, user_id: str = Depends(get_current_user), db: aiosqlite.Connection = Depends(get_db)):
     """Get a specific flashcard"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM flashcards WHERE id = ? AND user_id = ?",
-            (card_id, user_id)
-        )
-        row = await cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Flashcard not found")
-        return dict(row)
+    cursor = await db.execute(
+        "SELECT * FROM flashcards WHERE id = ? AND user_id = ?",
+        (card_id, user_id)
+    )
+    row = await cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Flashcard not found")
+    return dict(row)
 
 @app.put("/api/flashcards/{card_id}")
 async def update_flashcard(card_id: str, flashcard: Flashcard, user_id: str = Depends(get_current_user)):
     """Update a flashcard"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+    async def write(db):
+        cursor = await db.execute(
             """UPDATE flashcards SET question = ?, answer = ?, subject = ?, difficulty = ?
                WHERE id = ? AND user_id = ?""",
             (flashcard.question, flashcard.answer, flashcard.subject, flashcard.difficulty, card_id, user_id)
         )
-        await db.commit()
-        if db.total_changes == 0:
+        if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Flashcard not found")
-    
+    await db_pool.write(write)
     return {"message": "Flashcard updated successfully"}
 
 @app.delete("/api/flashcards/{card_id}")
 async def delete_flashcard(card_id: str, user_id: str = Depends(get_current_user)):
     """Delete a flashcard"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM flashcards WHERE id = ? AND user_id = ?", (card_id, user_id))
-        await db.commit()
-        if db.total_changes == 0:
+    async def write(db):
+        cursor = await db.execute(
+            "DELETE FROM flashcards WHERE id = ? AND user_id = ? RETURNING times_reviewed, confidence_level",
+            (card_id, user_id)
+        )
+        deleted = await cursor.fetchone()
+        if not deleted:
             raise HTTPException(status_code=404, detail="Flashcard not found")
-    
+        await bump_analytics(db, user_id, cards=-1, reviews=-(deleted[0] or 0), confidence=-(deleted[1] or 0))
+    await db_pool.write(write)
     return {"message": "Flashcard deleted successfully"}
 
 @app.post("/api/flashcards/{card_id}/review")
 async def review_flashcard(card_id: str, data: dict, user_id: str = Depends(get_current_user)):
-    """Mark a flashcard as reviewed and update confidence level"""
-    confidence = data.get('confidence', 0)  # 0-5 scale
-    now = datetime.now(timezone.utc).isoformat()
+    """Record a review, update the confidence level and schedule the next review"""
+    confidence = review_quality(data.get('confidence', 0))  # 0-5 scale
+    result = {}
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            """UPDATE flashcards 
-               SET last_reviewed = ?, times_reviewed = times_reviewed + 1, confidence_level = ?
-               WHERE id = ? AND user_id = ?""",
-            (now, confidence, card_id, user_id)
-        )
-        await db.commit()
-        if db.total_changes == 0:
+    async def write(db):
+        (outcome,) = await apply_reviews(db, user_id, [(card_id, confidence, datetime.now(timezone.utc))])
+        if outcome["status"] == "not_found":
             raise HTTPException(status_code=404, detail="Flashcard not found")
+        result.update(interval_days=outcome.get("interval_days"), due_at=outcome.get("due_at"))
+    await db_pool.write(write)
+    return {"message": "Review recorded successfully", **result}
+
+@app.post("/api/flashcards/reviews")
+async def review_flashcards(reviews: list[FlashcardReview], user_id: str = Depends(get_current_user)):
+    """Record a batch of reviews (e.g. a whole study session) in one transaction"""
+    if len(reviews) > MAX_REVIEW_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_REVIEW_BATCH} reviews per batch")
+    if not reviews:
+        return {"results": []}
+    now = datetime.now(timezone.utc)
+    batch = []
+    for review in reviews:
+        reviewed_at = review.reviewed_at or now
+        if reviewed_at.tzinfo is None:
+            reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+        # Queued offline reviews keep their time, but never one from the future
+        batch.append((review.card_id, review.confidence, min(reviewed_at.astimezone(timezone.utc), now)))
+    results = []
     
-    return {"message": "Review recorded successfully"}
+    async def write(db):
+        results.extend(await apply_reviews(db, user_id, batch))
+    await db_pool.write(write)
+    return {"results": results}
 
 @app.post("/api/flashcards/generate")
-async def generate_flashcards_from_note(data: dict, user_id: str = Depends(get_current_user)):
+async def generate_flashcards_from_note(data: dict, response: Response, user_id: str = Depends(get_current_user)):
     """AI-powered: Generate flashcards from a note"""
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="AI not configured")
@@ -797,8 +3406,7 @@ async def generate_flashcards_from_note(data: dict, user_id: str = Depends(get_c
     count = data.get('count', 5)
     
     # Get the note content
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute(
             "SELECT * FROM notes WHERE id = ? AND user_id = ?",
             (note_id, user_id)
@@ -809,7 +3417,6 @@ async def generate_flashcards_from_note(data: dict, user_id: str = Depends(get_c
         note = dict(note_row)
     
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
         prompt = f"""Based on the following study note, generate exactly {count} flashcards.
 
 Note Title: {note['title']}
@@ -824,44 +3431,186 @@ Generate {count} flashcards in this EXACT JSON format (no markdown, no code bloc
 
 Focus on key concepts, definitions, and important facts. Make questions clear and answers concise."""
         
-        response = model.generate_content(prompt)
-        cards_text = response.text.strip()
-        
-        # Clean up markdown code blocks if present
-        if cards_text.startswith('```'):
-            lines = cards_text.split('\n')
-            cards_text = '\n'.join([l for l in lines if not l.startswith('```')])
-        cards_text = cards_text.strip()
-        
-        import json
+        cards_text = await cached_generate(
+            response, "flashcards-generate", user_id, 'gemini-2.5-flash', prompt,
+            {"title": normalize_text(note['title']), "content": normalize_text(note['content']), "count": count},
+            transform=clean_cards_json
+        )
         cards_data = json.loads(cards_text)
         
         # Insert flashcards into database
         now = datetime.now(timezone.utc).isoformat()
         created_ids = []
         
-        async with aiosqlite.connect(DB_PATH) as db:
+        async def write(db):
             for card in cards_data[:count]:
                 card_id = str(uuid.uuid4())
                 await db.execute(
                     """INSERT INTO flashcards (id, user_id, note_id, question, answer, subject, 
-                       difficulty, times_reviewed, confidence_level, created_at) 
-                       VALUES (?, ?, ?, ?, ?, ?, 'medium', 0, 0, ?)""",
-                    (card_id, user_id, note_id, card['question'], card['answer'], note['subject'], now)
+                       difficulty, times_reviewed, confidence_level, created_at, due_at) 
+                       VALUES (?, ?, ?, ?, ?, ?, 'medium', 0, 0, ?, ?)""",
+                    (card_id, user_id, note_id, card['question'], card['answer'], note['subject'], now, now)
                 )
                 created_ids.append(card_id)
-            await db.commit()
+            await bump_analytics(db, user_id, cards=len(created_ids))
+        await db_pool.write(write)
         
         return {"message": f"Generated {len(created_ids)} flashcards", "flashcard_ids": created_ids}
     
     except json.JSONDecodeError as e:
-        print(f"[Flashcard Gen Error] JSON parse failed: {str(e)}\nResponse: {cards_text}")
+        print(f"[Flashcard Gen Error] JSON parse failed: {str(e)}\nResponse: {e.doc}")
         raise HTTPException(status_code=500, detail="AI response parsing failed")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[Flashcard Gen Error] {type(e).__name__}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batched generation: notes are packed into as few Gemini calls as fit the input
+# token budget (roughly 4 characters per token), and every card is inserted with
+# a single executemany at the end.
+
+AI_BATCH_TOKEN_BUDGET = int(os.getenv("AI_BATCH_TOKEN_BUDGET", "6000"))
+MAX_BATCH_NOTES = 200
+
+def pack_notes(notes: list, budget: int) -> list:
+    """Split notes into batches whose combined text fits `budget` tokens; long notes are truncated"""
+    batches, current, used = [], [], 0
+    for note in notes:
+        text = f"{note['title']}\n{note['content']}"[:budget * 4]
+        tokens = len(text) // 4 + 1
+        if current and used + tokens > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append({**note, "text": text})
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_batch_cards(text: str, batch_size: int, per_note: int) -> dict:
+    """Pull {note index: [(question, answer)]} out of a batch completion, skipping malformed items"""
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end < start:
+        raise ValueError("no JSON array in AI response")
+    cards: dict = {}
+    for item in json.loads(text[start:end + 1]):
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("note"))
+        except (TypeError, ValueError):
+            continue
+        question, answer = item.get("question"), item.get("answer")
+        if 1 <= index <= batch_size and isinstance(question, str) and isinstance(answer, str) \
+                and question.strip() and answer.strip() and len(cards.get(index, [])) < per_note:
+            cards.setdefault(index, []).append((question.strip(), answer.strip()))
+    return cards
+
+@app.post("/api/flashcards/generate-batch")
+async def generate_flashcards_batch(data: dict, request: Request, user_id: str = Depends(get_current_user)):
+    """AI-powered: generate flashcards for many notes as a background job"""
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="AI not configured")
+    note_ids = list(dict.fromkeys(data.get('note_ids') or []))
+    per_note = max(1, min(int(data.get('count', 5)), 20))
+    if not note_ids or len(note_ids) > MAX_BATCH_NOTES:
+        raise HTTPException(status_code=400, detail=f"note_ids must list 1 to {MAX_BATCH_NOTES} notes")
+    job = await jobs.enqueue(
+        user_id, "flashcards-generate", {"note_ids": note_ids, "count": per_note},
+        total=len(note_ids), idempotency_key=request.headers.get("idempotency-key")
+    )
+    return {"job_id": job["id"], "status": job["status"], "notes": len(note_ids)}
+
+@jobs.handler("flashcards-generate")
+async def run_flashcard_generation(job: JobContext):
+    note_ids, per_note = job.payload["note_ids"], job.payload["count"]
+    async with db_pool.reader() as db:
+        cursor = await db.execute(
+            f"SELECT id, title, content, subject FROM notes WHERE user_id = ? AND id IN ({', '.join('?' * len(note_ids))})",
+            (job.user_id, *note_ids)
+        )
+        notes = [dict(row) for row in await cursor.fetchall()]
+    if not notes:
+        raise HTTPException(status_code=404, detail="Note not found")
+    found = {note['id'] for note in notes}
+    errors = [f"note {note_id}: not found" for note_id in note_ids if note_id not in found]
+    await job.progress(0, len(notes))
+
+    rows, done = [], 0
+    for batch in pack_notes(notes, AI_BATCH_TOKEN_BUDGET):
+        listing = "\n\n".join(f"### Note {i}\n{note['text']}" for i, note in enumerate(batch, 1))
+        prompt = f"""Generate {per_note} flashcards for EACH of the following {len(batch)} study notes.
+
+{listing}
+
+Respond with a single JSON array only (no markdown, no code blocks), one object per flashcard:
+[
+  {{"note": 1, "question": "Q here", "answer": "A here"}}
+]
+"note" is the number of the note the card belongs to. Focus on key concepts, definitions, and important facts. Make questions clear and answers concise."""
+        # Busy/timeout errors propagate so the whole job is retried with backoff;
+        # nothing has been inserted yet, so a retry cannot duplicate cards
+        text = await ai_pool.generate("flashcards-generate-batch", job.user_id, 'gemini-2.5-flash', prompt)
+        try:
+            cards = await job.run_cpu(parse_batch_cards, text, len(batch), per_note)
+        except ValueError as e:
+            errors += [f"note {note['id']}: AI response parsing failed ({str(e)})" for note in batch]
+            cards = {}
+        now = datetime.now(timezone.utc).isoformat()
+        for i, note in enumerate(batch, 1):
+            rows += [
+                (str(uuid.uuid4()), job.user_id, note['id'], question, answer, note['subject'], now, now)
+                for question, answer in cards.get(i, [])
+            ]
+        done += len(batch)
+        await job.progress(done)
+
+    async def write(db):
+        await db.executemany(
+            """INSERT INTO flashcards (id, user_id, note_id, question, answer, subject, 
+               difficulty, times_reviewed, confidence_level, created_at, due_at) 
+               VALUES (?, ?, ?, ?, ?, ?, 'medium', 0, 0, ?, ?)""",
+            rows
+        )
+        await bump_analytics(db, job.user_id, cards=len(rows))
+    if rows:
+        await db_pool.write(write)
+    return {"flashcards_created": len(rows), "flashcard_ids": [row[0] for row in rows], "errors": errors}
+
 # ============= STUDY STREAK ENDPOINTS =============
+# One study_streaks row per user, advanced in O(1) whenever a session is logged
+# instead of re-deriving the streak from the whole history on every read.
+# current_streak is the run of consecutive days ending at last_active_date; it is
+# only reported while that date is today or yesterday (UTC, like session dates).
+
+STREAK_FIELDS = ("user_id", "current_streak", "longest_streak", "last_active_date", "total_minutes", "session_count")
+
+def new_streak(user_id: str) -> dict:
+    return {"user_id": user_id, "current_streak": 0, "longest_streak": 0,
+            "last_active_date": None, "total_minutes": 0, "session_count": 0}
+
+def extend_streak(streak: dict, day: str, minutes: int) -> dict:
+    """Fold one session (YYYY-MM-DD, never earlier than the last one) into the state"""
+    streak["total_minutes"] += minutes
+    last = streak["last_active_date"]
+    if last == day:
+        return streak
+    if last and date.fromisoformat(day) - date.fromisoformat(last) == timedelta(days=1):
+        streak["current_streak"] += 1
+    else:
+        streak["current_streak"] = 1
+    streak["longest_streak"] = max(streak["longest_streak"], streak["current_streak"])
+    streak["last_active_date"] = day
+    streak["session_count"] += 1
+    return streak
+
+async def load_streak(db: aiosqlite.Connection, user_id: str) -> dict:
+    cursor = await db.execute(
+        f"SELECT {', '.join(STREAK_FIELDS)} FROM study_streaks WHERE user_id = ?", (user_id,)
+    )
+    row = await cursor.fetchone()
+    return dict(zip(STREAK_FIELDS, row)) if row else new_streak(user_id)
 
 @app.post("/api/study/session")
 async def log_study_session(session: StudySession, user_id: str = Depends(get_current_user)):
@@ -870,7 +3619,7 @@ async def log_study_session(session: StudySession, user_id: str = Depends(get_cu
     session_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def write(db):
         # Try to update existing session for today
         cursor = await db.execute(
             "SELECT id, duration FROM study_sessions WHERE user_id = ? AND date = ?",
@@ -891,133 +3640,619 @@ async def log_study_session(session: StudySession, user_id: str = Depends(get_cu
                 "INSERT INTO study_sessions (id, user_id, date, duration, created_at) VALUES (?, ?, ?, ?, ?)",
                 (session_id, user_id, today, session.duration, now)
             )
-        await db.commit()
-    
+        streak = extend_streak(await load_streak(db, user_id), today, session.duration)
+        await db.execute(
+            f"INSERT OR REPLACE INTO study_streaks ({', '.join(STREAK_FIELDS)}) VALUES ({', '.join('?' * len(STREAK_FIELDS))})",
+            tuple(streak[f] for f in STREAK_FIELDS)
+        )
+    await db_pool.write(write)
     return {"message": "Study session logged successfully"}
 
 @app.get("/api/study/streak")
-async def get_study_streak(user_id: str = Depends(get_current_user)):
+async def get_study_streak(user_id: str = Depends(get_current_user), db: aiosqlite.Connection = Depends(get_db)):
     """Get current study streak and statistics"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT date, duration FROM study_sessions WHERE user_id = ? ORDER BY date DESC",
-            (user_id,)
+    return await compute_streak(db, user_id)
+
+async def compute_streak(db: aiosqlite.Connection, user_id: str) -> dict:
+    streak = await load_streak(db, user_id)
+    today = datetime.now(timezone.utc).date()
+    recent = {today.isoformat(), (today - timedelta(days=1)).isoformat()}
+    return {
+        "current_streak": streak["current_streak"] if streak["last_active_date"] in recent else 0,
+        "longest_streak": streak["longest_streak"],
+        "total_sessions": streak["session_count"],
+        "total_minutes": streak["total_minutes"]
+    }
+
+# ============= ANALYTICS ROLLUPS =============
+# user_analytics keeps one row per user with the aggregates /api/study/analytics
+# reports, adjusted by bump_analytics() inside the same write unit as every
+# task/note/flashcard change. Counts per task status and per note subject are
+# stored as JSON [key, count] pairs because a note's subject may be NULL.
+
+def load_counts(raw: str) -> dict:
+    return {key: count for key, count in json.loads(raw or '[]')}
+
+def dump_counts(counts: dict) -> str:
+    return json.dumps([[key, count] for key, count in counts.items() if count])
+
+async def bump_analytics(db: aiosqlite.Connection, user_id: str, tasks: dict = None, notes: dict = None,
+                         cards: int = 0, reviews: int = 0, confidence: int = 0):
+    """Apply deltas to a user's rollup row; call from the write unit that made the change"""
+    cursor = await db.execute(
+        "SELECT task_counts, note_subjects, flashcard_total, review_total, confidence_sum FROM user_analytics WHERE user_id = ?",
+        (user_id,)
+    )
+    row = await cursor.fetchone() or ('[]', '[]', 0, 0, 0)
+    task_counts, note_subjects = load_counts(row[0]), load_counts(row[1])
+    for key, delta in (tasks or {}).items():
+        task_counts[key] = task_counts.get(key, 0) + delta
+    for key, delta in (notes or {}).items():
+        note_subjects[key] = note_subjects.get(key, 0) + delta
+    await db.execute(
+        """INSERT OR REPLACE INTO user_analytics
+           (user_id, task_counts, note_subjects, flashcard_total, review_total, confidence_sum)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user_id, dump_counts(task_counts), dump_counts(note_subjects),
+         row[2] + cards, row[3] + reviews, row[4] + confidence)
+    )
+
+async def check_user_analytics(db: aiosqlite.Connection, repair: bool = False, user_id: Optional[str] = None) -> tuple:
+    """
+    Recompute every user's rollup (or just `user_id`'s) from the source tables and
+    compare it with the stored row. Returns (users checked, users that had drifted);
+    with repair=True drifted rows are rewritten.
+    """
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+    expected: dict = {}
+    def entry(owner):
+        return expected.setdefault(owner, [{}, {}, 0, 0, 0])
+    cursor = await db.execute(f"SELECT user_id, status, COUNT(*) FROM tasks {where} GROUP BY user_id, status", params)
+    async for owner, status, count in cursor:
+        entry(owner)[0][status] = count
+    cursor = await db.execute(f"SELECT user_id, subject, COUNT(*) FROM notes {where} GROUP BY user_id, subject", params)
+    async for owner, subject, count in cursor:
+        entry(owner)[1][subject] = count
+    cursor = await db.execute(
+        f"SELECT user_id, COUNT(*), COALESCE(SUM(times_reviewed), 0), COALESCE(SUM(confidence_level), 0) FROM flashcards {where} GROUP BY user_id",
+        params
+    )
+    async for owner, total, reviews, confidence in cursor:
+        entry(owner)[2:] = [total, reviews, confidence]
+
+    cursor = await db.execute(
+        f"SELECT user_id, task_counts, note_subjects, flashcard_total, review_total, confidence_sum FROM user_analytics {where}",
+        params
+    )
+    stored = {row[0]: [load_counts(row[1]), load_counts(row[2]), row[3], row[4], row[5]] for row in await cursor.fetchall()}
+    drifted = [u for u in expected.keys() | stored.keys()
+               if expected.get(u, [{}, {}, 0, 0, 0]) != stored.get(u, [{}, {}, 0, 0, 0])]
+    if repair and drifted:
+        await db.executemany("DELETE FROM user_analytics WHERE user_id = ?", [(u,) for u in drifted])
+        await db.executemany(
+            """INSERT INTO user_analytics
+               (user_id, task_counts, note_subjects, flashcard_total, review_total, confidence_sum)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [(u, dump_counts(expected[u][0]), dump_counts(expected[u][1]), *expected[u][2:]) for u in drifted if u in expected]
         )
-        sessions = await cursor.fetchall()
-        
-        if not sessions:
-            return {"current_streak": 0, "longest_streak": 0, "total_sessions": 0, "total_minutes": 0}
-        
-        from datetime import date, timedelta
-        dates = [datetime.fromisoformat(s['date'] + 'T00:00:00').date() if 'T' not in s['date'] else datetime.fromisoformat(s['date']).date() for s in sessions]
-        total_minutes = sum(s['duration'] for s in sessions)
-        
-        # Calculate current streak
-        today = date.today()
-        current_streak = 0
-        check_date = today
-        
-        while check_date in dates:
-            current_streak += 1
-            check_date -= timedelta(days=1)
-        
-        # If no session today, check if yesterday had one
-        if today not in dates and current_streak == 0:
-            yesterday = today - timedelta(days=1)
-            if yesterday in dates:
-                current_streak = 1
-                check_date = yesterday - timedelta(days=1)
-                while check_date in dates:
-                    current_streak += 1
-                    check_date -= timedelta(days=1)
-        
-        # Calculate longest streak
-        longest_streak = 0
-        temp_streak = 0
-        prev_date = None
-        
-        for d in sorted(dates):
-            if prev_date is None or d == prev_date + timedelta(days=1):
-                temp_streak += 1
-                longest_streak = max(longest_streak, temp_streak)
-            else:
-                temp_streak = 1
-            prev_date = d
-        
-        return {
-            "current_streak": current_streak,
-            "longest_streak": longest_streak,
-            "total_sessions": len(sessions),
-            "total_minutes": total_minutes
-        }
+    return len(expected.keys() | stored.keys()), len(drifted)
 
 @app.get("/api/study/analytics")
-async def get_study_analytics(user_id: str = Depends(get_current_user)):
+async def get_study_analytics(user_id: str = Depends(get_current_user), db: aiosqlite.Connection = Depends(get_db)):
     """Get study analytics for charts"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
-        # Get last 30 days of study sessions
-        cursor = await db.execute(
-            """SELECT date, duration FROM study_sessions 
-               WHERE user_id = ? 
-               ORDER BY date DESC LIMIT 30""",
-            (user_id,)
-        )
-        sessions = [dict(row) for row in await cursor.fetchall()]
-        
-        # Get task completion stats
-        cursor = await db.execute(
-            """SELECT status, COUNT(*) as count FROM tasks 
-               WHERE user_id = ? 
-               GROUP BY status""",
-            (user_id,)
-        )
-        task_stats = {row['status']: row['count'] for row in await cursor.fetchall()}
+    # Get last 30 days of study sessions
+    cursor = await db.execute(
+        """SELECT date, duration FROM study_sessions 
+           WHERE user_id = ? 
+           ORDER BY date DESC LIMIT 30""",
+        (user_id,)
+    )
+    sessions = [dict(row) for row in await cursor.fetchall()]
         
-        # Get notes by subject
-        cursor = await db.execute(
-            """SELECT subject, COUNT(*) as count FROM notes 
-               WHERE user_id = ? 
-               GROUP BY subject""",
-            (user_id,)
-        )
-        notes_by_subject = {row['subject']: row['count'] for row in await cursor.fetchall()}
+    # Everything else comes from the user's rollup row
+    cursor = await db.execute(
+        "SELECT task_counts, note_subjects, flashcard_total, review_total, confidence_sum FROM user_analytics WHERE user_id = ?",
+        (user_id,)
+    )
+    row = await cursor.fetchone() or ('[]', '[]', 0, 0, 0)
+    total = row[2]
         
-        # Get flashcard stats
-        cursor = await db.execute(
-            """SELECT COUNT(*) as total, 
-               AVG(confidence_level) as avg_confidence,
-               SUM(times_reviewed) as total_reviews
-               FROM flashcards WHERE user_id = ?""",
-            (user_id,)
-        )
-        flashcard_stats = dict(await cursor.fetchone())
-        
-        return {
-            "study_sessions": sessions,
-            "task_stats": task_stats,
-            "notes_by_subject": notes_by_subject,
-            "flashcard_stats": flashcard_stats
+    return {
+        "study_sessions": sessions,
+        "task_stats": load_counts(row[0]),
+        "notes_by_subject": load_counts(row[1]),
+        "flashcard_stats": {
+            "total": total,
+            "avg_confidence": row[4] / total if total else None,
+            "total_reviews": row[3] if total else None
         }
+    }
+
+# ============= DASHBOARD =============
+# Everything the dashboard shows in one authenticated round trip on one pooled
+# connection. Each section carries its own ETag; a client that sends the tags it
+# already has in If-None-Match gets those sections back as {"etag", "unchanged"}
+# only. The response ETag comes from the collection versions, so a repeat load
+# with nothing changed is a 304 before any section query runs.
+
+def section_etag(name: str, body) -> str:
+    digest = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f'W/"{name}-{digest}"'
+
+@app.get("/api/dashboard")
+async def get_dashboard(request: Request, response: Response, user_id: str = Depends(get_current_user),
+                        notes_limit: int = 3, tasks_limit: int = 3, posts_limit: int = 3,
+                        db: aiosqlite.Connection = Depends(get_db)):
+    """Recent notes, pending tasks, recent posts and the study streak in one response"""
+    # The streak depends on today's date as well as the sessions table
+    today = datetime.now(timezone.utc).date().isoformat()
+    if cached := await not_modified(request, response, db, user_id, ("notes", "tasks", "posts", "study_sessions"),
+                                   today + feed_cache.etag_salt()):
+        return cached
+    cur = await db.execute(
+        "SELECT id, title, content, subject, created_at FROM notes WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+        (user_id, page_size(notes_limit))
+    )
+    notes = [{"id": r[0], "title": r[1], "content": r[2], "subject": r[3], "created_at": r[4]} for r in await cur.fetchall()]
+    cur = await db.execute("SELECT COUNT(*) FROM notes WHERE user_id = ?", (user_id,))
+    notes_count = (await cur.fetchone())[0]
+
+    cur = await db.execute(
+        "SELECT id, title, description, subject, priority, due_date, estimated_time, status, created_at FROM tasks WHERE user_id = ? AND status = 'pending' ORDER BY created_at DESC, id DESC LIMIT ?",
+        (user_id, page_size(tasks_limit))
+    )
+    tasks = [{"id": r[0], "title": r[1], "description": r[2], "subject": r[3], "priority": r[4], "due_date": r[5], "estimated_time": r[6], "status": r[7], "created_at": r[8]} for r in await cur.fetchall()]
+    cur = await db.execute("SELECT COUNT(*) FROM tasks WHERE user_id = ? AND status = 'pending'", (user_id,))
+    pending_count = (await cur.fetchone())[0]
+
+    posts, _ = await feed_page(db, user_id, page_size(posts_limit))
+    # Kept by triggers (migration 13) rather than counting the whole table on every load
+    cur = await db.execute("SELECT count FROM table_counts WHERE name = 'posts'")
+    row = await cur.fetchone()
+    posts_count = row[0] if row else 0
+
+    sections = {
+        "notes": {"count": notes_count, "items": notes},
+        "tasks": {"pending_count": pending_count, "items": tasks},
+        "posts": {"count": posts_count, "items": posts},
+        "streak": await compute_streak(db, user_id),
+    }
+    known = parse_if_none_match(request.headers.get("if-none-match"))
+    body = {}
+    for name, section in sections.items():
+        tag = section_etag(name, section)
+        body[name] = {"etag": tag, "unchanged": True} if tag in known else {"etag": tag, **section}
+    return body
 
-@app.get("/favicon.ico")
-async def favicon():
-    # Serve the app logo as favicon so browsers requesting /favicon.ico don't 404.
-    candidate = os.path.join("frontend", "assets", "favicon.png")
-    alt = os.path.join("frontend", "assets", "logo.png")
-    if os.path.exists(candidate):
-        return FileResponse(candidate, media_type="image/png")
-    if os.path.exists(alt):
-        return FileResponse(alt, media_type="image/png")
-    # fallback 404
-    raise HTTPException(status_code=404, detail="favicon not found")
+# ============= SEARCH =============
+# BM25-ranked full-text search over the caller's notes and flashcards and the
+# public community posts, backed by the FTS5 tables from migration 8. Results
+# from all three are merged by score (lower is better) and paged with a keyset
+# cursor over (score, kind:rowid).
+
+SEARCH_KINDS = {
+    # kind: (FTS table, source table, title column, snippet column, BM25 column weights, per-user)
+    "note": ("notes_fts", "notes", "title", 2, "0, 10.0, 1.0, 4.0", True),
+    "flashcard": ("flashcards_fts", "flashcards", "question", 2, "0, 5.0, 1.0", True),
+    "post": ("posts_fts", "posts", "title", 1, "10.0, 1.0", False),
+}
+
+def fts_query(q: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, the last as a prefix"""
+    terms = re.findall(r'\w+', q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain a word")
+    return ' '.join(f'"{t}"' for t in terms) + '*'
+
+@app.get("/api/search")
+async def search(response: Response, q: str, user_id: str = Depends(get_current_user), types: Optional[str] = None,
+                 limit: int = 20, cursor: Optional[str] = None, db: aiosqlite.Connection = Depends(get_db)):
+    """Search notes, flashcards and posts; `types` is a comma-separated subset of note,flashcard,post"""
+    limit = page_size(limit)
+    kinds = [k.strip() for k in types.split(",")] if types else list(SEARCH_KINDS)
+    if not kinds or any(k not in SEARCH_KINDS for k in kinds):
+        raise HTTPException(status_code=400, detail=f"types must be a subset of {', '.join(SEARCH_KINDS)}")
+    match = fts_query(q)
+    owner = user_id.replace('-', '')
+    arms, params = [], []
+    for kind in kinds:
+        fts, table, title, body, weights, per_user = SEARCH_KINDS[kind]
+        arms.append(f"""
+            SELECT '{kind}' AS kind, t.id AS id, t.{title} AS title,
+                   snippet({fts}, {body}, '<mark>', '</mark>', '…', 16) AS snippet,
+                   bm25({fts}, {weights}) AS score, '{kind}:' || {fts}.rowid AS sid
+            FROM {fts} JOIN {table} t ON t.rowid = {fts}.rowid
+            WHERE {fts} MATCH ?""")
+        params.append(f'owner : "{owner}" AND - owner : ({match})' if per_user else match)
+    where = ""
+    if cursor:
+        score, sid = decode_cursor(cursor)
+        try:
+            score = float(score)
+        except ValueError:
+            score = math.nan
+        if not math.isfinite(score):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        where = "WHERE (score, sid) > (?, ?)"
+        params += [score, sid]
+    cur = await db.execute(
+        f"SELECT kind, id, title, snippet, score, sid FROM ({' UNION ALL '.join(arms)}) {where} ORDER BY score, sid LIMIT ?",
+        (*params, limit + 1)
+    )
+    rows = await cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["sid"])
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {
+        "results": [{"kind": r["kind"], "id": r["id"], "title": r["title"], "snippet": r["snippet"], "score": r["score"]} for r in rows],
+        "next_cursor": next_cursor
+    }
+
+# ============= EXPORT / IMPORT =============
+# A user's notes, tasks, flashcards, mood logs and study sessions as NDJSON: one
+# header line, then one {"type", "data"} object per row. Export reads with
+# fetchmany on its own snapshot connection and import parses the upload line by
+# line, so memory stays flat whatever the size. Imported rows keep their ids, so
+# re-importing the same file is a no-op; an id that belongs to another account gets a
+# fresh one instead, and rows that still collide (e.g. a second study session for
+# the same day) are counted as conflicts.
+
+EXPORT_TYPES = {
+    "note": "notes",
+    "task": "tasks",
+    "flashcard": "flashcards",
+    "mood_log": "mood_logs",
+    "study_session": "study_sessions",
+}
+EXPORT_VERSION = 1
+EXPORT_BATCH = 500
+IMPORT_MAX_LINE_BYTES = 1024 * 1024
+
+def ndjson_line(obj) -> bytes:
+    return (json.dumps(obj, separators=(",", ":"), default=str) + "\n").encode()
+
+async def export_rows(user_id: str):
+    """Yield the user's export as NDJSON chunks from one read snapshot"""
+    async with aiosqlite.connect(DB_PATH, factory=TimedConnection) as db:
+        await apply_pragmas(db)
+        await db.execute("BEGIN")
+        try:
+            yield ndjson_line({"type": "export", "version": EXPORT_VERSION,
+                               "exported_at": datetime.now(timezone.utc).isoformat()})
+            for kind, table in EXPORT_TYPES.items():
+                cursor = await db.execute(f"SELECT * FROM {table} WHERE user_id = ? ORDER BY rowid", (user_id,))
+                columns = [d[0] for d in cursor.description]
+                while rows := await cursor.fetchmany(EXPORT_BATCH):
+                    yield b"".join(
+                        ndjson_line({"type": kind, "data": {c: v for c, v in zip(columns, row) if c != "user_id"}})
+                        for row in rows
+                    )
+        finally:
+            await db.rollback()
+
+async def ndjson_records(request: Request):
+    """Parse the request body as NDJSON while it arrives; undecodable lines yield None"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Import lines are limited to {IMPORT_MAX_LINE_BYTES} bytes")
+        for line in lines:
+            if line.strip():
+                yield parse_ndjson_line(line)
+    if buffer.strip():
+        yield parse_ndjson_line(buffer)
+
+def parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+async def import_columns(db: aiosqlite.Connection) -> dict:
+    """table -> [(column, not null, default SQL)] for every importable table"""
+    columns = {}
+    for table in EXPORT_TYPES.values():
+        cursor = await db.execute(f"PRAGMA table_info({table})")
+        columns[table] = [(r["name"], bool(r["notnull"]), r["dflt_value"]) for r in await cursor.fetchall()]
+    return columns
+
+def import_row(table: str, columns: list, data, user_id: str, now: str) -> Optional[tuple]:
+    """Values for one imported row in `columns` order, or None if it can't be stored"""
+    if not isinstance(data, dict):
+        return None
+    data = {**data, "user_id": user_id}
+    data.setdefault("id", str(uuid.uuid4()))
+    data.setdefault("created_at", now)
+    if table == "flashcards" and not data.get("due_at"):
+        data["due_at"] = data["created_at"]
+    if table == "study_sessions":
+        # Streak rebuilds replay these, so they must be real days and minutes
+        try:
+            data["date"] = date.fromisoformat(str(data.get("date"))[:10]).isoformat()
+        except ValueError:
+            return None
+        if not isinstance(data.get("duration") or 0, int):
+            return None
+    values = []
+    for name, notnull, default in columns:
+        value = data.get(name)
+        if value is not None and not isinstance(value, (str, int, float)):
+            return None
+        if value is None and notnull and default is None:
+            return None
+        values.append(value)
+    return tuple(values)
+
+@app.get("/api/export")
+async def export_data(user_id: str = Depends(get_current_user)):
+    """Download all of the user's notes, tasks, flashcards, mood logs and study sessions as NDJSON"""
+    filename = f"studentflow-export-{datetime.now(timezone.utc).strftime('%Y%m%d')}.ndjson"
+    return StreamingResponse(
+        export_rows(user_id), media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/import")
+async def import_data(request: Request, user_id: str = Depends(get_current_user)):
+    """Load an NDJSON export into the caller's account; rows already in it are skipped"""
+    async with db_pool.reader() as db:
+        columns = await import_columns(db)
+    statements = {}
+    for table, cols in columns.items():
+        # NOT NULL columns with a default fall back to it when the row leaves them out
+        values = ", ".join(f"COALESCE(?, {default})" if notnull and default is not None else "?"
+                           for _, notnull, default in cols)
+        statements[table] = f"INSERT OR IGNORE INTO {table} ({', '.join(c for c, _, _ in cols)}) VALUES ({values})"
+
+    counts = {kind: {"received": 0, "inserted": 0, "existing": 0, "reassigned": 0, "conflicts": 0}
+              for kind in EXPORT_TYPES}
+    skipped = 0
+    pending = {table: [] for table in EXPORT_TYPES.values()}
+    now = datetime.now(timezone.utc).isoformat()
+
+    async def flush(kind, table):
+        rows, pending[table] = pending[table], []
+        id_index = [c for c, _, _ in columns[table]].index("id")
+        async def write(db):
+            # Ids are global: skip the caller's own rows, renumber anyone else's
+            cursor = await db.execute(
+                f"SELECT id, user_id FROM {table} WHERE id IN ({', '.join('?' * len(rows))})",
+                [row[id_index] for row in rows]
+            )
+            owners = {row["id"]: row["user_id"] for row in await cursor.fetchall()}
+            batch, existing, reassigned = [], 0, 0
+            for row in rows:
+                owner = owners.get(row[id_index])
+                if owner == user_id:
+                    existing += 1
+                    continue
+                if owner is not None:
+                    row = row[:id_index] + (str(uuid.uuid4()),) + row[id_index + 1:]
+                    reassigned += 1
+                batch.append(row)
+            cursor = await db.executemany(statements[table], batch)
+            return cursor.rowcount, existing, reassigned
+        inserted, existing, reassigned = await db_pool.write(write)
+        counts[kind]["inserted"] += inserted
+        counts[kind]["existing"] += existing
+        counts[kind]["reassigned"] += reassigned
+        counts[kind]["conflicts"] += len(rows) - existing - inserted
+
+    async for record in ndjson_records(request):
+        kind = record.get("type") if isinstance(record, dict) else None
+        if kind == "export":
+            version = record.get("version")
+            if isinstance(version, int) and version > EXPORT_VERSION:
+                raise HTTPException(status_code=400, detail="Export was written by a newer version")
+            continue
+        table = EXPORT_TYPES.get(kind)
+        row = table and import_row(table, columns[table], record.get("data"), user_id, now)
+        if not row:
+            skipped += 1
+            continue
+        counts[kind]["received"] += 1
+        pending[table].append(row)
+        if len(pending[table]) >= EXPORT_BATCH:
+            await flush(kind, table)
+    for kind, table in EXPORT_TYPES.items():
+        if pending[table]:
+            await flush(kind, table)
+
+    async def rebuild(db):
+        await rebuild_study_streaks(db, user_id)
+        await check_user_analytics(db, repair=True, user_id=user_id)
+    await db_pool.write(rebuild)
+    print(f"[Import] {user_id}: {sum(c['inserted'] for c in counts.values())} rows inserted, "
+          f"{sum(c['conflicts'] for c in counts.values())} conflicts, {skipped} skipped")
+    return {"counts": counts, "skipped": skipped}
+
+# ============= STATIC ASSETS =============
+# The frontend is read into memory once at startup and served from there. Each
+# file is also reachable under a content-hashed name (css/style.<hash>.css) with
+# a one-year immutable Cache-Control, and index.html is rewritten to reference
+# those names, so a returning browser only revalidates index.html. Text assets
+# carry brotli/gzip variants: `python app.py build-static` writes them next to
+# the sources as .br/.gz files, and missing or stale ones are built at startup.
+
+STATIC_ROOT = "frontend"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/manifest+json", "image/svg+xml")
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+ASSET_REF = re.compile(r'(href|src)="(/?)([^"#?:]+)(\?[^"]*)?"')
+
+def compress_asset(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11)
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+class StaticAsset:
+    def __init__(self, body: bytes, media_type: str, variants: dict):
+        self.body = body
+        self.media_type = media_type
+        self.variants = variants  # content-encoding -> compressed body
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.etag = f'W/"{self.digest[:16]}"'
+
+class StaticAssets:
+    """ASGI app serving the in-memory frontend; mounted at / in place of StaticFiles"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.encodings = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+        self.routes: dict = {}  # url path -> (StaticAsset, Cache-Control)
+
+    def files(self) -> dict:
+        found = {}
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+                    path = os.path.join(dirpath, name)
+                    found[os.path.relpath(path, self.root).replace(os.sep, "/")] = path
+        return found
+
+    def read(self, path: str) -> StaticAsset:
+        with open(path, "rb") as f:
+            body = f.read()
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        variants = {}
+        if media_type.startswith(COMPRESSIBLE_TYPES):
+            for encoding in self.encodings:
+                sibling = path + PRECOMPRESSED_SUFFIXES[encoding]
+                if os.path.exists(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(path):
+                    with open(sibling, "rb") as f:
+                        data = f.read()
+                else:
+                    data = compress_asset(body, encoding)
+                if len(data) < len(body):
+                    variants[encoding] = data
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        return StaticAsset(body, media_type, variants)
+
+    def load(self) -> int:
+        """Read every file under root and build the route table; returns the file count"""
+        files = self.files()
+        routes, hashed = {}, {}
+        for rel, path in files.items():
+            if rel == "index.html":
+                continue
+            asset = self.read(path)
+            base, ext = os.path.splitext(rel)
+            hashed[rel] = f"{base}.{asset.digest[:12]}{ext}"
+            routes[rel] = (asset, REVALIDATE)
+            routes[hashed[rel]] = (asset, IMMUTABLE)
+        # Browsers ask for /favicon.ico on their own; answer with the logo
+        for candidate in ("assets/favicon.png", "assets/logo.png"):
+            if candidate in routes:
+                routes["favicon.ico"] = routes[candidate]
+                hashed["favicon.ico"] = hashed[candidate]
+                break
+        if "index.html" in files:
+            with open(files["index.html"], encoding="utf-8") as f:
+                html = f.read()
+            def pin(m):
+                attr, slash, ref, _ = m.groups()
+                return f'{attr}="{slash}{hashed[ref]}"' if ref in hashed else m.group(0)
+            body = ASSET_REF.sub(pin, html).encode()
+            variants = {encoding: compress_asset(body, encoding) for encoding in self.encodings}
+            routes["index.html"] = routes[""] = (StaticAsset(body, "text/html; charset=utf-8", variants), REVALIDATE)
+        self.routes = routes
+        return len(files)
+
+    def write_precompressed(self) -> int:
+        """Write .br/.gz siblings for every compressible file; returns the number written"""
+        written = 0
+        for rel, path in self.files().items():
+            if rel == "index.html" or not (mimetypes.guess_type(path)[0] or "").startswith(COMPRESSIBLE_TYPES):
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            for encoding in self.encodings:
+                with open(path + PRECOMPRESSED_SUFFIXES[encoding], "wb") as f:
+                    f.write(compress_asset(body, encoding))
+                written += 1
+        return written
+
+    def respond(self, asset: StaticAsset, cache_control: str, headers: Headers) -> Response:
+        response_headers = {"ETag": asset.etag, "Cache-Control": cache_control}
+        if asset.variants:
+            response_headers["Vary"] = "Accept-Encoding"
+        if asset.etag in parse_if_none_match(headers.get("if-none-match")):
+            return Response(status_code=304, headers=response_headers)
+        body = asset.body
+        accepted = headers.get("accept-encoding", "")
+        for encoding in self.encodings:
+            if encoding in asset.variants and encoding in accepted:
+                body = asset.variants[encoding]
+                response_headers["Content-Encoding"] = encoding
+                break
+        return Response(body, media_type=asset.media_type, headers=response_headers)
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope["path"].lstrip("/"))
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+        elif route is None:
+            response = PlainTextResponse("Not Found", status_code=404)
+        else:
+            response = self.respond(*route, Headers(scope=scope))
+        await response(scope, receive, send)
+
+static_assets = StaticAssets(STATIC_ROOT)
 
 # Mount static files (frontend)
-app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
+app.mount("/", static_assets, name="frontend")
+
+# ============= MAINTENANCE COMMANDS =============
+# Run as `python app.py <command>`; without a command the server starts.
+
+async def cmd_reconcile_counters():
+    await init_db()
+    async with aiosqlite.connect(DB_PATH) as db:
+        updated = await reconcile_post_counters(db)
+        await reconcile_table_count(db, "posts")
+        await db.commit()
+    print(f"[Maintenance] Rebuilt like/comment counters for {updated} posts and the post count")
+
+async def cmd_rebuild_streaks():
+    await init_db()
+    async with aiosqlite.connect(DB_PATH) as db:
+        users, drifted = await rebuild_study_streaks(db)
+        await db.commit()
+    print(f"[Maintenance] Rebuilt study streaks for {users} users ({drifted} had drifted)")
+
+async def cmd_check_analytics():
+    repair = "--repair" in sys.argv[2:]
+    await init_db()
+    async with aiosqlite.connect(DB_PATH) as db:
+        users, drifted = await check_user_analytics(db, repair=repair)
+        await db.commit()
+    action = "repaired" if repair else "drifted (run with --repair to fix)"
+    print(f"[Maintenance] Checked analytics rollups for {users} users: {drifted} {action}")
+
+async def cmd_build_static():
+    written = static_assets.write_precompressed()
+    print(f"[Maintenance] Wrote {written} precompressed static files under {STATIC_ROOT}/")
+
+COMMANDS = {
+    "reconcile-counters": cmd_reconcile_counters,
+    "rebuild-streaks": cmd_rebuild_streaks,
+    "check-analytics": cmd_check_analytics,
+    "build-static": cmd_build_static,
+}
 
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        if sys.argv[1] not in COMMANDS:
+            sys.exit(f"Unknown command {sys.argv[1]!r}. Available: {', '.join(COMMANDS)}")
+        asyncio.run(COMMANDS[sys.argv[1]]())
+        sys.exit(0)
     import uvicorn
     port = int(os.getenv("PORT", 8080))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=port, timeout_graceful_shutdown=5)
\ No newline at end of file
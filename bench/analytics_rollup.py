@@ -0,0 +1,88 @@
+"""
+Study analytics: the three per-user aggregate queries /api/study/analytics used to
+run against the raw tables vs the one primary-key read of the user_analytics rollup,
+plus how long a full backfill and a drift check take.
+
+    python bench/analytics_rollup.py [--users 100000] [--rows-per-user 5] [--samples 2000]
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+
+import common
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--users", type=int, default=100_000)
+parser.add_argument("--rows-per-user", type=int, default=5, help="tasks, notes and flashcards each")
+parser.add_argument("--samples", type=int, default=2000, help="users read in each timing loop")
+args = parser.parse_args()
+
+import aiosqlite  # noqa: E402
+import app  # noqa: E402
+
+RAW_QUERIES = [
+    "SELECT status, COUNT(*) FROM tasks WHERE user_id = ? GROUP BY status",
+    "SELECT subject, COUNT(*) FROM notes WHERE user_id = ? GROUP BY subject",
+    "SELECT COUNT(*), AVG(confidence_level), SUM(times_reviewed) FROM flashcards WHERE user_id = ?",
+]
+ROLLUP_QUERY = ("SELECT task_counts, note_subjects, flashcard_total, review_total, confidence_sum "
+                "FROM user_analytics WHERE user_id = ?")
+
+def seed():
+    rng = random.Random(12)
+    users, per = range(args.users), range(args.rows_per_user)
+    db = sqlite3.connect(common.DB_PATH)
+    db.executemany(
+        "INSERT INTO tasks (id, user_id, title, status, created_at) VALUES (?, ?, ?, ?, ?)",
+        ((f"t{u}_{i}", f"u{u}", "task", rng.choice(["pending", "in-progress", "completed"]), "2026-01-01")
+         for u in users for i in per)
+    )
+    db.executemany(
+        "INSERT INTO notes (id, user_id, title, content, subject, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"n{u}_{i}", f"u{u}", "note", "body", rng.choice(["math", "bio", "cs", None]), "2026-01-01")
+         for u in users for i in per)
+    )
+    db.executemany(
+        "INSERT INTO flashcards (id, user_id, question, answer, times_reviewed, confidence_level, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"f{u}_{i}", f"u{u}", "q", "a", rng.randint(0, 9), rng.randint(0, 5), "2026-01-01")
+         for u in users for i in per)
+    )
+    # Seeded behind the triggers' back: start from an empty rollup so the backfill is timed
+    db.execute("DELETE FROM user_analytics")
+    db.commit()
+    db.close()
+
+async def main():
+    await app.init_db()
+    started = time.perf_counter()
+    seed()
+    print(f"seeded {args.users:,} users x {args.rows_per_user} tasks/notes/flashcards "
+          f"in {time.perf_counter() - started:.1f} s")
+
+    async with aiosqlite.connect(common.DB_PATH) as db:
+        started = time.perf_counter()
+        await app.check_user_analytics(db, repair=True)
+        await db.commit()
+        print(f"backfill: {time.perf_counter() - started:.1f} s")
+        started = time.perf_counter()
+        checked, drifted = await app.check_user_analytics(db)
+        print(f"check: {time.perf_counter() - started:.1f} s ({checked:,} users, {drifted} drifted)")
+
+        sample = [f"u{random.randrange(args.users)}" for _ in range(args.samples)]
+        started = time.perf_counter()
+        for user_id in sample:
+            for sql in RAW_QUERIES:
+                await (await db.execute(sql, (user_id,))).fetchall()
+        raw = (time.perf_counter() - started) / len(sample) * 1000
+        started = time.perf_counter()
+        for user_id in sample:
+            row = await (await db.execute(ROLLUP_QUERY, (user_id,))).fetchone()
+            app.load_counts(row[0])
+            app.load_counts(row[1])
+        rollup = (time.perf_counter() - started) / len(sample) * 1000
+        print(f"raw aggregates {raw:.3f} ms/user, rollup read {rollup:.3f} ms/user")
+
+asyncio.run(main())
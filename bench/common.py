@@ -0,0 +1,47 @@
+"""
+Shared setup for the benchmark scripts. Import it before `app`: it points DB_PATH
+at a fresh temporary database, turns rate limiting off and puts the repo root on
+sys.path, so every script can be run as `python bench/<script>.py` from anywhere.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="studentflow-bench-")
+DB_PATH = os.path.join(WORKDIR, "bench.db")
+
+os.environ["DB_PATH"] = DB_PATH
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def rss_kib(pid: int, field: str = "VmRSS") -> int:
+    """Resident memory of a process from /proc (Linux only)"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def start_server(port: int, *args: str, env: dict = None) -> subprocess.Popen:
+    """Run the app under uvicorn on `port` and wait until /healthz answers"""
+    import httpx
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning", *args],
+        env={**os.environ, **(env or {})}, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/healthz")
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"server on port {port} did not start")
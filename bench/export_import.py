@@ -0,0 +1,119 @@
+"""
+Streaming export/import for one user: Python heap peak while export_rows streams
+(tracemalloc, for several row counts), then export, import and duplicate re-import
+timings against a uvicorn server.
+
+    python bench/export_import.py [--rows 100000] [--memory-rows 10000,100000,400000] [--port 8765]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import common
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--rows", type=int, default=100_000, help="rows for the HTTP run, split over the five tables")
+parser.add_argument("--memory-rows", default="10000,100000,400000", help="note counts for the heap-peak runs")
+parser.add_argument("--port", type=int, default=8765)
+args = parser.parse_args()
+
+import httpx  # noqa: E402
+import app  # noqa: E402
+
+def seed(user_id: str, per_table: int, tables=("notes", "tasks", "flashcards", "mood_logs", "study_sessions")):
+    db = sqlite3.connect(common.DB_PATH)
+    rows = range(per_table)
+    if "notes" in tables:
+        db.executemany(
+            "INSERT INTO notes (id, user_id, title, content, subject, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"{user_id}-n{i}", user_id, f"title {i}", "lorem ipsum dolor sit amet " * 20, "cs", "2026-01-01") for i in rows)
+        )
+    if "tasks" in tables:
+        db.executemany(
+            "INSERT INTO tasks (id, user_id, title, description, subject, priority, status, due_date, estimated_time, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"{user_id}-t{i}", user_id, f"task {i}", "desc " * 20, "cs", "high", ("pending", "completed")[i % 2],
+              "2026-02-01", 30, "2026-01-01") for i in rows)
+        )
+    if "flashcards" in tables:
+        db.executemany(
+            "INSERT INTO flashcards (id, user_id, question, answer, subject, created_at, due_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((f"{user_id}-f{i}", user_id, f"q {i}?", "answer " * 10, "bio", "2026-01-01", "2026-01-01") for i in rows)
+        )
+    if "mood_logs" in tables:
+        db.executemany(
+            "INSERT INTO mood_logs (id, user_id, mood_score, energy_level, stress_level, notes, date, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((f"{user_id}-m{i}", user_id, 3, 4, 2, "fine", "2026-01-01", "2026-01-01") for i in rows)
+        )
+    if "study_sessions" in tables:
+        db.executemany(
+            "INSERT INTO study_sessions (id, user_id, date, duration, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((f"{user_id}-s{i}", user_id, (date(1970, 1, 1) + timedelta(days=i)).isoformat(), 30, "2026-01-01") for i in rows)
+        )
+    db.commit()
+    db.close()
+
+async def heap_peak(user_id: str) -> tuple:
+    tracemalloc.start()
+    size = 0
+    async for chunk in app.export_rows(user_id):
+        size += len(chunk)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak
+
+def http_run():
+    user_id = "bench-http"
+    seed(user_id, args.rows // 5)
+    headers = {"Authorization": f"Bearer {app.create_token(user_id)}"}
+    base = f"http://127.0.0.1:{args.port}"
+    out = os.path.join(common.WORKDIR, "export.ndjson")
+    server = common.start_server(args.port)
+    try:
+        print(f"server RSS {common.rss_kib(server.pid) // 1024} MiB")
+        started = time.perf_counter()
+        first_byte, size = None, 0
+        with httpx.stream("GET", f"{base}/api/export", headers=headers, timeout=None) as r, open(out, "wb") as f:
+            for chunk in r.iter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                f.write(chunk)
+                size += len(chunk)
+        print(f"export: {size / 1e6:.1f} MB in {time.perf_counter() - started:.2f} s, "
+              f"first byte after {first_byte * 1000:.0f} ms; server RSS {common.rss_kib(server.pid) // 1024} MiB")
+
+        # Free the ids again so the import writes every row
+        db = sqlite3.connect(common.DB_PATH)
+        for table in app.EXPORT_TYPES.values():
+            db.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        db.commit()
+        db.close()
+
+        def body():
+            with open(out, "rb") as f:
+                while block := f.read(65536):
+                    yield block
+        for label in ("import", "re-import (all duplicates)"):
+            started = time.perf_counter()
+            r = httpx.post(f"{base}/api/import", headers=headers, content=body(), timeout=None)
+            assert r.status_code == 200, r.text
+            print(f"{label}: {time.perf_counter() - started:.2f} s; server RSS {common.rss_kib(server.pid) // 1024} MiB")
+    finally:
+        server.terminate()
+        server.wait()
+
+async def main():
+    await app.init_db()
+    for count in (int(n) for n in args.memory_rows.split(",")):
+        user_id = f"bench-mem-{count}"
+        seed(user_id, count, tables=("notes",))
+        size, peak = await heap_peak(user_id)
+        print(f"{count:,} notes: {size / 1e6:.0f} MB exported, Python heap peak {peak / 1024:.0f} KiB")
+
+asyncio.run(main())
+http_run()
@@ -0,0 +1,120 @@
+"""
+Community feed SSE fan-out. First in-process: FeedHub throughput and memory per
+subscriber with N streams consuming M events. Then over the network: N real
+connections to /api/community/stream on a uvicorn server, server RSS per
+connection, and how fast M like/unlike events reach every connection.
+
+    python bench/feed_fanout.py [--subscribers 1000] [--events 100] [--port 8768] [--skip-server]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import common
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--subscribers", type=int, default=1000)
+parser.add_argument("--events", type=int, default=100)
+parser.add_argument("--port", type=int, default=8768)
+parser.add_argument("--skip-server", action="store_true", help="only run the in-process hub benchmark")
+args = parser.parse_args()
+
+import httpx  # noqa: E402
+import app  # noqa: E402
+
+EVENT_MARKER = b"event: post_liked"
+
+async def hub_run():
+    hub = app.FeedHub(app.LocalBroker(), max(app.FEED_QUEUE_SIZE, args.events + 10))
+    await hub.start()
+    target = args.subscribers * args.events
+    received = [0]
+    done = asyncio.Event()
+
+    async def consume():
+        async for chunk in hub.stream("bench"):
+            received[0] += chunk.count(EVENT_MARKER)
+            if received[0] >= target:
+                done.set()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(consume()) for _ in range(args.subscribers)]
+    await asyncio.sleep(0.5)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / args.subscribers
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for k in range(args.events):
+        await hub.publish("post_liked", post_id="p", likes=k, user_id="bench", liked=True)
+        await asyncio.sleep(0)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    print(f"hub: {per_subscriber / 1024:.1f} KiB per subscriber; {args.subscribers} subscribers x {args.events} events "
+          f"= {target / elapsed:,.0f} messages/s")
+    for task in tasks:
+        task.cancel()
+    await hub.stop()
+
+async def server_run():
+    base = f"http://127.0.0.1:{args.port}"
+    server = common.start_server(args.port, "--timeout-graceful-shutdown", "2", "--backlog", "4096",
+                                 env={"FEED_QUEUE_SIZE": str(max(app.FEED_QUEUE_SIZE, args.events + 10))})
+    try:
+        token = httpx.post(f"{base}/api/auth/register", json={
+            "email": "bench@example.com", "password": "pw", "first_name": "Bench", "last_name": "User"
+        }).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        post_id = httpx.post(f"{base}/api/community/posts", json={"title": "t", "content": "c"}, headers=headers).json()["id"]
+        request = f"GET /api/community/stream HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n\r\n".encode()
+        target = args.subscribers * args.events
+        received = [0]
+        done = asyncio.Event()
+
+        async def connect(ready: asyncio.Future):
+            reader, writer = await asyncio.open_connection("127.0.0.1", args.port)
+            writer.write(request)
+            await writer.drain()
+            while chunk := await reader.read(65536):
+                if b"event: ready" in chunk and not ready.done():
+                    ready.set_result(None)
+                received[0] += chunk.count(EVENT_MARKER)
+                if received[0] >= target:
+                    done.set()
+
+        base_rss = common.rss_kib(server.pid)
+        started = time.time()
+        tasks = []
+        loop = asyncio.get_running_loop()
+        for offset in range(0, args.subscribers, 200):
+            readies = [loop.create_future() for _ in range(min(200, args.subscribers - offset))]
+            tasks += [asyncio.create_task(connect(ready)) for ready in readies]
+            await asyncio.gather(*readies)
+        rss = common.rss_kib(server.pid)
+        print(f"server: {args.subscribers} streams open in {time.time() - started:.1f} s; RSS {base_rss // 1024} MiB -> "
+              f"{rss // 1024} MiB = {(rss - base_rss) / args.subscribers:.1f} KiB per connection")
+
+        async with httpx.AsyncClient(base_url=base, headers=headers) as client:
+            started = time.perf_counter()
+            for k in range(args.events):
+                await client.request("POST" if k % 2 == 0 else "DELETE", f"/api/community/posts/{post_id}/like")
+            published = time.perf_counter() - started
+            await asyncio.wait_for(done.wait(), 300)
+            elapsed = time.perf_counter() - started
+        print(f"server: {args.events} events published in {published:.2f} s; {target} deliveries in {elapsed:.2f} s "
+              f"= {target / elapsed:,.0f} messages/s")
+        print(httpx.get(f"{base}/healthz/feed").json())
+        for task in tasks:
+            task.cancel()
+    finally:
+        server.terminate()
+        server.wait()
+
+async def main():
+    await app.init_db()
+    await hub_run()
+    if not args.skip_server:
+        await server_run()
+
+asyncio.run(main())
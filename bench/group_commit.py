@@ -0,0 +1,52 @@
+"""
+Group-commit throughput: N concurrent INSERT write units through ConnectionPool.write,
+once with one commit per write (flush 0 ms, batch 1) and once with group commit.
+
+    python bench/group_commit.py [--writes 2000] [--concurrency 64] [--synchronous FULL]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import common  # noqa: F401  (sets up the environment before app is imported)
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--writes", type=int, default=2000)
+parser.add_argument("--concurrency", type=int, default=64)
+parser.add_argument("--synchronous", default="FULL", help="DB_SYNCHRONOUS for the pool's connections")
+parser.add_argument("--flush-ms", type=float, default=2)
+parser.add_argument("--batch-max", type=int, default=64)
+args = parser.parse_args()
+os.environ["DB_SYNCHRONOUS"] = args.synchronous
+
+import app  # noqa: E402
+
+async def run(flush_ms: float, batch_max: int):
+    pool = app.ConnectionPool(app.DB_PATH, 1, flush_ms, batch_max)
+    await pool.open()
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def insert(i: int):
+        async with slots:
+            async def write(db):
+                await db.execute(
+                    "INSERT INTO notes (id, user_id, title, content, subject, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (f"{flush_ms}-{batch_max}-{i}", "bench", "title", "content", "subject", "2026-01-01")
+                )
+            await pool.write(write)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(insert(i) for i in range(args.writes)))
+    elapsed = time.perf_counter() - started
+    print(f"flush {flush_ms:g} ms, batch max {batch_max}: {args.writes / elapsed:,.0f} writes/s, "
+          f"avg batch {pool.stats()['avg_batch_size']}")
+    await pool.close()
+
+async def main():
+    await app.init_db()
+    print(f"{args.writes} inserts, {args.concurrency} concurrent, synchronous={args.synchronous}")
+    await run(0, 1)
+    await run(args.flush_ms, args.batch_max)
+
+asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Login latency and event-loop lag under concurrent logins, with password hashing
+on the bounded thread pool (the default) or done inline on the event loop.
+
+    python bench/password_hashing.py [--mode pool|inline] [--concurrency 32] [--logins 5]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import common
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--mode", choices=("pool", "inline"), default="pool")
+parser.add_argument("--concurrency", type=int, default=32, help="users logging in at once")
+parser.add_argument("--logins", type=int, default=5, help="logins per user")
+args = parser.parse_args()
+
+import httpx  # noqa: E402
+import app  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+async def main():
+    if args.mode == "inline":
+        async def run_inline(fn, *fn_args):
+            return fn(*fn_args)
+        app.password_pool.run = run_inline
+    started = time.perf_counter()
+    app.hash_password(PASSWORD)
+    print(f"{app.PASSWORD_HASHER}: {(time.perf_counter() - started) * 1000:.0f} ms per hash on this machine")
+
+    async with app.lifespan(app.app):
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for i in range(args.concurrency):
+                r = await client.post("/api/auth/register", json={
+                    "email": f"user{i}@example.com", "password": PASSWORD, "first_name": "Bench", "last_name": "User"
+                })
+                assert r.status_code == 200, r.text
+
+            latencies, lags = [], []
+            done = False
+
+            async def probe():
+                # How late a 5 ms sleep wakes up is how long the loop was blocked
+                while not done:
+                    started = time.perf_counter()
+                    await asyncio.sleep(0.005)
+                    lags.append((time.perf_counter() - started) * 1000 - 5)
+
+            async def user(i: int):
+                for _ in range(args.logins):
+                    started = time.perf_counter()
+                    r = await client.post("/api/auth/login", json={"email": f"user{i}@example.com", "password": PASSWORD})
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    assert r.status_code == 200, r.text
+
+            prober = asyncio.create_task(probe())
+            started = time.perf_counter()
+            await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+            wall = time.perf_counter() - started
+            done = True
+            await prober
+
+    print(f"{args.mode}, {args.concurrency} concurrent: {len(latencies)} logins in {wall:.2f} s "
+          f"({len(latencies) / wall:.0f}/s); login p50 {statistics.median(latencies):.0f} ms, "
+          f"p99 {common.percentile(latencies, 0.99):.0f} ms; event-loop lag p50 {statistics.median(lags):.1f} ms, "
+          f"p99 {common.percentile(lags, 0.99):.1f} ms")
+
+asyncio.run(main())
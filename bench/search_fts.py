@@ -0,0 +1,85 @@
+"""
+Full-text search: /api/search (FTS5, BM25-ranked) vs the LIKE scan it replaces, over
+notes with Zipf-distributed words, searching as one heavy user. Queries are grouped
+by how common their words are. FTS timings include the HTTP round trip through the
+app; LIKE timings are the bare query.
+
+    python bench/search_fts.py [--notes 1000000] [--users 10000] [--user-notes 20000] [--queries 20]
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import time
+
+import common
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+parser.add_argument("--notes", type=int, default=1_000_000)
+parser.add_argument("--users", type=int, default=10_000)
+parser.add_argument("--user-notes", type=int, default=20_000, help="notes owned by the searching user")
+parser.add_argument("--words", type=int, default=40, help="words per note")
+parser.add_argument("--queries", type=int, default=20, help="queries per group")
+args = parser.parse_args()
+
+import httpx  # noqa: E402
+import app  # noqa: E402
+
+USER = "u42"
+LIKE_QUERY = ("SELECT id, title FROM notes WHERE user_id = ? AND (title LIKE ? OR content LIKE ?) "
+              "ORDER BY created_at DESC LIMIT 20")
+
+rng = random.Random(1)
+vocab = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))) for _ in range(20000)]
+weights = [1 / (rank + 1) for rank in range(len(vocab))]
+
+def seed():
+    def notes():
+        for i in range(args.notes):
+            words = rng.choices(vocab, weights, k=args.words)
+            owner = USER if i < args.user_notes else f"u{i % args.users}"
+            yield (f"n{i}", owner, " ".join(words[:4]), " ".join(words[4:]),
+                   rng.choice(["math", "bio", "cs"]), "2026-01-01")
+    db = sqlite3.connect(common.DB_PATH)
+    db.executemany("INSERT INTO notes (id, user_id, title, content, subject, created_at) VALUES (?, ?, ?, ?, ?, ?)", notes())
+    db.commit()
+    db.close()
+
+def summary(label: str, timings: list) -> str:
+    return f"{label}: p50 {statistics.median(timings):.1f} ms, max {max(timings):.1f} ms"
+
+async def main():
+    await app.init_db()
+    started = time.perf_counter()
+    seed()
+    print(f"seeded {args.notes:,} notes for {args.users:,} users ({args.user_notes:,} for {USER}) in {time.perf_counter() - started:.1f} s")
+
+    n = args.queries
+    groups = [
+        ("common word", vocab[:n]),
+        ("mid-frequency word", vocab[500:500 + n]),
+        ("rare word", vocab[15000:15000 + n]),
+        ("two words + prefix", [f"{vocab[i]} {vocab[i + 1][:3]}" for i in range(10, 10 + n)]),
+    ]
+    app.app.dependency_overrides[app.get_current_user] = lambda: USER
+    async with app.lifespan(app.app):
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, queries in groups:
+                fts = []
+                for q in queries:
+                    started = time.perf_counter()
+                    r = await client.get("/api/search", params={"q": q, "types": "note"})
+                    fts.append((time.perf_counter() - started) * 1000)
+                    assert r.status_code == 200, r.text
+                like = []
+                async with app.db_pool.reader() as db:
+                    for q in queries:
+                        pattern = f"%{q.split()[0]}%"
+                        started = time.perf_counter()
+                        await (await db.execute(LIKE_QUERY, (USER, pattern, pattern))).fetchall()
+                        like.append((time.perf_counter() - started) * 1000)
+                print(f"{label}: {summary('FTS', fts)} | {summary('LIKE', like)}")
+
+asyncio.run(main())
@@ -17,6 +17,53 @@ const API_URL = (location.hostname === 'localhost' || location.hostname === '127
     : '/api';
 let token = localStorage.getItem('token');
 let currentPage = 'dashboard';
+let dashboardCache = null;  // last /dashboard payload, reused for sections the server reports unchanged
+
+// List endpoints are paged: the cursor for the next page comes back in X-Next-Cursor
+function withCursor(url, cursor) {
+    if (!cursor) return url;
+    return url + (url.includes('?') ? '&' : '?') + 'cursor=' + encodeURIComponent(cursor);
+}
+
+function loadMoreButton(cursor, onclick) {
+    return cursor ? `<button class="btn-primary load-more" onclick="${onclick}">Load more</button>` : '';
+}
+
+// AI streaming endpoints answer with server-sent events: `data` events carry finished
+// HTML plus the line still being written, then a `done` (or `error`) event ends it
+async function streamAI(path, body, onUpdate) {
+    const response = await fetch(`${API_URL}${path}`, {
+        method: 'POST',
+        headers: {
+            'Authorization': `Bearer ${token}`,
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok) throw new Error(`Request failed (${response.status})`);
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    let html = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) throw new Error('Stream ended unexpectedly');
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            const event = (raw.match(/^event: (.*)$/m) || [])[1] || 'message';
+            const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+            if (event === 'error') throw new Error(data.detail || 'AI request failed');
+            html += data.html || '';
+            const partial = document.createElement('p');
+            partial.textContent = data.partial || '';
+            onUpdate(html + (data.partial ? partial.outerHTML : ''));
+            if (event === 'done') return data.text;
+        }
+    }
+}
 
 // Rotating study tips
 const STUDY_TIPS = [
@@ -52,6 +99,48 @@ let studyFlashcards = [];
 let currentStudyIndex = 0;
 let isCardFlipped = false;
 
+// Card ratings are queued (in localStorage, so they survive going offline or
+// closing the tab) and sent to /flashcards/reviews in batches
+const REVIEW_BATCH_SIZE = 10;
+let reviewQueue = JSON.parse(localStorage.getItem('pendingReviews') || '[]');
+let reviewFlush = null;
+
+function queueReview(cardId, confidence) {
+    reviewQueue.push({ card_id: cardId, confidence, reviewed_at: new Date().toISOString() });
+    localStorage.setItem('pendingReviews', JSON.stringify(reviewQueue));
+    if (reviewQueue.length >= REVIEW_BATCH_SIZE) flushReviews();
+}
+
+function flushReviews() {
+    if (reviewFlush) return reviewFlush;  // one batch in flight at a time
+    if (!token || reviewQueue.length === 0 || !navigator.onLine) return Promise.resolve();
+    const batch = reviewQueue.slice(0, 200);
+    reviewFlush = (async () => {
+        try {
+            const response = await fetch(`${API_URL}/flashcards/reviews`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`
+                },
+                body: JSON.stringify(batch)
+            });
+            // Keep the batch for a retry on auth, rate-limit or server errors; any other
+            // answer is final (resent reviews come back as duplicates, so retrying is safe)
+            if (response.status === 401 || response.status === 429 || response.status >= 500) throw new Error(`Review sync failed (${response.status})`);
+            reviewQueue = reviewQueue.slice(batch.length);
+            localStorage.setItem('pendingReviews', JSON.stringify(reviewQueue));
+        } catch (error) {
+            console.warn('Review sync deferred:', error);
+        } finally {
+            reviewFlush = null;
+        }
+    })();
+    return reviewFlush;
+}
+
+window.addEventListener('online', flushReviews);
+
 function showSignup() {
     document.querySelector('.auth-card:not(.hidden)').classList.add('hidden');
     document.getElementById('signup-card').classList.remove('hidden');
@@ -169,10 +258,25 @@ function logout() {
         });
     }
     
+    // Send any queued reviews while we still have the token, then drop the queue
+    flushReviews();
+    reviewQueue = [];
+    localStorage.removeItem('pendingReviews');
+
+    // Revoke the token server-side so a copied token stops working too
+    if (token) {
+        fetch(`${API_URL}/auth/logout`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` }
+        }).catch(() => {});
+    }
+
     localStorage.removeItem('token');
     localStorage.removeItem('firebaseUid');
     localStorage.removeItem('userEmail');
+    closeFeedStream();
     token = null;
+    dashboardCache = null;
     document.getElementById('auth-section').classList.remove('hidden');
     document.getElementById('app-section').classList.add('hidden');
 }
@@ -181,6 +285,7 @@ function showApp() {
     document.getElementById('auth-section').classList.add('hidden');
     document.getElementById('app-section').classList.remove('hidden');
     showPage('dashboard');
+    flushReviews();  // reviews left over from an offline session
     // Initialize squares animation if available
     if (window.initSquaresBackground) {
         setTimeout(() => window.initSquaresBackground(), 100);
@@ -205,6 +310,9 @@ function showPage(page) {
     currentPage = page;
     updateNavBrand(page);
 
+    if (page === 'community') openFeedStream();
+    else closeFeedStream();
+
     if (page === 'dashboard') loadDashboard();
     else if (page === 'notes') loadNotes();
     else if (page === 'study') loadTasks();
@@ -219,42 +327,45 @@ async function loadDashboard() {
     const options = { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' };
     document.getElementById('current-date').textContent = now.toLocaleDateString('en-US', options);
 
+    // Send the section ETags we already have so unchanged sections are skipped
     const headers = { 'Authorization': `Bearer ${token}` };
+    if (dashboardCache) {
+        headers['If-None-Match'] = [dashboardCache.etag, ...Object.values(dashboardCache.sections).map(s => s.etag)].join(', ');
+    }
 
     try {
-        const [notesResp, tasksResp, postsResp, streakResp] = await Promise.all([
-            fetch(`${API_URL}/notes`, { headers }),
-            fetch(`${API_URL}/study/tasks`, { headers }),
-            fetch(`${API_URL}/community/posts`, { headers }),
-            fetch(`${API_URL}/study/streak`, { headers })
-        ]);
-
-        if ([notesResp, tasksResp, postsResp, streakResp].some(r => r.status === 401)) {
+        const response = await fetch(`${API_URL}/dashboard`, { headers, cache: 'no-store' });
+
+        if (response.status === 401) {
             alert('Session expired. Please log in again.');
             logout();
             return;
         }
+        if (response.status !== 304) {
+            if (!response.ok) throw new Error(`Dashboard request failed (${response.status})`);
+            const data = await response.json();
+            const sections = {};
+            for (const [name, section] of Object.entries(data)) {
+                sections[name] = section.unchanged ? dashboardCache.sections[name] : section;
+            }
+            dashboardCache = { etag: response.headers.get('ETag'), sections };
+        }
 
-        const notesJson = notesResp.ok ? await notesResp.json() : [];
-        const notes = Array.isArray(notesJson) ? notesJson : [];
-        const tasksJson = tasksResp.ok ? await tasksResp.json() : [];
-        const tasks = Array.isArray(tasksJson) ? tasksJson : [];
-        const postsJson = postsResp.ok ? await postsResp.json() : [];
-        const posts = Array.isArray(postsJson) ? postsJson : (Array.isArray(postsJson.posts) ? postsJson.posts : []);
-        const streakData = streakResp.ok ? await streakResp.json() : { current_streak: 0 };
+        const { notes: notesSection, tasks: tasksSection, posts: postsSection, streak: streakData } = dashboardCache.sections;
+        const pendingTasks = tasksSection.items;
 
         // Update stats
-        document.getElementById('stat-notes').textContent = notes.length || 0;
-        document.getElementById('stat-tasks').textContent = (Array.isArray(tasks) ? tasks.filter(t => t.status === 'pending').length : 0) || 0;
+        document.getElementById('stat-notes').textContent = notesSection.count || 0;
+        document.getElementById('stat-tasks').textContent = tasksSection.pending_count || 0;
         document.getElementById('stat-streak').textContent = (streakData.current_streak || 0);
         if (document.getElementById('stat-streak-text')) {
             document.getElementById('stat-streak-text').textContent = (streakData.current_streak === 1 ? 'day' : 'days');
         }
-        document.getElementById('stat-posts').textContent = (Array.isArray(posts) ? posts.length : 0) || 0;
+        document.getElementById('stat-posts').textContent = postsSection.count || 0;
 
         // Load recent notes
         const recentNotesDiv = document.getElementById('recent-notes');
-        const recentNotes = (Array.isArray(notes) ? notes : []).slice(0, 3);
+        const recentNotes = notesSection.items;
         if (recentNotes.length === 0) {
             recentNotesDiv.innerHTML = '<p class="empty-state">No notes yet. Create your first note!</p>';
         } else {
@@ -269,7 +380,6 @@ async function loadDashboard() {
 
         // Load upcoming tasks
         const upcomingTasksDiv = document.getElementById('upcoming-tasks');
-        const pendingTasks = (Array.isArray(tasks) ? tasks : []).filter(t => t.status === 'pending').slice(0, 3);
         if (pendingTasks.length === 0) {
             upcomingTasksDiv.innerHTML = '<p class="empty-state">No pending tasks. You\'re all caught up!</p>';
         } else {
@@ -320,14 +430,16 @@ function viewNoteDetail(noteId) {
 }
 
 let allNotes = [];
+let notesCursor = null;
 
-async function loadNotes() {
-    const response = await fetch(`${API_URL}/notes`, {
+async function loadNotes(more = false) {
+    const response = await fetch(withCursor(`${API_URL}/notes`, more ? notesCursor : null), {
         headers: { 'Authorization': `Bearer ${token}` }
     });
     if (response.status === 401) { alert('Session expired. Please log in again.'); logout(); return; }
     const json = response.ok ? await response.json() : [];
-    const notes = Array.isArray(json) ? json : [];
+    notesCursor = response.headers.get('X-Next-Cursor');
+    const notes = more ? allNotes.concat(Array.isArray(json) ? json : []) : (Array.isArray(json) ? json : []);
     allNotes = notes;
 
     const list = document.getElementById('notes-list');
@@ -350,7 +462,7 @@ async function loadNotes() {
                 </button>
             </div>
         </div>
-    `}).join('');
+    `}).join('') + loadMoreButton(notesCursor, 'loadNotes(true)');
 }
 
 async function createNote() {
@@ -424,13 +536,18 @@ async function deleteNote(id) {
     loadNotes();
 }
 
-async function loadTasks() {
-    const response = await fetch(`${API_URL}/study/tasks`, {
+let loadedTasks = [];
+let tasksCursor = null;
+
+async function loadTasks(more = false) {
+    const response = await fetch(withCursor(`${API_URL}/study/tasks`, more ? tasksCursor : null), {
         headers: { 'Authorization': `Bearer ${token}` }
     });
     if (response.status === 401) { alert('Session expired. Please log in again.'); logout(); return; }
     const json = response.ok ? await response.json() : [];
-    const tasks = Array.isArray(json) ? json : [];
+    tasksCursor = response.headers.get('X-Next-Cursor');
+    const tasks = more ? loadedTasks.concat(Array.isArray(json) ? json : []) : (Array.isArray(json) ? json : []);
+    loadedTasks = tasks;
 
     const list = document.getElementById('tasks-list');
     list.innerHTML = tasks.map(task => `
@@ -452,7 +569,7 @@ async function loadTasks() {
                 <button class="btn-link" onclick="addTaskToCalendar('${task.id}', '${task.title.replace(/'/g, "\\'")}'${task.due_date ? `, '${task.due_date}'` : ''})" title="Add to Google Calendar" style="padding: 0.5rem; background: #4285f4; color: white; border: none; border-radius: 8px; cursor: pointer; font-size: 0.875rem;">📅 Add to Calendar</button>
             </div>
         </div>
-    `).join('');
+    `).join('') + loadMoreButton(tasksCursor, 'loadTasks(true)');
 }
 
 async function createTask() {
@@ -581,66 +698,18 @@ async function generateStudyPlan() {
     resultElement.style.display = 'block';
 
     try {
-        const response = await fetch(`${API_URL}/ai/study-plan`, {
-            method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${token}`,
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ subject, topics, timeline, difficulty })
+        // The plan is rendered as it streams in
+        const studyPlan = await streamAI('/ai/study-plan/stream', { subject, topics, timeline, difficulty }, html => {
+            contentElement.innerHTML = html;
         });
-
-        if (!response.ok) {
-            throw new Error('Failed to generate plan');
-        }
-
-        const data = await response.json();
-        const studyPlan = data.study_plan || '';
         
         // Store the raw plan for saving/downloading
         window.currentStudyPlan = { subject, plan: studyPlan };
-        
-        // Parse markdown and format the content
-        contentElement.innerHTML = parseMarkdownToHTML(studyPlan);
     } catch (err) {
         contentElement.innerHTML = '<div style="text-align: center; padding: 40px; color: #ef4444;">❌ Failed to generate study plan. Please try again.</div>';
     }
 }
 
-function parseMarkdownToHTML(markdown) {
-    if (!markdown) return '<p>No content generated.</p>';
-    
-    let html = markdown;
-    
-    // Convert headers (### to h3, ## to h2, # to h1)
-    html = html.replace(/^### (.+)$/gm, '<h4>$1</h4>');
-    html = html.replace(/^## (.+)$/gm, '<h3>$1</h3>');
-    html = html.replace(/^# (.+)$/gm, '<h3>$1</h3>');
-    
-    // Convert bold **text** or __text__
-    html = html.replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>');
-    html = html.replace(/__(.+?)__/g, '<strong>$1</strong>');
-    
-    // Convert bullet points
-    html = html.replace(/^[*-] (.+)$/gm, '<li>$1</li>');
-    
-    // Wrap consecutive <li> in <ul>
-    html = html.replace(/(<li>.*<\/li>\n?)+/gs, '<ul>$&</ul>');
-    
-    // Convert paragraphs (double newline)
-    html = html.split('\n\n').map(para => {
-        para = para.trim();
-        if (!para) return '';
-        if (para.startsWith('<h') || para.startsWith('<ul')) return para;
-        return `<p>${para}</p>`;
-    }).join('\n');
-    
-    // Clean up any remaining single newlines
-    html = html.replace(/\n/g, '<br>');
-    
-    return html;
-}
-
 async function saveStudyPlan() {
     if (!window.currentStudyPlan) {
         alert('No study plan to save');
@@ -695,16 +764,26 @@ function downloadStudyPlan() {
     URL.revokeObjectURL(url);
 }
 
-async function loadPosts() {
-    const response = await fetch(`${API_URL}/community/posts`, {
+let loadedPosts = [];
+let postsCursor = null;
+
+async function loadPosts(more = false) {
+    const response = await fetch(withCursor(`${API_URL}/community/posts`, more ? postsCursor : null), {
         headers: { 'Authorization': `Bearer ${token}` }
     });
     if (response.status === 401) { alert('Session expired. Please log in again.'); logout(); return; }
     const data = response.ok ? await response.json() : [];
-    const posts = Array.isArray(data) ? data : (Array.isArray(data.posts) ? data.posts : []);
+    postsCursor = data.next_cursor || null;
+    const page = Array.isArray(data) ? data : (Array.isArray(data.posts) ? data.posts : []);
+    const posts = more ? loadedPosts.concat(page) : page;
+    loadedPosts = posts;
 
     const list = document.getElementById('posts-list');
-    list.innerHTML = posts.map(post => `
+    list.innerHTML = posts.map(postCardHTML).join('') + loadMoreButton(postsCursor, 'loadPosts(true)');
+}
+
+function postCardHTML(post) {
+    return `
         <div class="item-card" data-post-id="${post.id}">
             <h3>${post.title}</h3>
             <p style="margin-top:-6px; opacity:0.8; font-size: 0.9rem;">by ${post.author_first_name ? (post.author_first_name + (post.author_last_name ? ' ' + post.author_last_name : '')) : (post.author_email || 'unknown')}</p>
@@ -743,7 +822,7 @@ async function loadPosts() {
             </div>
             <div id="comments-${post.id}" class="comments-section" style="display:none; margin-top: 15px; padding-top: 15px; border-top: 1px solid rgba(255,255,255,0.1);"></div>
         </div>
-    `).join('');
+    `;
 }
 
 async function createPost() {
@@ -823,6 +902,11 @@ async function toggleLike(postId, checkboxEl) {
         });
         if (res.status === 401) { alert('Session expired. Please log in again.'); logout(); return; }
         if (!res.ok) throw new Error('Failed to update like');
+        // The stream only carries the new count; our own liked state comes from here
+        const { liked } = await res.json();
+        const post = loadedPosts.find(p => p.id === postId);
+        if (post) post.liked = liked;
+        if (checkboxEl) checkboxEl.checked = liked;
     } catch (e) {
         // Revert UI on failure
         if (checkboxEl) checkboxEl.checked = !checked;
@@ -849,56 +933,70 @@ async function toggleComments(postId) {
     }
 }
 
-async function loadComments(postId) {
+const loadedComments = {};
+const commentCursors = {};
+
+async function loadComments(postId, more = false) {
     try {
-        const response = await fetch(`${API_URL}/community/posts/${postId}/comments`, {
+        const response = await fetch(withCursor(`${API_URL}/community/posts/${postId}/comments`, more ? commentCursors[postId] : null), {
             headers: { 'Authorization': `Bearer ${token}` }
         });
         
         if (response.status === 401) { alert('Session expired. Please log in again.'); logout(); return; }
         
         const data = await response.json();
-        const comments = data.comments || [];
-        
-        const commentsDiv = document.getElementById(`comments-${postId}`);
-        commentsDiv.innerHTML = `
-            <div class="messageBox" style="margin-bottom: 12px; display:flex; gap:8px; align-items:center;">
-                <input required placeholder="Message..." type="text" id="messageInput-${postId}" style="flex:1; padding:8px 12px; border-radius:8px; border:1px solid rgba(255,255,255,0.12); background: rgba(255,255,255,0.03); color: white;" />
-                <button id="sendButton-${postId}" onclick="addComment('${postId}')" style="background:transparent; border:0; cursor:pointer; padding:6px; display:flex; align-items:center; justify-content:center;">
-                    <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 664 663" width="28" height="28">
-                      <path fill="none" d="M646.293 331.888L17.7538 17.6187L155.245 331.888M646.293 331.888L17.753 646.157L155.245 331.888M646.293 331.888L318.735 330.228L155.245 331.888"></path>
-                      <path stroke-linejoin="round" stroke-linecap="round" stroke-width="33.67" stroke="#bfc7d1" d="M646.293 331.888L17.7538 17.6187L155.245 331.888M646.293 331.888L17.753 646.157L155.245 331.888M646.293 331.888L318.735 330.228L155.245 331.888"></path>
-                    </svg>
-                </button>
-            </div>
-            <div id="comments-list-${postId}">
-                ${comments.map(comment => `
-                    <div class="comment-item" style="padding: 10px; margin-bottom: 8px; background: rgba(255,255,255,0.03); border-radius: 5px; border-left: 3px solid var(--accent-color);">
-                        <p style="margin: 0; font-size: 0.85rem; opacity: 0.7; margin-bottom: 5px;">
-                            ${comment.author_first_name || 'Unknown'} ${comment.author_last_name || ''} • ${new Date(comment.created_at).toLocaleString()}
-                        </p>
-                        <p style="margin: 0;">${comment.content}</p>
-                        ${comment.can_delete ? `<button class="comment-delete" onclick="deleteComment('${postId}', '${comment.id}')" title="Delete comment">\n                            <svg viewBox=\"0 0 24 24\" xmlns=\"http://www.w3.org/2000/svg\"><path d=\"M3 6h18M8 6v12a2 2 0 0 0 2 2h4a2 2 0 0 0 2-2V6M10 6V4a2 2 0 0 1 2-2h0a2 2 0 0 1 2 2v2\" stroke=\"rgba(255,255,255,0.9)\" stroke-width=\"1.6\" stroke-linecap=\"round\" stroke-linejoin=\"round\" fill=\"none\"/></svg>\n                        </button>` : ''}
-                    </div>
-                `).join('') || '<p style="opacity: 0.5; font-style: italic;">No comments yet</p>'}
-            </div>
-        `;
-        
-        // Add Enter key listener to the new message input
-        const input = document.getElementById(`messageInput-${postId}`);
-        if (input) {
-            input.addEventListener('keydown', (e) => {
-                if (e.key === 'Enter') {
-                    e.preventDefault();
-                    addComment(postId);
-                }
-            });
-        }
+        commentCursors[postId] = data.next_cursor || null;
+        const comments = more ? (loadedComments[postId] || []).concat(data.comments || []) : (data.comments || []);
+        loadedComments[postId] = comments;
+        renderComments(postId);
     } catch (err) {
         console.error('Failed to load comments:', err);
     }
 }
 
+function renderComments(postId) {
+    const comments = loadedComments[postId] || [];
+    const commentsDiv = document.getElementById(`comments-${postId}`);
+    if (!commentsDiv) return;
+    // Keep a half-typed comment when the thread re-renders under a live update
+    const draft = document.getElementById(`messageInput-${postId}`)?.value || '';
+    commentsDiv.innerHTML = `
+        <div class="messageBox" style="margin-bottom: 12px; display:flex; gap:8px; align-items:center;">
+            <input required placeholder="Message..." type="text" id="messageInput-${postId}" style="flex:1; padding:8px 12px; border-radius:8px; border:1px solid rgba(255,255,255,0.12); background: rgba(255,255,255,0.03); color: white;" />
+            <button id="sendButton-${postId}" onclick="addComment('${postId}')" style="background:transparent; border:0; cursor:pointer; padding:6px; display:flex; align-items:center; justify-content:center;">
+                <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 664 663" width="28" height="28">
+                  <path fill="none" d="M646.293 331.888L17.7538 17.6187L155.245 331.888M646.293 331.888L17.753 646.157L155.245 331.888M646.293 331.888L318.735 330.228L155.245 331.888"></path>
+                  <path stroke-linejoin="round" stroke-linecap="round" stroke-width="33.67" stroke="#bfc7d1" d="M646.293 331.888L17.7538 17.6187L155.245 331.888M646.293 331.888L17.753 646.157L155.245 331.888M646.293 331.888L318.735 330.228L155.245 331.888"></path>
+                </svg>
+            </button>
+        </div>
+        <div id="comments-list-${postId}">
+            ${comments.map(comment => `
+                <div class="comment-item" style="padding: 10px; margin-bottom: 8px; background: rgba(255,255,255,0.03); border-radius: 5px; border-left: 3px solid var(--accent-color);">
+                    <p style="margin: 0; font-size: 0.85rem; opacity: 0.7; margin-bottom: 5px;">
+                        ${comment.author_first_name || 'Unknown'} ${comment.author_last_name || ''} • ${new Date(comment.created_at).toLocaleString()}
+                    </p>
+                    <p style="margin: 0;">${comment.content}</p>
+                    ${comment.can_delete ? `<button class="comment-delete" onclick="deleteComment('${postId}', '${comment.id}')" title="Delete comment">\n                            <svg viewBox=\"0 0 24 24\" xmlns=\"http://www.w3.org/2000/svg\"><path d=\"M3 6h18M8 6v12a2 2 0 0 0 2 2h4a2 2 0 0 0 2-2V6M10 6V4a2 2 0 0 1 2-2h0a2 2 0 0 1 2 2v2\" stroke=\"rgba(255,255,255,0.9)\" stroke-width=\"1.6\" stroke-linecap=\"round\" stroke-linejoin=\"round\" fill=\"none\"/></svg>\n                        </button>` : ''}
+                </div>
+            `).join('') || '<p style="opacity: 0.5; font-style: italic;">No comments yet</p>'}
+            ${loadMoreButton(commentCursors[postId], `loadComments('${postId}', true)`)}
+        </div>
+    `;
+    
+    // Add Enter key listener to the new message input
+    const input = document.getElementById(`messageInput-${postId}`);
+    if (input) {
+        input.value = draft;
+        input.addEventListener('keydown', (e) => {
+            if (e.key === 'Enter') {
+                e.preventDefault();
+                addComment(postId);
+            }
+        });
+    }
+}
+
 async function addComment(postId) {
     const input = document.getElementById(`messageInput-${postId}`);
     const content = input ? input.value.trim() : '';
@@ -954,13 +1052,110 @@ async function deleteComment(postId, commentId) {
     }
 }
 
-async function loadMoods() {
-    const response = await fetch(`${API_URL}/wellbeing/mood-logs`, {
+// While the community page is open, post/like/comment changes arrive as
+// server-sent events and are applied to the rendered feed in place
+let feedStream = null;  // AbortController for the open stream
+let feedUserId = null;  // our user id, sent in the stream's `ready` event
+
+function openFeedStream() {
+    if (feedStream) return;
+    const controller = new AbortController();
+    feedStream = controller;
+    (async () => {
+        let delay = 1000;
+        while (feedStream === controller) {
+            try {
+                const response = await fetch(`${API_URL}/community/stream`, {
+                    headers: { 'Authorization': `Bearer ${token}` },
+                    signal: controller.signal
+                });
+                if (response.status === 401) { closeFeedStream(); return; }
+                if (!response.ok) throw new Error(`Feed stream failed (${response.status})`);
+                delay = 1000;
+                const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += value;
+                    let end;
+                    while ((end = buffer.indexOf('\n\n')) !== -1) {
+                        const raw = buffer.slice(0, end);
+                        buffer = buffer.slice(end + 2);
+                        const event = (raw.match(/^event: (.*)$/m) || [])[1];
+                        const data = (raw.match(/^data: (.*)$/m) || [])[1];
+                        if (event && data) applyFeedEvent(event, JSON.parse(data));
+                    }
+                }
+            } catch (err) {
+                if (controller.signal.aborted) return;
+                console.warn('Feed stream interrupted:', err);
+                delay = Math.min(delay * 2, 30000);
+            }
+            if (feedStream !== controller) return;
+            await new Promise(resolve => setTimeout(resolve, delay));
+            if (feedStream === controller) loadPosts();  // catch up on anything missed while reconnecting
+        }
+    })();
+}
+
+function closeFeedStream() {
+    if (feedStream) feedStream.abort();
+    feedStream = null;
+}
+
+function applyFeedEvent(event, data) {
+    const list = document.getElementById('posts-list');
+    if (event === 'ready') {
+        feedUserId = data.user_id;
+    } else if (event === 'reset') {
+        loadPosts();
+    } else if (event === 'post_created') {
+        if (loadedPosts.some(p => p.id === data.post.id)) return;
+        const post = { ...data.post, liked: false, can_delete: data.post.author_id === feedUserId };
+        loadedPosts.unshift(post);
+        list.insertAdjacentHTML('afterbegin', postCardHTML(post));
+    } else if (event === 'post_deleted') {
+        loadedPosts = loadedPosts.filter(p => p.id !== data.post_id);
+        const card = list.querySelector(`[data-post-id="${data.post_id}"]`);
+        if (card) card.remove();
+    } else if (event === 'post_liked') {
+        const post = loadedPosts.find(p => p.id === data.post_id);
+        if (!post) return;
+        post.likes = data.likes;
+        const span = document.getElementById(`likes-${data.post_id}`);
+        if (span) {
+            span.dataset.count = String(data.likes);
+            span.textContent = `${data.likes} likes`;
+        }
+    } else if (event === 'comment_created' || event === 'comment_deleted') {
+        const post = loadedPosts.find(p => p.id === data.post_id);
+        if (post) post.comment_count = data.comment_count;
+        // Only threads that have been opened hold comments to update
+        const comments = loadedComments[data.post_id];
+        if (!comments) return;
+        if (event === 'comment_created') {
+            if (comments.some(c => c.id === data.comment.id)) return;
+            comments.push({ ...data.comment, can_delete: data.comment.author_id === feedUserId });
+        } else {
+            loadedComments[data.post_id] = comments.filter(c => c.id !== data.comment_id);
+        }
+        renderComments(data.post_id);
+    }
+}
+
+let loadedMoods = [];
+let moodsCursor = null;
+
+async function loadMoods(more = false) {
+    const response = await fetch(withCursor(`${API_URL}/wellbeing/mood-logs`, more ? moodsCursor : null), {
         headers: { 'Authorization': `Bearer ${token}` }
     });
     if (response.status === 401) { alert('Session expired. Please log in again.'); logout(); return; }
     const json = response.ok ? await response.json() : [];
-    const moods = Array.isArray(json) ? json : [];
+    moodsCursor = response.headers.get('X-Next-Cursor');
+    const moods = more ? loadedMoods.concat(Array.isArray(json) ? json : []) : (Array.isArray(json) ? json : []);
+    loadedMoods = moods;
 
     const list = document.getElementById('mood-list');
     list.innerHTML = moods.map(mood => `
@@ -972,7 +1167,7 @@ async function loadMoods() {
                 <span class="badge badge-status">${new Date(mood.date).toLocaleDateString()}</span>
             </div>
         </div>
-    `).join('');
+    `).join('') + loadMoreButton(moodsCursor, 'loadMoods(true)');
 }
 
 async function logMood() {
@@ -1043,36 +1238,26 @@ async function sendChatMessage() {
     // Show loading indicator
     const loadingId = addChatMessage('Thinking...', 'ai', true);
     
+    let replyId = null;
     try {
-        const response = await fetch(`${API_URL}/ai/chat`, {
-            method: 'POST',
-            headers: {
-                'Authorization': `Bearer ${token}`,
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                message: message,
-                context: chatHistory.slice(-5) // Last 5 messages for context
-            })
+        const reply = await streamAI('/ai/chat/stream', {
+            message: message,
+            context: chatHistory.slice(-5) // Last 5 messages for context
+        }, html => {
+            // Swap the loading message for the reply bubble on the first chunk
+            if (!replyId) {
+                document.getElementById(loadingId).remove();
+                replyId = addChatMessage('', 'ai');
+            }
+            document.querySelector(`#${replyId} .content`).innerHTML = html;
+            const messagesDiv = document.getElementById('chat-messages');
+            messagesDiv.scrollTop = messagesDiv.scrollHeight;
         });
-        
-        if (response.ok) {
-            const data = await response.json();
-            
-            // Remove loading message
-            document.getElementById(loadingId).remove();
-            
-            // Add AI response
-            addChatMessage(data.response, 'ai');
-            chatHistory.push({ role: 'assistant', content: data.response });
-        } else {
-            document.getElementById(loadingId).remove();
-            addChatMessage('Sorry, I encountered an error. Please try again.', 'ai');
-        }
+        chatHistory.push({ role: 'assistant', content: reply });
     } catch (err) {
         console.error('Chat error:', err);
-        document.getElementById(loadingId).remove();
-        addChatMessage('Network error. Please check your connection.', 'ai');
+        document.getElementById(replyId || loadingId).remove();
+        addChatMessage('Sorry, I encountered an error. Please try again.', 'ai');
     }
 }
 
@@ -1128,16 +1313,22 @@ async function loadFlashcardsPage() {
     await populateGenerateNoteSelect();
 }
 
-async function loadFlashcards(subject = null) {
+let flashcardsCursor = null;
+let flashcardsSubject = null;
+
+async function loadFlashcards(subject = null, more = false) {
     try {
-        const url = subject ? `${API_URL}/flashcards?subject=${encodeURIComponent(subject)}` : `${API_URL}/flashcards`;
-        const response = await fetch(url, {
+        if (!more) flashcardsSubject = subject;
+        const base = flashcardsSubject ? `${API_URL}/flashcards?subject=${encodeURIComponent(flashcardsSubject)}` : `${API_URL}/flashcards`;
+        const response = await fetch(withCursor(base, more ? flashcardsCursor : null), {
             headers: { 'Authorization': `Bearer ${token}` }
         });
         
         if (!response.ok) throw new Error('Failed to load flashcards');
         
-        allFlashcards = await response.json();
+        const page = await response.json();
+        flashcardsCursor = response.headers.get('X-Next-Cursor');
+        allFlashcards = more ? allFlashcards.concat(page) : page;
         displayFlashcards();
         populateFlashcardSubjectFilter();
     } catch (error) {
@@ -1194,7 +1385,7 @@ function displayFlashcards() {
                 </div>
             </div>
         </div>
-    `}).join('');
+    `}).join('') + loadMoreButton(flashcardsCursor, 'loadFlashcards(null, true)');
 }
 
 async function loadFlashcardStats() {
@@ -1340,17 +1531,27 @@ async function deleteFlashcard(cardId) {
     }
 }
 
-function startStudyMode(cardId = null) {
+async function startStudyMode(cardId = null) {
     if (cardId) {
         const card = allFlashcards.find(c => c.id === cardId);
         if (!card) return;
         studyFlashcards = [card];
     } else {
-        if (allFlashcards.length === 0) {
-            alert('No flashcards to study');
+        // Study only the cards the scheduler says are due, most overdue first
+        try {
+            const response = await fetch(`${API_URL}/flashcards/due?limit=20`, {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (!response.ok) throw new Error('Failed to load due flashcards');
+            studyFlashcards = await response.json();
+        } catch (error) {
+            console.error('Error loading due flashcards:', error);
+            return;
+        }
+        if (studyFlashcards.length === 0) {
+            alert(allFlashcards.length === 0 ? 'No flashcards to study' : '🎉 No cards are due for review right now!');
             return;
         }
-        studyFlashcards = [...allFlashcards];
     }
     
     currentStudyIndex = 0;
@@ -1405,29 +1606,16 @@ function previousStudyCard() {
 
 async function rateStudyCard(confidence) {
     const card = studyFlashcards[currentStudyIndex];
+    queueReview(card.id, confidence);
     
-    try {
-        const response = await fetch(`${API_URL}/flashcards/${card.id}/review`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${token}`
-            },
-            body: JSON.stringify({ confidence })
-        });
-        
-        if (!response.ok) throw new Error('Failed to record review');
-        
-        if (currentStudyIndex < studyFlashcards.length - 1) {
-            nextStudyCard();
-        } else {
-            alert('🎉 Study session complete!');
-            exitStudyMode();
-            await loadFlashcards();
-            await loadFlashcardStats();
-        }
-    } catch (error) {
-        console.error('Error recording review:', error);
+    if (currentStudyIndex < studyFlashcards.length - 1) {
+        nextStudyCard();
+    } else {
+        alert('🎉 Study session complete!');
+        exitStudyMode();
+        await flushReviews();
+        await loadFlashcards();
+        await loadFlashcardStats();
     }
 }
 
@@ -0,0 +1,38 @@
+"""
+Tests import app.py directly, so its environment is set up here before the first
+import: a throwaway database, no Gemini key and no rate limiting.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="studentflow-tests-"), "test.db")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ.pop("GEMINI_API_KEY", None)
+os.environ.pop("GOOGLE_API_KEY", None)
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # the frontend is loaded from a relative path at startup
+
+import app as studentflow  # noqa: E402
+
+@pytest.fixture(scope="session")
+def app_module():
+    return studentflow
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    """A client with the app started (migrations applied, pool and workers running)"""
+    with TestClient(app_module.app) as c:
+        yield c
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    r = client.post("/api/auth/register", json={"email": "tester@example.com", "password": "pw",
+                                                "first_name": "Test", "last_name": "User"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
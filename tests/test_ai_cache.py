@@ -0,0 +1,88 @@
+"""
+Identical AI requests are answered from the response cache: the model is called
+once, the first response says X-Cache: MISS and the repeats say HIT. Entries are
+keyed by endpoint, model and normalized inputs, so none of them leak into another.
+"""
+import json
+
+import pytest
+
+class StubModel:
+    """Stands in for genai.GenerativeModel: counts calls and echoes a canned completion"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.prompts.append(prompt)
+        if "flashcards" in prompt:
+            text = json.dumps([{"question": f"q{len(self.prompts)}", "answer": "a"}])
+        else:
+            text = f"{self.name} completion {len(self.prompts)}"
+        return type("Completion", (), {"text": text, "usage_metadata": None})()
+
+@pytest.fixture
+def models(app_module, monkeypatch):
+    stubs = {name: StubModel(name) for name in ("gemini-2.0-flash", "gemini-2.5-flash")}
+    for name, stub in stubs.items():
+        monkeypatch.setitem(app_module._ai_models, name, stub)
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", "test-key")
+    return stubs
+
+def test_repeated_request_calls_the_model_once(app_module, client, auth_headers, models):
+    body = {"content": "Mitochondria   are the powerhouse\nof the cell."}
+    first = client.post("/api/ai/summarize-notes", json=body, headers=auth_headers)
+    assert first.status_code == 200, first.text
+    assert first.headers["X-Cache"] == "MISS"
+
+    # Whitespace differences normalize to the same key
+    again = client.post("/api/ai/summarize-notes", json={"content": "Mitochondria are the powerhouse of the cell."},
+                        headers=auth_headers)
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.json() == first.json()
+
+    # Not just the in-process LRU: the ai_cache table serves it too
+    app_module.ai_cache._memory.clear()
+    from_table = client.post("/api/ai/summarize-notes", json=body, headers=auth_headers)
+    assert from_table.headers["X-Cache"] == "HIT"
+    assert from_table.json() == first.json()
+
+    assert len(models["gemini-2.0-flash"].prompts) == 1
+    assert not models["gemini-2.5-flash"].prompts
+
+def test_keys_are_separate_per_input_and_endpoint(client, auth_headers, models):
+    summarize = lambda content: client.post("/api/ai/summarize-notes", json={"content": content}, headers=auth_headers)
+    assert summarize("Photosynthesis").headers["X-Cache"] == "MISS"
+    other = summarize("Respiration")
+    assert other.headers["X-Cache"] == "MISS"
+    assert other.json()["summary"] == "gemini-2.0-flash completion 2"
+
+    # The same text through the study-plan endpoint (other model) is its own entry
+    plan = client.post("/api/ai/study-plan", json={"subject": "Photosynthesis"}, headers=auth_headers)
+    assert plan.headers["X-Cache"] == "MISS"
+    assert client.post("/api/ai/study-plan", json={"subject": "Photosynthesis"},
+                       headers=auth_headers).headers["X-Cache"] == "HIT"
+
+    note_id = client.post("/api/notes", json={"title": "Photosynthesis", "content": "Photosynthesis"},
+                          headers=auth_headers).json()["id"]
+    cards = lambda count: client.post("/api/flashcards/generate", json={"note_id": note_id, "count": count},
+                                      headers=auth_headers)
+    assert cards(1).headers["X-Cache"] == "MISS"
+    assert cards(1).headers["X-Cache"] == "HIT"
+    assert cards(2).headers["X-Cache"] == "MISS"
+
+    assert len(models["gemini-2.0-flash"].prompts) == 2
+    assert len(models["gemini-2.5-flash"].prompts) == 3
+
+def test_make_key_covers_endpoint_model_and_inputs(app_module):
+    make_key = app_module.AICache.make_key
+    base = make_key("summarize-notes", "gemini-2.0-flash", {"content": "x"})
+    assert make_key("summarize-notes", "gemini-2.0-flash", {"content": "x"}) == base
+    assert len({
+        base,
+        make_key("study-plan", "gemini-2.0-flash", {"content": "x"}),
+        make_key("summarize-notes", "gemini-2.5-flash", {"content": "x"}),
+        make_key("summarize-notes", "gemini-2.0-flash", {"content": "y"}),
+        make_key("summarize-notes", "gemini-2.0-flash", {"content": "x", "count": 1}),
+    }) == 5
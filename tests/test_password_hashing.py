@@ -0,0 +1,59 @@
+"""
+Passwords are stored salted (`scheme$params$salt$hash`). Accounts from before that
+hold an unsalted SHA-256 digest: they still sign in, and the first successful
+login rewrites the row in the current format.
+"""
+import hashlib
+import sqlite3
+
+import pytest
+
+def register(client, email: str, password: str):
+    r = client.post("/api/auth/register", json={"email": email, "password": password,
+                                                "first_name": "Hash", "last_name": "User"})
+    assert r.status_code == 200, r.text
+
+def login(client, email: str, password: str):
+    return client.post("/api/auth/login", json={"email": email, "password": password})
+
+def stored_hash(db_path: str, email: str) -> str:
+    with sqlite3.connect(db_path) as db:
+        return db.execute("SELECT password FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+@pytest.fixture
+def legacy_user(app_module, client):
+    """An account whose row holds the pre-salting SHA-256 hex digest"""
+    email = "legacy@example.com"
+    register(client, email, "old secret")
+    with sqlite3.connect(app_module.DB_PATH) as db:
+        db.execute("UPDATE users SET password = ? WHERE email = ?",
+                   (hashlib.sha256(b"old secret").hexdigest(), email))
+    yield email
+    with sqlite3.connect(app_module.DB_PATH) as db:
+        db.execute("DELETE FROM users WHERE email = ?", (email,))
+
+def test_legacy_hash_logs_in_and_is_rehashed(app_module, client, legacy_user):
+    r = login(client, legacy_user, "old secret")
+    assert r.status_code == 200, r.text
+    assert r.json()["access_token"]
+
+    upgraded = stored_hash(app_module.DB_PATH, legacy_user)
+    assert upgraded.startswith(f"{app_module.PASSWORD_HASHER}$")
+    assert app_module.verify_password("old secret", upgraded) == (True, False)
+    # And the upgraded row keeps working
+    assert login(client, legacy_user, "old secret").status_code == 200
+
+def test_wrong_password_against_legacy_hash_is_rejected(app_module, client, legacy_user):
+    legacy = stored_hash(app_module.DB_PATH, legacy_user)
+    assert login(client, legacy_user, "not it").status_code == 401
+    assert stored_hash(app_module.DB_PATH, legacy_user) == legacy
+
+def test_current_hash_is_not_rehashed(app_module, client):
+    email = "current@example.com"
+    register(client, email, "fresh secret")
+    before = stored_hash(app_module.DB_PATH, email)
+    rehashed = app_module.password_pool.rehashed
+
+    assert login(client, email, "fresh secret").status_code == 200
+    assert stored_hash(app_module.DB_PATH, email) == before
+    assert app_module.password_pool.rehashed == rehashed
@@ -0,0 +1,28 @@
+"""The dashboard's post count comes from table_counts, kept by triggers on posts"""
+import asyncio
+
+import aiosqlite
+
+def dashboard_posts_count(client, headers) -> int:
+    r = client.get("/api/dashboard", headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()["posts"]["count"]
+
+def test_post_count_follows_creates_and_deletes(app_module, client, auth_headers):
+    before = dashboard_posts_count(client, auth_headers)
+    ids = [client.post("/api/community/posts", json={"title": f"count {i}", "content": "c"}, headers=auth_headers).json()["id"]
+           for i in range(3)]
+    assert dashboard_posts_count(client, auth_headers) == before + 3
+    assert client.delete(f"/api/community/posts/{ids[0]}", headers=auth_headers).status_code == 200
+    assert dashboard_posts_count(client, auth_headers) == before + 2
+
+    async def counted_and_reconciled():
+        async with aiosqlite.connect(app_module.DB_PATH) as db:
+            actual = (await (await db.execute("SELECT COUNT(*) FROM posts")).fetchone())[0]
+            stored = (await (await db.execute("SELECT count FROM table_counts WHERE name = 'posts'")).fetchone())[0]
+            await db.execute("UPDATE table_counts SET count = -1 WHERE name = 'posts'")
+            reconciled = await app_module.reconcile_table_count(db, "posts")
+            await db.commit()
+            return actual, stored, reconciled
+    actual, stored, reconciled = asyncio.run(counted_and_reconciled())
+    assert stored == actual == reconciled == before + 2
@@ -0,0 +1,96 @@
+"""
+Every list and feed endpoint must read through an index. The statements are the
+ones the endpoints really run (captured while serving requests, first page and a
+cursor page), planned against the schema that run_migrations built.
+"""
+import re
+import sqlite3
+
+import pytest
+
+LIST_ENDPOINTS = [
+    "/api/notes",
+    "/api/study/tasks",
+    "/api/study/tasks?status=pending",
+    "/api/flashcards",
+    "/api/flashcards?subject=Biology",
+    "/api/flashcards/due",
+    "/api/wellbeing/mood-logs",
+    "/api/community/posts",
+    "/api/community/posts/{post_id}/comments",
+    "/api/dashboard",
+]
+
+# The first feed page has no WHERE clause: walking the (created_at, id) index
+# newest first and stopping at LIMIT is the plan we want there
+ALLOWED_SCANS = {"SCAN p USING INDEX idx_posts_created_id"}
+
+@pytest.fixture(scope="module")
+def seeded(client, auth_headers):
+    """Three of everything, so limit=2 pages have a next cursor"""
+    post_id = None
+    for i in range(3):
+        assert client.post("/api/notes", json={"title": f"n{i}", "content": "c", "subject": "Biology"},
+                           headers=auth_headers).status_code == 200
+        assert client.post("/api/study/tasks", json={"title": f"t{i}"}, headers=auth_headers).status_code == 200
+        assert client.post("/api/flashcards", json={"question": f"q{i}", "answer": "a", "subject": "Biology"},
+                           headers=auth_headers).status_code == 200
+        assert client.post("/api/wellbeing/mood-logs", json={"mood_score": 3, "date": f"2026-01-0{i + 1}"},
+                           headers=auth_headers).status_code == 200
+        post_id = client.post("/api/community/posts", json={"title": f"p{i}", "content": "c"},
+                              headers=auth_headers).json()["id"]
+    for i in range(3):
+        assert client.post(f"/api/community/posts/{post_id}/comments", json={"content": f"c{i}"},
+                           headers=auth_headers).status_code == 200
+    return post_id
+
+def captured_selects(app_module, monkeypatch, fetch) -> set:
+    """The SELECT statements run on the pool's connections while `fetch()` runs"""
+    seen = set()
+    series = app_module.statement_series
+    def recording(sql):
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            seen.add(sql)
+        return series(sql)
+    with monkeypatch.context() as m:
+        m.setattr(app_module, "statement_series", recording)
+        fetch()
+    return seen
+
+def query_plan(db_path: str, sql: str) -> list:
+    with sqlite3.connect(db_path) as db:
+        bindings = [None] * sql.count("?")
+        return [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, bindings)]
+
+@pytest.mark.parametrize("path", LIST_ENDPOINTS)
+def test_list_queries_use_indexes(path, app_module, client, auth_headers, seeded, monkeypatch):
+    url = path.format(post_id=seeded)
+    statements = set()
+    def fetch_two_pages():
+        sep = "&" if "?" in url else "?"
+        first = client.get(f"{url}{sep}limit=2", headers=auth_headers)
+        assert first.status_code == 200, first.text
+        cursor = first.headers.get("X-Next-Cursor")
+        if cursor:
+            assert client.get(f"{url}{sep}limit=2&cursor={cursor}", headers=auth_headers).status_code == 200
+    # Once through the feed cache (reloading its window and liked-sets), once with it off
+    feed_cache = app_module.feed_cache
+    feed_cache.loaded_at = 0.0
+    feed_cache.liked.clear()
+    statements |= captured_selects(app_module, monkeypatch, fetch_two_pages)
+    with monkeypatch.context() as m:
+        m.setattr(feed_cache, "size", 0)
+        statements |= captured_selects(app_module, monkeypatch, fetch_two_pages)
+    assert statements, f"no queries captured for {url}"
+
+    for sql in statements:
+        plan = query_plan(app_module.DB_PATH, sql)
+        flat = " ".join(sql.split())
+        assert not any("USE TEMP B-TREE" in step for step in plan), f"{flat}\nsorts in a temp b-tree: {plan}"
+        for step in plan:
+            if not re.match(r"(SCAN|SEARCH) ", step):
+                continue
+            if step in ALLOWED_SCANS:
+                continue
+            assert re.match(r"SEARCH \S+ USING (COVERING INDEX|INDEX|INTEGER PRIMARY KEY|PRIMARY KEY)", step), \
+                f"{flat}\nfull scan: {plan}"
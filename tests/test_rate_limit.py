@@ -0,0 +1,53 @@
+"""
+Token-bucket rate limiting, switched on here with tiny buckets (conftest turns it off
+for everything else): responses carry RateLimit-* headers, and an empty bucket is
+answered with 429 and Retry-After, per user and per client IP on /api/auth/*.
+"""
+import uuid
+from collections import OrderedDict
+
+import pytest
+
+@pytest.fixture
+def user_headers(client):
+    """A fresh account, registered while the limiter is still off"""
+    r = client.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex[:8]}@example.com", "password": "pw",
+                                                "first_name": "Rate", "last_name": "User"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+@pytest.fixture
+def limited(app_module, monkeypatch):
+    """Limiter on with two-token buckets that practically never refill"""
+    monkeypatch.setattr(app_module, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(app_module, "RATE_LIMIT_RATE", 0.01)
+    monkeypatch.setattr(app_module, "RATE_LIMIT_BURST", 2)
+    monkeypatch.setattr(app_module, "RATE_LIMIT_COST_READ", 1)
+    monkeypatch.setattr(app_module, "RATE_LIMIT_AUTH_RATE", 0.01)
+    monkeypatch.setattr(app_module, "RATE_LIMIT_AUTH_BURST", 2)
+    monkeypatch.setattr(app_module.rate_limiter, "buckets", OrderedDict())
+
+def assert_bucket_drains(send):
+    first, second, third = send(), send(), send()
+    for response, remaining in ((first, "1"), (second, "0")):
+        assert response.status_code != 429, response.text
+        assert response.headers["RateLimit-Limit"] == "2"
+        assert response.headers["RateLimit-Remaining"] == remaining
+        assert int(response.headers["RateLimit-Reset"]) > 0
+        assert "Retry-After" not in response.headers
+    assert third.status_code == 429
+    assert third.headers["RateLimit-Remaining"] == "0"
+    assert int(third.headers["Retry-After"]) > 0
+
+def test_user_requests_spend_the_user_bucket(app_module, client, user_headers, limited):
+    assert_bucket_drains(lambda: client.get("/api/notes", headers=user_headers))
+    # Another user's bucket is untouched
+    other = client.get("/api/notes", headers={"Authorization": f"Bearer {app_module.create_token('someone-else')}"})
+    assert other.status_code == 200
+    assert other.headers["RateLimit-Remaining"] == "1"
+
+def test_auth_requests_spend_the_ip_bucket(client, limited):
+    # Wrong credentials still cost a token: the bucket is charged before the endpoint runs
+    login = lambda: client.post("/api/auth/login", json={"email": "nobody@example.com", "password": "x"})
+    assert_bucket_drains(login)
+    assert login().status_code == 429
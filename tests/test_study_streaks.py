@@ -0,0 +1,89 @@
+"""
+The study streak is folded one session at a time (extend_streak) instead of being
+derived from the whole history on every read. Randomized histories check the fold
+against the original full-history computation.
+"""
+import asyncio
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+
+def baseline_streak(rows: list, today: date) -> dict:
+    """The full-history computation the streak endpoint used before the fold (one row per day)"""
+    if not rows:
+        return {"current_streak": 0, "longest_streak": 0, "total_sessions": 0, "total_minutes": 0}
+    dates = [date.fromisoformat(day) for day, _ in rows]
+    total_minutes = sum(duration for _, duration in rows)
+
+    current_streak = 0
+    check_date = today
+    while check_date in dates:
+        current_streak += 1
+        check_date -= timedelta(days=1)
+    if today not in dates and current_streak == 0:
+        yesterday = today - timedelta(days=1)
+        if yesterday in dates:
+            current_streak = 1
+            check_date = yesterday - timedelta(days=1)
+            while check_date in dates:
+                current_streak += 1
+                check_date -= timedelta(days=1)
+
+    longest_streak = 0
+    temp_streak = 0
+    prev_date = None
+    for d in sorted(dates):
+        if prev_date is None or d == prev_date + timedelta(days=1):
+            temp_streak += 1
+            longest_streak = max(longest_streak, temp_streak)
+        else:
+            temp_streak = 1
+        prev_date = d
+
+    return {"current_streak": current_streak, "longest_streak": longest_streak,
+            "total_sessions": len(rows), "total_minutes": total_minutes}
+
+def random_sessions(rng: random.Random, today: date) -> list:
+    """
+    Session timestamps in random UTC offsets, many within minutes of local midnight,
+    with gaps and several sessions on some days; returned in logging order
+    """
+    sessions = []
+    day = today - timedelta(days=rng.randint(0, 40))
+    for _ in range(rng.randint(0, 30)):
+        day += timedelta(days=rng.choice([0, 0, 1, 1, 1, 2, 3, 7]))
+        if day > today:
+            break
+        offset = timezone(timedelta(minutes=rng.choice([-720, -480, -300, 0, 60, 330, 540, 765, 840])))
+        if rng.random() < 0.5:
+            clock = time(23, rng.randint(30, 59), tzinfo=offset) if rng.random() < 0.5 else time(0, rng.randint(0, 30), tzinfo=offset)
+        else:
+            clock = time(rng.randint(0, 23), rng.randint(0, 59), tzinfo=offset)
+        for _ in range(rng.choice([1, 1, 1, 2, 3])):
+            logged_at = datetime.combine(day, clock).astimezone(timezone.utc)
+            if logged_at.date() <= today:
+                sessions.append((logged_at, rng.randint(1, 120)))
+    sessions.sort(key=lambda session: session[0])
+    return sessions
+
+@pytest.mark.parametrize("seed", range(200))
+def test_fold_matches_full_history(seed, app_module, monkeypatch):
+    rng = random.Random(seed)
+    today = datetime.now(timezone.utc).date()
+    sessions = random_sessions(rng, today)
+
+    # What log_study_session does: one row per UTC day accumulating minutes, and the fold
+    rows: dict = {}
+    streak = app_module.new_streak("u")
+    for logged_at, minutes in sessions:
+        day = logged_at.strftime('%Y-%m-%d')
+        rows[day] = rows.get(day, 0) + minutes
+        app_module.extend_streak(streak, day, minutes)
+
+    async def load_streak(db, user_id):
+        return dict(streak)
+    monkeypatch.setattr(app_module, "load_streak", load_streak)
+    folded = asyncio.run(app_module.compute_streak(None, "u"))
+
+    assert folded == baseline_streak(sorted(rows.items()), today), sessions
@@ -0,0 +1,56 @@
+"""
+Verified tokens are cached by hash until they expire or TOKEN_CACHE_TTL runs out.
+The cache must never outlive the token: a logged-out token is rejected at once
+and an expired one is verified again (and refused) rather than served.
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+
+import jwt
+
+def notes_status(client, token: str) -> int:
+    return client.get("/api/notes", headers={"Authorization": f"Bearer {token}"}).status_code
+
+def new_token(client) -> str:
+    r = client.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex[:8]}@example.com", "password": "pw",
+                                                "first_name": "Token", "last_name": "User"})
+    assert r.status_code == 200, r.text
+    return r.json()["access_token"]
+
+def test_logout_revokes_a_cached_token(app_module, client):
+    token = new_token(client)
+    key = app_module.TokenCache.key(token)
+    assert notes_status(client, token) == 200
+    assert app_module.token_cache.get(key) is not None
+
+    r = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    assert app_module.token_cache.get(key) is None
+    assert notes_status(client, token) == 401
+
+def test_expired_token_is_not_served_from_the_cache(app_module, client, auth_headers):
+    user_id = jwt.decode(auth_headers["Authorization"].split()[1], options={"verify_signature": False})["user_id"]
+    exp = int(time.time()) + 1
+    token = jwt.encode({"user_id": user_id, "exp": exp}, app_module.SECRET_KEY, algorithm="HS256")
+
+    assert notes_status(client, token) == 200
+    hits = app_module.token_cache.hits
+    assert notes_status(client, token) == 200
+    assert app_module.token_cache.hits == hits + 1
+
+    time.sleep(max(0.0, exp - time.time()) + 0.05)
+    misses = app_module.token_cache.misses
+    assert notes_status(client, token) == 401
+    assert app_module.token_cache.hits == hits + 1
+    assert app_module.token_cache.misses == misses + 1
+
+def test_entries_end_at_the_token_exp_or_ttl(app_module):
+    cache = app_module.TokenCache(maxsize=10, ttl=300)
+    now = datetime.now(timezone.utc).timestamp()
+    cache.put("expired", "u", now - 1)
+    assert cache.get("expired") is None
+
+    cache.put("long-lived", "u", now + 7 * 86400)
+    _, expires_at = cache.get("long-lived")
+    assert expires_at <= time.time() + 300